@@ -0,0 +1,63 @@
+"""
+Benchmark: image buffers sent to "img_buffer_to_webp_data_url.py" as Base64 text vs binary frames.
+
+The text mode sends the buffer Base64-encoded and reads a data URL back, the binary mode (-b) sends a
+length-prefixed frame of raw bytes and reads a frame with the raw WEBP file, which is then turned into
+the same data URL here. Sources are random-noise PNGs (which barely compress, so the buffers are
+big), scaled down to size, with the thumbnail cache off. Both modes must produce the same data URL.
+
+Usage: python scripts/benchmarks/bench_binary_framing.py [-s 256] [-r 3]
+"""
+
+import argparse
+import base64
+import os
+import struct
+import subprocess
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+PYTHON_PATH = Path(__file__).resolve().parents[2] / "src" / "bin" / "python"
+ENV = dict(os.environ, RBTOOLS_THUMBNAIL_CACHE="0")
+
+def text_mode(buf, size):
+    output = subprocess.run([sys.executable, "img_buffer_to_webp_data_url.py", "-s", str(size)], cwd=PYTHON_PATH, env=ENV, input=base64.b64encode(buf), capture_output=True, check=True).stdout
+    return output.decode("utf-8").strip()
+
+def binary_mode(buf, size):
+    output = subprocess.run([sys.executable, "img_buffer_to_webp_data_url.py", "-b", "-s", str(size)], cwd=PYTHON_PATH, env=ENV, input=struct.pack(">L", len(buf)) + buf, capture_output=True, check=True).stdout
+    webp = output[4:4 + struct.unpack(">L", output[0:4])[0]]
+    return "data:image/webp;base64," + base64.b64encode(webp).decode("utf-8")
+
+def best_of(func, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="RBToolsJS: binary framing benchmark")
+    parser.add_argument("-s", "--size", type=int, default=256)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print("%-11s %9s %10s %10s %8s" % ("Source", "buffer", "text", "binary", "speedup"))
+    for side in (512, 1024, 2048):
+        with BytesIO() as output:
+            Image.fromarray(rng.integers(0, 256, (side, side, 3), dtype=np.uint8)).save(output, format="PNG", compress_level=1)
+            buf = output.getvalue()
+        slow, expected = best_of(lambda: text_mode(buf, args.size), args.repeat)
+        fast, url = best_of(lambda: binary_mode(buf, args.size), args.repeat)
+        assert url == expected, "binary mode data URL differs from the text mode one"
+        print("%-11s %7.1fMB %8.1fms %8.1fms %7.2fx" % ("%dx%d" % (side, side), len(buf) / 1e6, slow * 1000, fast * 1000, slow / fast))
+
+if __name__ == "__main__":
+    main()
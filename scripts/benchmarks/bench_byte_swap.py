@@ -0,0 +1,75 @@
+"""
+Benchmark: the original byte-at-a-time `rbart_byte_swapper` vs the chunked one of "swap_rb_art_bytes.py"
+and its in-memory `rbart_bytes_swapper` variant.
+
+Every texture is a 32-byte header followed by random data (one of them with an odd length, whose last
+byte must be kept as is). All three implementations must give byte-identical output.
+
+Usage: python scripts/benchmarks/bench_byte_swap.py [-s 0.25 1 4] [-r 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "bin" / "python"))
+
+from swap_rb_art_bytes import rbart_byte_swapper, rbart_bytes_swapper
+
+def ref_byte_swapper(pathIn, pathOut):
+    """The original implementation, two 1-byte reads and two writes per 16-bit word."""
+    fin = open(pathIn, "rb")
+    fout = open(pathOut, "wb")
+    size = fin.seek(0, 2)
+    fin.seek(0, 0)
+    fout.write(fin.read(32))
+    while fin.tell() < size:
+        buf1 = fin.read(1)
+        buf2 = fin.read(1)
+        fout.write(buf2)
+        fout.write(buf1)
+    fin.close()
+    fout.close()
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="RBToolsJS: texture byte swap benchmark")
+    parser.add_argument("-s", "--sizes", type=float, nargs="+", default=[0.25, 1, 4], help="Texture sizes in MB")
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print("%8s %12s %12s %12s %9s" % ("size", "original", "chunked", "in-memory", "speedup"))
+    with tempfile.TemporaryDirectory() as folder:
+        src, ref_out, out = (os.path.join(folder, name) for name in ("src.png_xbox", "ref.png_ps3", "out.png_ps3"))
+        for i, megabytes in enumerate(args.sizes):
+            # the last byte of odd-sized files is left alone
+            data = rng.integers(0, 256, 32 + int(megabytes * 1024 * 1024) + (i % 2), dtype=np.uint8).tobytes()
+            with open(src, "wb") as f:
+                f.write(data)
+
+            slow = best_of(lambda: ref_byte_swapper(src, ref_out), 1)
+            fast = best_of(lambda: rbart_byte_swapper(src, out), args.repeat)
+            memory = best_of(lambda: rbart_bytes_swapper(data), args.repeat)
+
+            with open(ref_out, "rb") as f:
+                expected = f.read()
+            with open(out, "rb") as f:
+                assert f.read() == expected, "%d bytes: chunked output differs from the original" % len(data)
+            assert rbart_bytes_swapper(data) == expected, "%d bytes: in-memory output differs from the original" % len(data)
+            print("%6.2fMB %10.2fms %10.2fms %10.2fms %8.0fx" % (len(data) / 1024 / 1024, slow * 1000, fast * 1000, memory * 1000, slow / fast))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark: finding the header file of a png_xbox/png_ps3 texture by reading "src/bin/headers" on every
+call (what `getDDSHeader` does) vs the `lib/headers.py` registry, loaded once.
+
+Every header file is turned back into the first 32 bytes of a texture and looked up with both
+methods, which must find a header with the same bytes.
+
+Usage: python scripts/benchmarks/bench_header_registry.py [-r 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "bin" / "python"))
+
+from lib.headers import FILE_OFFSETS, HEADERS_PATH, HeaderRegistry, registry
+
+def scan_headers(data):
+    """Reads every header file and compares it with the texture header, like the TypeScript lookup."""
+    found = None
+    for filename in os.listdir(HEADERS_PATH):
+        with open(os.path.join(HEADERS_PATH, filename), "rb") as f:
+            raw = f.read()
+        offset = FILE_OFFSETS[len(raw)]
+        if found is None and bytes(data[offset:offset + len(raw)]) == raw:
+            found = filename
+    return found
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="RBToolsJS: texture header lookup benchmark")
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    load = best_of(HeaderRegistry, args.repeat)
+    headers = [entry.data for entry in registry().entries.values()]
+    for data in headers:
+        assert scan_headers(data) is not None and registry().detect(data).data == data
+
+    scan = best_of(lambda: [scan_headers(data) for data in headers], args.repeat)
+    lookup = best_of(lambda: [registry().detect(data) for data in headers], args.repeat)
+    count = len(headers)
+    print("%d headers, registry loaded in %.2fms" % (count, load * 1000))
+    print("scan     %10.2f us per texture" % (scan / count * 1e6))
+    print("registry %10.2f us per texture (%.0fx)" % (lookup / count * 1e6, scan / lookup))
+
+if __name__ == "__main__":
+    main()
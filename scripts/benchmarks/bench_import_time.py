@@ -0,0 +1,73 @@
+"""
+Benchmark: import time of every Python entry point, checked against a per entry point budget.
+
+Each script of "src/bin/python" (and lib.pkg, the PKG parser) is imported in a fresh interpreter
+with `python -X importtime`, keeping the best of repeat runs of its cumulative import time. Sources
+are byte-compiled first and PYTHONDONTWRITEBYTECODE is dropped, so what's measured is the start-up
+of an installed copy, not the compiler. The process exits with status 1 when an entry point goes
+over its budget in "import_time_budget.json"; entry points without a budget are only reported.
+
+The budgets carry a wide margin over the times measured on a development machine. After an
+intended change, --write-budget rewrites them as the measured times times --margin.
+
+Usage: python scripts/benchmarks/bench_import_time.py [-r 5] [--write-budget [--margin 2.0]]
+"""
+
+import argparse
+import compileall
+import json
+import math
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+PYTHON_PATH = Path(__file__).resolve().parents[2] / "src" / "bin" / "python"
+BUDGET_PATH = Path(__file__).resolve().with_name("import_time_budget.json")
+MIN_BUDGET = 15
+
+def entry_points():
+    return sorted(path.stem for path in PYTHON_PATH.glob("*.py")) + ["lib.pkg"]
+
+def import_time(module, env):
+    """Cumulative import time of module in a new interpreter, in milliseconds."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import %s" % module], cwd=PYTHON_PATH, env=env, capture_output=True, text=True, check=True).stderr
+    for line in stderr.splitlines():
+        fields = line.split("|")
+        # Top-level imports have no indentation after the last "|"
+        if len(fields) == 3 and fields[2] == " " + module:
+            return int(fields[1]) / 1000
+    raise RuntimeError("No import time for %s" % module)
+
+def main():
+    parser = argparse.ArgumentParser(description="RBToolsJS: import time benchmark")
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--write-budget", action="store_true", help="Rewrite the budget file from this run")
+    parser.add_argument("--margin", type=float, default=2.0, help="Budget over the measured time used by --write-budget")
+    args = parser.parse_args()
+
+    compileall.compile_dir(str(PYTHON_PATH), quiet=1)
+    env = {key: value for key, value in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"}
+    budget = json.loads(BUDGET_PATH.read_text()) if BUDGET_PATH.exists() else {}
+
+    measured, over = {}, []
+    print("%-28s %9s %9s" % ("Entry point", "import", "budget"))
+    for module in entry_points():
+        measured[module] = min(import_time(module, env) for _ in range(args.repeat))
+        limit = budget.get(module)
+        status = ""
+        if limit is not None and measured[module] > limit:
+            over.append(module)
+            status = "  OVER BUDGET"
+        print("%-28s %7.1fms %9s%s" % (module, measured[module], "%dms" % limit if limit is not None else "-", status))
+
+    if args.write_budget:
+        # Rounded up to 5 ms, and never under MIN_BUDGET, so that noise alone doesn't fail a run
+        BUDGET_PATH.write_text(json.dumps({module: max(MIN_BUDGET, int(math.ceil(ms * args.margin / 5) * 5)) for module, ms in measured.items()}, indent=2) + "\n")
+        print("Budget written to %s" % BUDGET_PATH.name)
+    elif over:
+        print("%d entry point(s) over budget: %s" % (len(over), ", ".join(over)))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
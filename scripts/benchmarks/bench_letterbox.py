@@ -0,0 +1,104 @@
+"""
+Benchmark: letterboxed album art resize through a full-size square canvas vs lib.resize.letterbox.
+
+The "canvas" path is what the converters used to do: paste the source on a black square as big as
+its largest side, then thumbnail() it. The "letterbox" path shrinks the source alone (draft() on
+JPEG, reduce() on the rest) and pastes it on a square of the target size. Every source is a
+synthetic gradient with noise, saved as PNG and JPEG. Times are the best of repeat runs, peak memory
+is the max RSS of a fresh process doing one resize, and the difference is the mean absolute pixel
+difference between both outputs.
+
+Usage: python scripts/benchmarks/bench_letterbox.py [-s 256] [-r 3]
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "bin" / "python"))
+
+from lib.resize import letterbox
+
+SOURCES = [(4000, 3000), (3000, 3000), (1500, 1000), (600, 600)]
+
+def canvas(img, width, height):
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    x, y = img.size
+    size = max(width, x, y)
+    new_im = Image.new("RGB", (size, size), (0, 0, 0))
+    new_im.paste(img, (int((size - x) / 2), int((size - y) / 2)))
+    new_im.thumbnail((width, height), resample=Image.Resampling.BILINEAR)
+    return new_im
+
+METHODS = {"canvas": canvas, "letterbox": letterbox}
+
+def resize(method, path, size):
+    with Image.open(path) as img:
+        return METHODS[method](img, size, size)
+
+def peak_rss():
+    """Peak RSS in MB of this process. ru_maxrss may carry the peak of the parent across fork(), VmHWM doesn't."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def peak_memory(method, path, size):
+    """Max RSS in MB of a fresh process running a single resize."""
+    output = subprocess.run([sys.executable, __file__, "--child", method, path, "-s", str(size)], capture_output=True, text=True, check=True).stdout
+    return float(output)
+
+def make_source(width, height, rng):
+    yy, xx = np.mgrid[0:height, 0:width]
+    pixels = np.stack([xx * 255 // width, yy * 255 // height, (xx + yy) * 255 // (width + height)], -1)
+    return Image.fromarray(np.clip(pixels + rng.integers(-12, 12, pixels.shape), 0, 255).astype(np.uint8))
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="RBToolsJS: letterbox resize benchmark")
+    parser.add_argument("-s", "--size", type=int, default=256)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("--child", nargs=2, metavar=("METHOD", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        resize(*args.child, args.size)
+        print(peak_rss())
+        return
+
+    rng = np.random.default_rng(0)
+    print("%-15s %10s %10s %8s %9s %9s %6s" % ("Source", "canvas", "letterbox", "speedup", "canvas", "letterbox", "diff"))
+    with tempfile.TemporaryDirectory() as folder:
+        for width, height in SOURCES:
+            source = make_source(width, height, rng)
+            for ext in ("png", "jpg"):
+                path = os.path.join(folder, "cover.%s" % ext)
+                source.save(path, quality=90)
+                slow = best_of(lambda: resize("canvas", path, args.size), args.repeat)
+                fast = best_of(lambda: resize("letterbox", path, args.size), args.repeat)
+                memory = [peak_memory(method, path, args.size) for method in METHODS]
+                diff = np.abs(np.asarray(resize("canvas", path, args.size), int) - np.asarray(resize("letterbox", path, args.size), int)).mean()
+                print("%-15s %8.1fms %8.1fms %7.1fx %7.0fMB %7.0fMB %6.2f" % ("%s %dx%d" % (ext.upper(), width, height), slow * 1000, fast * 1000, slow / fast, memory[0], memory[1], diff))
+
+if __name__ == "__main__":
+    main()
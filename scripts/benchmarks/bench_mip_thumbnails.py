@@ -0,0 +1,105 @@
+"""
+Benchmark: thumbnail latency with a full resolution decode vs decoding the right mip level.
+
+For every texture (random block data with a full mip chain), the "full" path decodes the base image
+(Pillow's DDS plugin for DDS, TPLFile for TPL) and shrinks it with thumbnail(). The "mip" path picks
+the smallest level that is still at least the thumbnail size, decodes only that level and shrinks
+what is left.
+
+Usage: python scripts/benchmarks/bench_mip_thumbnails.py [-t 64 128] [-r 5]
+"""
+
+import argparse
+import struct
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "bin" / "python"))
+
+from lib import dds, tpl_codec
+from lib.tpl import TPLFile, TPLHeader, TPLTexture, TPLTextureHeader
+
+def mip_chain_size(level_size, width, height):
+    levels, total = 0, 0
+    while True:
+        w, h = tpl_codec.level_dimensions(width, height, levels)
+        total += level_size(w, h)
+        levels += 1
+        if w == 1 and h == 1:
+            return levels, total
+
+def make_dds(fourcc, width, height, rng):
+    levels, size = mip_chain_size(lambda w, h: dds.level_size(fourcc, w, h), width, height)
+    header = bytearray(128)
+    header[0:4] = dds.DDS_MAGIC
+    struct.pack_into("<7L", header, 4, 124, 0x1007 | dds.DDSHeader.DDSD_MIPMAPCOUNT, height, width, 0, 0, levels)
+    struct.pack_into("<2L4s", header, 76, 32, 4, fourcc)
+    return bytes(header) + rng.integers(0, 256, size, dtype=np.uint8).tobytes()
+
+def make_tpl(format_id, width, height, rng):
+    levels, size = mip_chain_size(lambda w, h: tpl_codec.texture_size(format_id, w, h), width, height)
+    head = TPLHeader(magic=0x0020AF30, ntextures=1, header_size=0x0C)
+    tex = TPLTexture(header_offset=0x14)
+    texhead = TPLTextureHeader(height=height, width=width, format=format_id, data_off=0x14 + TPLTextureHeader.size, filter=(1, 1), max_lod=levels - 1)
+    return head.pack() + tex.pack() + texhead.pack() + rng.integers(0, 256, size, dtype=np.uint8).tobytes()
+
+def full_dds(blob, size):
+    image = Image.open(BytesIO(blob))
+    image.thumbnail((size, size), resample=Image.Resampling.BILINEAR)
+    return image
+
+def mip_dds(blob, size):
+    texture = dds.DDSFile(blob)
+    image = texture.toImage(texture.level_for_size(size))
+    image.thumbnail((size, size), resample=Image.Resampling.BILINEAR)
+    return image
+
+def full_tpl(blob, size):
+    image = TPLFile(blob).toImage()
+    image.thumbnail((size, size), resample=Image.Resampling.BILINEAR)
+    return image
+
+def mip_tpl(blob, size):
+    texture = TPLFile(blob)
+    image = texture.toImage(texture.level_for_size(size))
+    image.thumbnail((size, size), resample=Image.Resampling.BILINEAR)
+    return image
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="RBToolsJS: mip level thumbnail benchmark")
+    parser.add_argument("-t", "--thumbnails", type=int, nargs="+", default=[64, 128])
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    textures = [
+        ("DDS DXT1 1024", make_dds(b"DXT1", 1024, 1024, rng), full_dds, mip_dds),
+        ("DDS DXT5 1024", make_dds(b"DXT5", 1024, 1024, rng), full_dds, mip_dds),
+        ("DDS DXT5 2048", make_dds(b"DXT5", 2048, 2048, rng), full_dds, mip_dds),
+        ("TPL CMP 256", make_tpl(14, 256, 256, rng), full_tpl, mip_tpl),
+        ("TPL CMP 1024", make_tpl(14, 1024, 1024, rng), full_tpl, mip_tpl),
+        ("TPL RGBA8 512", make_tpl(6, 512, 512, rng), full_tpl, mip_tpl),
+    ]
+
+    print("%-15s %6s %10s %10s %9s" % ("Texture", "thumb", "full", "mip", "speedup"))
+    for name, blob, full, mip in textures:
+        for size in args.thumbnails:
+            slow = best_of(lambda: full(blob, size), args.repeat)
+            fast = best_of(lambda: mip(blob, size), args.repeat)
+            print("%-15s %6d %8.2fms %8.2fms %8.1fx" % (name, size, slow * 1000, fast * 1000, slow / fast))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Benchmark suite of the Python libraries ("lib/stfs.py", "lib/mogg.py", "lib/tpl.py" and "lib/pkg.py")
+on the synthetic fixtures of "fixtures.py", compared with stored baselines.
+
+Each case runs in a new interpreter: it builds its fixture, runs its operation once to warm up, then
+keeps the median of --repeat timed runs. Operations faster than `MIN_RUN_SECONDS` are called in a
+loop for each timed run, which takes the average. Each run is preceded by a run of `calibrate()`, a
+fixed workload whose median time measures the speed of the machine at that moment. Reported per case:
+- MB/s of the bytes the operation goes through, for cases that process data.
+- Operations per second.
+- Peak RSS of the process while the operation runs, with its fixture loaded. Linux resets the
+  high-water mark through /proc/self/clear_refs once the fixture is built; elsewhere it's the peak of
+  the whole process.
+
+Results are checked against "bench_suite_baseline.json", which stores the time of each case relative
+to the calibration run next to it, so that baselines written on one machine hold on another. A case
+whose relative time grows past its tolerance, or whose peak RSS grows by more than --tolerance (and
+over 8 MB), is a regression and the process exits with status 1. The tolerance of a case is
+--tolerance, or wider for cases whose runs were spread out when the baseline was written (twice
+their interquartile range, up to `MAX_TOLERANCE`). Cases without a baseline are only reported. After
+an intended change, --write-baseline rewrites the baselines with the current results.
+
+Usage: python scripts/benchmarks/bench_suite.py [-k stfs] [-r 7] [--scale 1.0] [--tolerance 0.5] [--write-baseline]
+"""
+
+import argparse
+import atexit
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import fixtures
+from lib.tpl import FORMAT_NAMES
+
+BASELINE_PATH = Path(__file__).resolve().with_name("bench_suite_baseline.json")
+# Peak RSS growth under this many megabytes is never a regression
+RSS_NOISE_MB = 8
+# Shortest timed run: quicker operations are repeated within each run, so timer and scheduling
+# noise stays small next to what is measured
+MIN_RUN_SECONDS = 0.05
+# The widest tolerance given to a noisy case: a case twice as slow always fails
+MAX_TOLERANCE = 1.0
+
+# Case name -> setup(scale) returning (operation, bytes processed per run, 0 for none)
+CASES: Dict[str, Callable[[float], Tuple[Callable[[], object], int]]] = {}
+
+def case(name: str):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+def temp_file(data: bytes) -> str:
+    handle, path = tempfile.mkstemp(prefix="rbtools-bench-")
+    with os.fdopen(handle, "wb") as f:
+        f.write(data)
+    atexit.register(os.unlink, path)
+    return path
+
+def stfs_fixture(scale: float, fragmentation: float):
+    files = fixtures.stfs_files(int(16_000_000 * scale), 200)
+    return files, temp_file(fixtures.make_stfs(files, fragmentation))
+
+@case("stfs/open")
+def stfs_open(scale):
+    from lib.stfs import STFS
+    _, path = stfs_fixture(scale, 0.0)
+    return lambda: STFS(path).close(), 0
+
+def stfs_read_all(scale, fragmentation):
+    from lib.stfs import STFS
+    files, path = stfs_fixture(scale, fragmentation)
+
+    def run():
+        stfs = STFS(path)
+        for listing in stfs.allfiles.values():
+            if not listing.isdirectory:
+                stfs.read_file(listing)
+        stfs.close()
+    return run, sum(len(data) for data in files.values())
+
+@case("stfs/read-all-contiguous")
+def stfs_read_all_contiguous(scale):
+    return stfs_read_all(scale, 0.0)
+
+@case("stfs/read-all-fragmented")
+def stfs_read_all_fragmented(scale):
+    return stfs_read_all(scale, 1.0)
+
+@case("stfs/block-chains-fragmented")
+def stfs_block_chains(scale):
+    from lib.stfs import STFS
+    files, path = stfs_fixture(scale, 1.0)
+    stfs = STFS(path)
+    listings = [listing for listing in stfs.allfiles.values() if not listing.isdirectory]
+
+    def run():
+        for listing in listings:
+            stfs.get_file_blocks(listing)
+    return run, sum(len(data) for data in files.values())
+
+def mogg_decrypt(version):
+    def setup(scale):
+        from lib.mogg import decrypt_mogg_bytes
+        data = fixtures.make_mogg(version, int(256_000 * scale))
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                assert decrypt_mogg_bytes(True, False, data)[:4] == b"OggS"
+        return run, len(data)
+    return setup
+
+def mogg_gen_key(version):
+    def setup(scale):
+        from lib import mogg
+        data = fixtures.make_mogg(version, 4096)
+        hvkey = getattr(mogg, "hvkey_%d" % (12 if version == 13 else version))
+
+        def run():
+            # gen_key() prints when the PS3 and Xbox keys differ
+            with contextlib.redirect_stdout(io.StringIO()):
+                mogg.gen_key(True, hvkey, data, version)
+        return run, 0
+    return setup
+
+for _version in fixtures.MOGG_VERSIONS:
+    case("mogg/decrypt-v%d" % _version)(mogg_decrypt(_version))
+    if _version > 11:
+        case("mogg/gen-key-v%d" % _version)(mogg_gen_key(_version))
+
+def tpl_decode(format):
+    def setup(scale):
+        from lib import tpl_codec
+        from lib.tpl import TPLFile
+        side = max(8, int(512 * scale ** 0.5) // 8 * 8)
+        tpl = TPLFile(fixtures.make_tpl(format, side, side))
+        return tpl.toImage, tpl_codec.texture_size(format, side, side)
+    return setup
+
+for _format, _name in FORMAT_NAMES.items():
+    case("tpl/to-image-%s" % _name)(tpl_decode(_format))
+
+@case("pkg/input-read")
+def pkg_input_read(scale):
+    pkg = fixtures.pkg3_module()
+    size = int(16_000_000 * scale)
+    path = temp_file(fixtures.random_bytes(size, 1))
+    reader = pkg.PkgInputReader(path)
+
+    def run():
+        for offset in range(0, size, 0x10000):
+            reader.read(offset, min(0x10000, size - offset))
+    return run, size
+
+@case("pkg/aes-ctr-decrypt")
+def pkg_aes_ctr(scale):
+    pkg = fixtures.pkg3_module()
+    data = bytearray(fixtures.random_bytes(int(8_000_000 * scale), 1))
+    counter = pkg.PkgAesCtrCounter(pkg.CONST_PKG3_CONTENT_KEYS[0]["KEY"], bytes(16))
+
+    def run():
+        for offset in range(0, len(data), 0x100000):
+            counter.decrypt(offset, data[offset:offset + 0x100000])
+    return run, len(data)
+
+@case("pkg/xor-sha1-decrypt")
+def pkg_xor_sha1(scale):
+    pkg = fixtures.pkg3_module()
+    data = bytearray(fixtures.random_bytes(int(1_000_000 * scale) // 16 * 16, 1))
+    counter = pkg.PkgXorSha1Counter(bytes(0x40))
+    return lambda: counter.decrypt(0, data), len(data)
+
+def pkg_extract(debug):
+    def setup(scale):
+        pkg = fixtures.pkg3_module()
+        pkg.Arguments = types.SimpleNamespace(arcade=False)
+        size = int((256_000 if debug else 4_000_000) * scale)
+        files = {"USRDIR/songs/song%d.mogg" % i: fixtures.random_bytes(size // 8, i) for i in range(8)}
+        path = temp_file(fixtures.make_pkg3(files, debug))
+
+        def run():
+            reader = pkg.PkgInputReader(path)
+            head = reader.read(0, pkg.CONST_PKG3_MAIN_HEADER_FIELDS["STRUCTURE_SIZE"])
+            header_fields, _, meta_data, _ = pkg.parsePkg3Header(head, reader, 0)
+            items, _ = pkg.parsePkg3ItemsInfo(header_fields, meta_data, reader, 0)
+            for item in items:
+                output = io.BytesIO()
+                extractions = {"bench": {"KEY": "bench", "STREAM": output, "ITEM_DATATYPE": pkg.CONST_DATATYPE_DECRYPTED, "ALIGNED": False, "BYTES_WRITTEN": 0}}
+                pkg.processPkg3Item(header_fields, item, reader, None, extractions=extractions)
+                assert output.getvalue() == files[item["NAME"]]
+            reader.close()
+        return run, sum(len(data) for data in files.values())
+    return setup
+
+case("pkg/extract-retail")(pkg_extract(False))
+case("pkg/extract-debug")(pkg_extract(True))
+
+def status_kb(field: str) -> int:
+    try:
+        with open("/proc/self/status") as status:
+            return int(re.search(r"%s:\s+(\d+)" % field, status.read()).group(1))
+    except (OSError, AttributeError):
+        return 0
+
+def reset_peak_rss() -> None:
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+CALIBRATION_DATA = bytes(range(256)) * 256
+
+def calibrate() -> int:
+    """A fixed mix of Python loops and bytes work like the cases', about 10 ms on a desktop machine."""
+    data = CALIBRATION_DATA
+    total = 0
+    for i in range(0, len(data), 2):
+        total = (total * 31 + (data[i] << 8 | data[i + 1])) & 0xFFFFFFFF
+    for _ in range(16):
+        hashlib.sha1(data).digest()
+    return total
+
+def timed(func: Callable[[], object], loops: int = 1) -> float:
+    """Average time of a call over loops calls."""
+    start = time.perf_counter()
+    for _ in range(loops):
+        func()
+    return (time.perf_counter() - start) / loops
+
+def spread(times: List[float]) -> float:
+    """Interquartile range of the run times, relative to their median."""
+    if len(times) < 4:
+        return 0.0
+    quartiles = statistics.quantiles(times, n=4)
+    return (quartiles[2] - quartiles[0]) / statistics.median(times)
+
+def run_case(name: str, repeat: int, scale: float) -> dict:
+    """Runs a case in this process and returns its result."""
+    operation, size = CASES[name](scale)
+    # The peaks of building the fixture don't count, only what the operation runs on top of it
+    reset_peak_rss()
+    loops = max(1, int(MIN_RUN_SECONDS / max(timed(operation), 1e-9)))
+    calibrate()
+    times, calibration = [], []
+    for _ in range(repeat):
+        calibration.append(timed(calibrate))
+        times.append(timed(operation, loops))
+    seconds = statistics.median(times)
+    peak = status_kb("VmHWM")
+    if not peak:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "seconds": seconds,
+        "relative": seconds / statistics.median(calibration),
+        "spread": spread(times),
+        "opsPerSecond": 1 / seconds,
+        "mbPerSecond": size / seconds / 1e6 if size else None,
+        "peakRssMB": peak / 1024,
+    }
+
+def slowdown(result: dict, baseline: dict) -> float:
+    """How much slower than its baseline a case ran, relative to the calibration runs (0.1 for 10%)."""
+    return result["relative"] / baseline["relative"] - 1
+
+def compare(result: dict, baseline: dict, tolerance: float) -> str:
+    problems = []
+    tolerance = max(tolerance, baseline.get("tolerance", 0))
+    if slowdown(result, baseline) > tolerance:
+        problems.append("%.0f%% slower (tolerance %.0f%%)" % (slowdown(result, baseline) * 100, tolerance * 100))
+    if result["peakRssMB"] > baseline["peakRssMB"] * (1 + tolerance) and result["peakRssMB"] - baseline["peakRssMB"] > RSS_NOISE_MB:
+        problems.append("+%.1f MB peak RSS" % (result["peakRssMB"] - baseline["peakRssMB"]))
+    return ", ".join(problems)
+
+def main():
+    parser = argparse.ArgumentParser(description="RBToolsJS: Python library benchmark suite")
+    parser.add_argument("-k", "--filter", help="Only runs the cases whose name contains this text", default="")
+    parser.add_argument("-r", "--repeat", type=int, default=7)
+    parser.add_argument("--scale", help="Multiplies the fixture sizes", type=float, default=1.0)
+    parser.add_argument("--tolerance", help="Slowdown or peak RSS growth over the baseline allowed before a case fails, at least", type=float, default=0.5)
+    parser.add_argument("--write-baseline", help="Stores the results as the baselines of the cases that ran", action="store_true")
+    parser.add_argument("--list", help="Lists the cases", action="store_true")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.repeat, args.scale)))
+        return
+    names = [name for name in CASES if args.filter in name]
+    if args.list:
+        print("\n".join(names))
+        return
+
+    baselines = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    # Baselines written before the calibration runs only hold seconds, which can't be compared
+    baselines = {name: baseline for name, baseline in baselines.items() if "relative" in baseline}
+    results = {}
+    regressions = 0
+    print("%-30s %10s %12s %10s %12s  %s" % ("case", "MB/s", "ops/s", "ms", "peak RSS MB", "vs baseline"))
+    for name in names:
+        output = subprocess.run([sys.executable, __file__, "--case", name, "-r", str(args.repeat), "--scale", str(args.scale)], capture_output=True, text=True, check=True).stdout
+        result = results[name] = json.loads(output.splitlines()[-1])
+        problem = ""
+        if name in baselines and not args.write_baseline:
+            problem = compare(result, baselines[name], args.tolerance)
+            regressions += bool(problem)
+        note = ("REGRESSION: " + problem) if problem else ("%+.0f%%" % (slowdown(result, baselines[name]) * 100) if name in baselines else "-")
+        print("%-30s %10s %12.1f %10.2f %12.1f  %s" % (
+            name, "%.1f" % result["mbPerSecond"] if result["mbPerSecond"] else "-", result["opsPerSecond"], result["seconds"] * 1000, result["peakRssMB"], note,
+        ))
+
+    if args.write_baseline:
+        for name, result in results.items():
+            baselines[name] = {
+                "seconds": round(result["seconds"], 6),
+                "relative": round(result["relative"], 4),
+                "tolerance": round(max(args.tolerance, min(MAX_TOLERANCE, 2 * result["spread"])), 2),
+                "peakRssMB": round(result["peakRssMB"], 1),
+            }
+        BASELINE_PATH.write_text(json.dumps(dict(sorted(baselines.items())), indent=2) + "\n")
+        print("Wrote %d baselines to %s" % (len(results), BASELINE_PATH.name))
+    elif regressions:
+        print("%d case(s) regressed past their tolerance" % regressions)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark: "webp_data_url.py" latency on a thumbnail cache miss vs a hit.
+
+A temporary folder is filled with count random 600x600 JPEG covers and an empty thumbnail cache.
+Each cover goes through one "webp_data_url.py" process with the cache turned off, one that fills
+the cache (miss) and one that reads it back (hit). Every run must produce the same data URL.
+
+Usage: python scripts/benchmarks/bench_thumbnail_cache.py [-n 20] [-s 256]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+PYTHON_PATH = Path(__file__).resolve().parents[2] / "src" / "bin" / "python"
+
+def run(path, size, cache):
+    env = dict(os.environ, RBTOOLS_THUMBNAIL_CACHE=cache)
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "webp_data_url.py", path, "-x", str(size), "-y", str(size)], cwd=PYTHON_PATH, env=env, capture_output=True, text=True, check=True).stdout
+    return time.perf_counter() - start, output.strip()
+
+def main():
+    parser = argparse.ArgumentParser(description="RBToolsJS: thumbnail cache benchmark")
+    parser.add_argument("-n", "--count", type=int, default=20)
+    parser.add_argument("-s", "--size", type=int, default=256)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    totals = {"no cache": 0.0, "miss": 0.0, "hit": 0.0}
+    with tempfile.TemporaryDirectory() as folder:
+        cache = os.path.join(folder, "cache")
+        for i in range(args.count):
+            path = os.path.join(folder, "cover%03d.jpg" % i)
+            Image.fromarray(rng.integers(0, 256, (600, 600, 3), dtype=np.uint8)).save(path, quality=90)
+
+            seconds, expected = run(path, args.size, "0")
+            totals["no cache"] += seconds
+            for name in ("miss", "hit"):
+                seconds, url = run(path, args.size, cache)
+                assert url == expected, "%s: data URL differs from the uncached run" % name
+                totals[name] += seconds
+
+    print("%d covers" % args.count)
+    for name, seconds in totals.items():
+        print("%-9s %8.1f ms each  (%.1fx)" % (name, seconds / args.count * 1000, totals["no cache"] / seconds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Benchmark: per-pixel TPL decoders vs the NumPy decoders of "lib/tpl_codec.py".
+
+The reference decoders below are the original per-pixel loops of "lib/tpl.py" (the CMP one decodes
+its whole 4x4 block for every pixel), with the Python 2
+style "/" divisions turned into "//" (what the original code computed before Python 3). Every run
+checks the NumPy output is pixel-identical to the reference before timing it.
+
+Usage: python scripts/benchmarks/bench_tpl_decoders.py [-s 64 128 256 512] [-f RGB565 I4 ...]
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "bin" / "python"))
+
+from lib import tpl_codec
+
+def uint16(data):
+    return struct.unpack(">H", data)[0]
+
+def pack(out):
+    return b"".join(struct.pack("<L", p) for p in out)
+
+def ref_rgba8(w, h, data):
+    out = [0] * (w * h)
+    inp = 0
+    for i in range(0, h, 4):
+        for j in range(0, w, 4):
+            for k in range(2):
+                for l in range(i, i + 4):
+                    for m in range(j, j + 4):
+                        texel, texel2 = data[inp], data[inp + 1]
+                        inp += 2
+                        if m >= w or l >= h:
+                            continue
+                        if k == 0:
+                            out[m + l * w] |= texel2 | (texel << 24)
+                        else:
+                            out[m + l * w] |= (texel << 8) | (texel2 << 16)
+    return pack(out)
+
+def ref_rgb5a3(w, h, jar):
+    out = [0] * (w * h)
+    i = 0
+    for y in range(0, h, 4):
+        for x in range(0, w, 4):
+            for y1 in range(y, y + 4):
+                for x1 in range(x, x + 4):
+                    pixel = uint16(jar[i * 2:i * 2 + 2])
+                    i += 1
+                    if y1 >= h or x1 >= w:
+                        continue
+                    if pixel & (1 << 15):
+                        b = (((pixel >> 10) & 0x1F) * 255) // 31
+                        g = (((pixel >> 5) & 0x1F) * 255) // 31
+                        r = (((pixel >> 0) & 0x1F) * 255) // 31
+                        a = 255
+                    else:
+                        a = (((pixel >> 12) & 0x07) * 255) // 7
+                        b = (((pixel >> 8) & 0x0F) * 255) // 15
+                        g = (((pixel >> 4) & 0x0F) * 255) // 15
+                        r = (((pixel >> 0) & 0x0F) * 255) // 15
+                    out[y1 * w + x1] = (r << 16) | (g << 8) | b | (a << 24)
+    return pack(out)
+
+def ref_rgb565(w, h, jar):
+    out = [0] * (w * h)
+    i = 0
+    for y in range(0, h, 4):
+        for x in range(0, w, 4):
+            for y1 in range(y, y + 4):
+                for x1 in range(x, x + 4):
+                    pixel = uint16(jar[i * 2:i * 2 + 2])
+                    i += 1
+                    if y1 >= h or x1 >= w:
+                        continue
+                    b = (((pixel >> 11) & 0x1F) << 3) & 0xff
+                    g = (((pixel >> 5) & 0x3F) << 2) & 0xff
+                    r = (((pixel >> 0) & 0x1F) << 3) & 0xff
+                    out[y1 * w + x1] = (r << 16) | (g << 8) | b | (255 << 24)
+    return pack(out)
+
+def ref_i4(w, h, jar):
+    out = [0] * (w * h)
+    i = 0
+    for y in range(0, h, 8):
+        for x in range(0, w, 8):
+            for y1 in range(y, y + 8):
+                for x1 in range(x, x + 8, 2):
+                    pixel = jar[i]
+                    i += 1
+                    if y1 >= h or x1 >= w:
+                        continue
+                    v = (pixel >> 4) * 255 // 15
+                    out[y1 * w + x1] = v | (v << 8) | (v << 16) | (v << 24)
+                    # The original wrote the second pixel past the end of the row on odd widths
+                    if x1 + 1 >= w:
+                        continue
+                    v = (pixel & 0x0F) * 255 // 15
+                    out[y1 * w + x1 + 1] = v | (v << 8) | (v << 16) | (v << 24)
+    return pack(out)
+
+def ref_ia4(w, h, jar):
+    out = [0] * (w * h)
+    i = 0
+    for y in range(0, h, 4):
+        for x in range(0, w, 8):
+            for y1 in range(y, y + 4):
+                for x1 in range(x, x + 8):
+                    pixel = jar[i]
+                    i += 1
+                    if y1 >= h or x1 >= w:
+                        continue
+                    v = ((pixel & 0x0F) * 255 // 15) & 0xff
+                    a = ((pixel >> 4) * 255 // 15) & 0xff
+                    out[y1 * w + x1] = v | (v << 8) | (v << 16) | (a << 24)
+    return pack(out)
+
+def ref_i8(w, h, jar):
+    out = [0] * (w * h)
+    i = 0
+    for y in range(0, h, 4):
+        for x in range(0, w, 8):
+            for y1 in range(y, y + 4):
+                for x1 in range(x, x + 8):
+                    pixel = jar[i]
+                    i += 1
+                    if y1 >= h or x1 >= w:
+                        continue
+                    out[y1 * w + x1] = pixel | (pixel << 8) | (pixel << 16) | (255 << 24)
+    return pack(out)
+
+def ref_ia8(w, h, jar):
+    out = [0] * (w * h)
+    i = 0
+    for y in range(0, h, 4):
+        for x in range(0, w, 4):
+            for y1 in range(y, y + 4):
+                for x1 in range(x, x + 4):
+                    pixel = uint16(jar[i * 2:i * 2 + 2])
+                    i += 1
+                    if y1 >= h or x1 >= w:
+                        continue
+                    v = pixel >> 8
+                    out[y1 * w + x1] = v | (v << 8) | (v << 16) | ((pixel & 0xff) << 24)
+    return pack(out)
+
+def avg(w0, w1, c0, c1):
+    a = (w0 * (c0 >> 11) + w1 * (c1 >> 11)) // (w0 + w1)
+    c = (a << 11) & 0xffff
+    a = (w0 * ((c0 >> 5) & 63) + w1 * ((c1 >> 5) & 63)) // (w0 + w1)
+    c = c | ((a << 5) & 0xffff)
+    a = (w0 * (c0 & 31) + w1 * (c1 & 31)) // (w0 + w1)
+    return c | a
+
+def ref_cmp(w, h, data):
+    temp = [0] * (w * h)
+    c = [0, 0, 0, 0]
+    outp = 0
+    ww = (w + 7) // 8 * 8
+    for y in range(h):
+        for x in range(w):
+            off = (8 * ((x >> 2) & 1)) + (16 * ((y >> 2) & 1)) + (32 * (x >> 3)) + (4 * ww * (y >> 3))
+            c[0] = uint16(data[off:off + 2])
+            c[1] = uint16(data[off + 2:off + 4])
+            if c[0] > c[1]:
+                c[2] = avg(2, 1, c[0], c[1])
+                c[3] = avg(1, 2, c[0], c[1])
+            else:
+                c[2] = avg(1, 1, c[0], c[1])
+                c[3] = 0
+            px = struct.unpack(">L", data[off + 4:off + 8])[0]
+            raw = c[(px >> (30 - (2 * ((x & 3) + 4 * (y & 3))))) & 0x03]
+            temp[outp] = ((raw >> 8) & 0xf8) | (((raw >> 3) & 0xf8) << 8) | (((raw << 3) & 0xf8) << 16) | (255 << 24)
+            outp += 1
+    return pack(temp)
+
+# name -> (reference, vectorized, bits per pixel, block width, block height)
+FORMATS = {
+    "I4": (ref_i4, tpl_codec.decode_i4, 4, 8, 8),
+    "I8": (ref_i8, tpl_codec.decode_i8, 8, 8, 4),
+    "IA4": (ref_ia4, tpl_codec.decode_ia4, 8, 8, 4),
+    "IA8": (ref_ia8, tpl_codec.decode_ia8, 16, 4, 4),
+    "RGB565": (ref_rgb565, tpl_codec.decode_rgb565, 16, 4, 4),
+    "RGB5A3": (ref_rgb5a3, tpl_codec.decode_rgb5a3, 16, 4, 4),
+    "RGBA8": (ref_rgba8, tpl_codec.decode_rgba8, 32, 4, 4),
+    "CMP": (ref_cmp, tpl_codec.decode_cmp, 4, 8, 8),
+}
+
+def texture_size(size, bpp, block_width, block_height):
+    """Bytes of a size x size texture, whose blocks cover the sides rounded up to the block size."""
+    return -(-size // block_width) * block_width * -(-size // block_height) * block_height * bpp // 8
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="RBToolsJS: TPL decoder benchmark")
+    # Sides that aren't a multiple of the block size are padded, as in TPL files
+    parser.add_argument("-s", "--sizes", nargs="+", type=int, default=[64, 128, 256, 512])
+    parser.add_argument("-f", "--formats", nargs="+", default=list(FORMATS))
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    arg = parser.parse_args()
+
+    print("%-8s %6s %12s %12s %9s" % ("format", "size", "per-pixel", "numpy", "speedup"))
+    for name in arg.formats:
+        reference, vectorized, bpp, block_width, block_height = FORMATS[name]
+        for size in arg.sizes:
+            data = os.urandom(texture_size(size, bpp, block_width, block_height))
+            expected = reference(size, size, data)
+            if vectorized(data, size, size).tobytes() != expected:
+                raise AssertionError("%s %dx%d: NumPy output differs from the reference decoder" % (name, size, size))
+            ref_time = best_of(lambda: reference(size, size, data), 1)
+            vec_time = best_of(lambda: vectorized(data, size, size), arg.repeat)
+            print("%-8s %6d %10.2fms %10.3fms %8.0fx" % (name, size, ref_time * 1000, vec_time * 1000, ref_time / vec_time))
+
+if __name__ == "__main__":
+    main()
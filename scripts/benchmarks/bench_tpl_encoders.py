@@ -0,0 +1,158 @@
+"""
+Benchmark: per-pixel TPL encoders vs the NumPy encoders of "lib/tpl_codec.py".
+
+The reference encoders below are the original per-pixel loops of "lib/tpl.py" with the Python 2
+style "/" divisions turned into "//". The I8, IA8 and RGBA8 output must be byte-identical to the
+reference. The other formats round instead of truncating when dropping bits, so for every format the
+benchmark checks that decoding and re-encoding the texture gives back the same bytes instead.
+
+CMP has no reference encoder, it is timed for each quality and reported with the PSNR of the pixels it
+keeps opaque, as read back by `tpl_codec.decode_cmp`. A higher quality must not give a lower PSNR.
+
+Usage: python scripts/benchmarks/bench_tpl_encoders.py [-s 64 128 256 512] [-f RGB565 CMP ...]
+"""
+
+import argparse
+import struct
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "bin" / "python"))
+
+from lib import tpl_codec
+
+def align(x, boundary):
+    return (x + boundary - 1) // boundary * boundary
+
+def flatten(rgba):
+    return rgba[0] << 0 | rgba[1] << 8 | rgba[2] << 16 | rgba[3] << 24
+
+def ref_tiles(w, h, tile_w, tile_h, pixel):
+    """Walk the tiles like the original encoders, calling pixel(rgba) inside the image and yielding 0 outside."""
+    for y1 in range(0, align(h, tile_h), tile_h):
+        for x1 in range(0, align(w, tile_w), tile_w):
+            for y in range(y1, y1 + tile_h):
+                for x in range(x1, x1 + tile_w):
+                    yield 0 if x >= w or y >= h else pixel(x, y)
+
+def ref_i8(w, h, inp):
+    def pixel(x, y):
+        rgba = flatten(inp[x + y * w])
+        return (((rgba >> 0) & 0xff) + ((rgba >> 8) & 0xff) + ((rgba >> 16) & 0xff)) // 3
+    return struct.pack(">%dB" % (align(w, 8) * align(h, 4)), *ref_tiles(w, h, 8, 4, pixel))
+
+def ref_ia8(w, h, inp):
+    def pixel(x, y):
+        rgba = flatten(inp[x + y * w])
+        i1 = (((rgba >> 0) & 0xff) + ((rgba >> 8) & 0xff) + ((rgba >> 16) & 0xff)) // 3
+        return (i1 << 8) | ((rgba >> 24) & 0xff)
+    return struct.pack(">%dH" % (align(w, 4) * align(h, 4)), *ref_tiles(w, h, 4, 4, pixel))
+
+def ref_rgb565(w, h, inp):
+    def pixel(x, y):
+        rgba = flatten(inp[x + y * w])
+        r, g, b = (rgba >> 0) & 0xff, (rgba >> 8) & 0xff, (rgba >> 16) & 0xff
+        return ((r >> 3) << 11) | ((g >> 2) << 5) | (b >> 3)
+    return struct.pack(">%dH" % (align(w, 4) * align(h, 4)), *ref_tiles(w, h, 4, 4, pixel))
+
+def ref_rgb5a3(w, h, inp):
+    def pixel(x, y):
+        rgba = flatten(inp[x + y * w])
+        r, g, b, a = (rgba >> 0) & 0xff, (rgba >> 8) & 0xff, (rgba >> 16) & 0xff, (rgba >> 24) & 0xff
+        if a <= 0xda:
+            return ((a * 7 // 255) << 12) | ((r * 15 // 255) << 8) | ((g * 15 // 255) << 4) | (b * 15 // 255)
+        return (1 << 15) | ((r * 31 // 255) << 10) | ((g * 31 // 255) << 5) | (b * 31 // 255)
+    return struct.pack(">%dH" % (align(w, 4) * align(h, 4)), *ref_tiles(w, h, 4, 4, pixel))
+
+def ref_rgba8(w, h, inp):
+    out = []
+    for y1 in range(0, align(h, 4), 4):
+        for x1 in range(0, align(w, 4), 4):
+            block = []
+            for y in range(y1, y1 + 4):
+                for x in range(x1, x1 + 4):
+                    # The original kept the last pixel it read outside of the image
+                    if x < w and y < h:
+                        rgba = inp[x + y * w]
+                    block.append(rgba)
+            for r, g, b, a in block:
+                out += (a, r)
+            for r, g, b, a in block:
+                out += (g, b)
+    return bytes(out)
+
+# name -> (format ID, per-pixel reference encoder or None)
+FORMATS = {
+    "I4": (0, None),
+    "I8": (1, ref_i8),
+    "IA4": (2, None),
+    "IA8": (3, ref_ia8),
+    "RGB565": (4, ref_rgb565),
+    "RGB5A3": (5, ref_rgb5a3),
+    "RGBA8": (6, ref_rgba8),
+    "CMP": (14, None),
+}
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def test_image(size):
+    """Smooth gradients with a noisy patch, a transparent corner and a half-transparent band."""
+    y, x = np.mgrid[0:size, 0:size]
+    image = np.stack((x * 255 // max(size - 1, 1), y * 255 // max(size - 1, 1), (x + y) * 127 // max(size - 1, 1), np.full_like(x, 255)), axis=-1)
+    image = image.astype(np.uint8)
+    rng = np.random.default_rng(size)
+    image[size // 4:size // 2, size // 4:size // 2, 0:3] = rng.integers(0, 256, (size // 2 - size // 4, size // 2 - size // 4, 3))
+    image[:size // 8, :size // 8, 3] = 0
+    image[size - size // 8:, :, 3] = 0x80
+    return image
+
+def psnr(a, b, mask):
+    mse = ((a[..., 0:3].astype(np.float64) - b[..., 0:3]) ** 2)[mask].mean()
+    return float("inf") if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+def main():
+    parser = argparse.ArgumentParser(description="RBToolsJS: TPL encoder benchmark")
+    parser.add_argument("-s", "--sizes", type=int, nargs="+", default=[64, 128, 256, 512])
+    parser.add_argument("-f", "--formats", nargs="+", default=list(FORMATS), choices=list(FORMATS))
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print("%-8s %6s %12s %12s %9s" % ("Format", "size", "per-pixel", "numpy", "speedup"))
+    for size in args.sizes:
+        image = test_image(size)
+        pixels = [tuple(int(v) for v in p) for p in image.reshape(-1, 4)]
+        for name in args.formats:
+            format_id, ref = FORMATS[name]
+            if name == "CMP":
+                psnrs = {}
+                for quality in tpl_codec.CMP_QUALITIES:
+                    fast, data = best_of(lambda: tpl_codec.encode_cmp(image, quality), args.repeat)
+                    decoded = tpl_codec.decode_cmp(data, size, size)
+                    psnrs[quality] = psnr(image, decoded, image[..., 3] >= tpl_codec.CMP_ALPHA_THRESHOLD)
+                    print("%-8s %6d %12s %10.2fms   PSNR %.2f dB (%s)" % (name, size, "-", fast * 1000, psnrs[quality], quality))
+                assert psnrs["best"] >= psnrs["normal"] >= psnrs["fast"], "CMP %d: a higher quality gave a lower PSNR" % size
+                continue
+
+            encode = tpl_codec.ENCODERS[format_id]
+            fast, data = best_of(lambda: encode(image), args.repeat)
+            decoded = tpl_codec.DECODERS[format_id](data, size, size)
+            assert encode(decoded) == data, "%s %d: decode/encode round trip changed the texture" % (name, size)
+            if ref is None:
+                print("%-8s %6d %12s %10.2fms" % (name, size, "-", fast * 1000))
+                continue
+            slow, expected = best_of(lambda: ref(size, size, pixels), 1)
+            if name not in ("RGB565", "RGB5A3"):
+                assert expected == data, "%s %d: output differs from the per-pixel encoder" % (name, size)
+            print("%-8s %6d %10.2fms %10.2fms %8.0fx" % (name, size, slow * 1000, fast * 1000, slow / fast))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: TPL header parse throughput of "lib/tpl.py" over a directory of textures.
+
+Every ".tpl" file of the directory is loaded as is, and every ".png_wii" file gets the default TPL
+header that `PNG_WII` puts in place of its 32-byte HMX header. Without a directory, a temporary one
+is filled with synthetic textures of every encodable format.
+
+Three numbers are reported:
+  parse - TPLHeaders.parse() on bytes already in memory
+  cold  - TPL(path) followed by getSizes() and getFormat(), which reads and parses the file once
+  warm  - getSizes() and getFormat() again on the same TPL objects, served by the parsed headers
+
+Usage: python scripts/benchmarks/bench_tpl_headers.py [directory] [-n 200] [-r 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "bin" / "python"))
+
+from lib import tpl_codec
+from lib.tpl import PNG_WII, TPL, TPLHeaders, TPLTexture, TPLHeader, TPLTextureHeader
+
+def make_textures(folder, count):
+    """Write count single-texture TPL files of random sizes and formats into folder."""
+    rng = np.random.default_rng(0)
+    formats = sorted(tpl_codec.ENCODERS)
+    for i in range(count):
+        width, height = (int(v) for v in rng.choice([8, 16, 32, 64, 128], 2))
+        format_id = formats[i % len(formats)]
+        image = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+        head = TPLHeader(magic=0x0020AF30, ntextures=1, header_size=0x0C)
+        tex = TPLTexture(header_offset=0x14)
+        texhead = TPLTextureHeader(height=height, width=width, format=format_id, data_off=0x14 + TPLTextureHeader.size, filter=(1, 1))
+        with open(os.path.join(folder, "texture%04d.tpl" % i), "wb") as f:
+            f.write(head.pack() + tex.pack() + texhead.pack() + tpl_codec.ENCODERS[format_id](image))
+
+def load(path):
+    if path.endswith(".png_wii"):
+        texture = PNG_WII(path)
+        return bytes(texture.tpl_header) + texture.data[32:]
+    with open(path, "rb") as f:
+        return f.read()
+
+def rate(count, seconds):
+    return "%10.0f/s  (%.2f us each)" % (count / seconds, seconds / count * 1e6)
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run(folder, repeat):
+    paths = sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith((".tpl", ".png_wii")))
+    if not paths:
+        raise SystemExit("No .tpl or .png_wii files in %s" % folder)
+    blobs = [load(path) for path in paths]
+    # PNG_WII textures are parsed from memory, they need their header swapped first
+    sources = [blob if path.endswith(".png_wii") else path for path, blob in zip(paths, blobs)]
+
+    parse = best_of(lambda: [TPLHeaders.parse(blob) for blob in blobs], repeat)
+
+    tpls = []
+
+    def cold():
+        tpls.clear()
+        for source in sources:
+            tpl = TPL(source)
+            tpl.getSizes()
+            tpl.getFormat()
+            tpls.append(tpl)
+
+    cold_time = best_of(cold, repeat)
+    warm = best_of(lambda: [(tpl.getSizes(), tpl.getFormat()) for tpl in tpls], repeat)
+
+    print("%d textures in %s" % (len(paths), folder))
+    print("parse %s" % rate(len(paths), parse))
+    print("cold  %s" % rate(len(paths), cold_time))
+    print("warm  %s" % rate(len(paths), warm))
+
+def main():
+    parser = argparse.ArgumentParser(description="RBToolsJS: TPL header parse benchmark")
+    parser.add_argument("directory", nargs="?", help="Folder with .tpl/.png_wii files (synthetic textures if omitted)")
+    parser.add_argument("-n", "--count", type=int, default=200, help="Number of synthetic textures")
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.directory:
+        run(args.directory, args.repeat)
+    else:
+        with tempfile.TemporaryDirectory() as folder:
+            make_textures(folder, args.count)
+            run(folder, args.repeat)
+
+if __name__ == "__main__":
+    main()
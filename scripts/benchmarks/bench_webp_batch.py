@@ -0,0 +1,72 @@
+"""
+Benchmark: one "webp_data_url.py" process per album art vs a single "webp_data_url_batch.py" process.
+
+A temporary folder is filled with count random 600x600 JPEG covers. The per-process run starts the
+interpreter (and imports Pillow) once per cover, like the TypeScript wrappers do; the batch runs read
+every job from stdin, in this process (-w 1) and on the default process pool. Every run must produce
+the same data URLs.
+
+Usage: python scripts/benchmarks/bench_webp_batch.py [-n 50] [-s 256]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+PYTHON_PATH = Path(__file__).resolve().parents[2] / "src" / "bin" / "python"
+
+# Every run converts the covers, none reads them from the thumbnail cache
+ENV = dict(os.environ, RBTOOLS_THUMBNAIL_CACHE="0")
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def per_process(paths, size):
+    return [
+        subprocess.run([sys.executable, "webp_data_url.py", path, "-x", str(size), "-y", str(size)], cwd=PYTHON_PATH, env=ENV, capture_output=True, text=True, check=True).stdout.strip()
+        for path in paths
+    ]
+
+def batch(paths, size, workers):
+    jobs = "".join(json.dumps({"id": i, "src": path, "width": size, "height": size}) + "\n" for i, path in enumerate(paths))
+    output = subprocess.run([sys.executable, "webp_data_url_batch.py", "-w", str(workers)], cwd=PYTHON_PATH, env=ENV, input=jobs, capture_output=True, text=True, check=True).stdout
+    results = {}
+    for line in output.splitlines():
+        result = json.loads(line)
+        results[result["id"]] = result["dataUrl"]
+    return [results[i] for i in range(len(paths))]
+
+def main():
+    parser = argparse.ArgumentParser(description="RBToolsJS: WEBP data URL batch benchmark")
+    parser.add_argument("-n", "--count", type=int, default=50)
+    parser.add_argument("-s", "--size", type=int, default=256)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as folder:
+        paths = []
+        for i in range(args.count):
+            path = os.path.join(folder, "cover%03d.jpg" % i)
+            Image.fromarray(rng.integers(0, 256, (600, 600, 3), dtype=np.uint8)).save(path, quality=90)
+            paths.append(path)
+
+        single, expected = timed(lambda: per_process(paths, args.size))
+        print("%d covers" % args.count)
+        print("per process   %8.2fs  (%.1f ms each)" % (single, single / args.count * 1000))
+        for name, workers in (("batch -w 1", 1), ("batch pool", 0)):
+            seconds, urls = timed(lambda: batch(paths, args.size, workers))
+            assert urls == expected, "%s: data URLs differ from the per-process run" % name
+            print("%-13s %8.2fs  (%.1f ms each, %.1fx)" % (name, seconds, seconds / args.count * 1000, single / seconds))
+
+if __name__ == "__main__":
+    main()
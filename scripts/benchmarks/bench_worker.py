@@ -0,0 +1,76 @@
+"""
+Benchmark: one Python process per call vs calls to a running "worker.py".
+
+Each call runs "img_file_stat" on the same small PNG: as "python img_file_stat.py", the way the
+TypeScript wrappers spawn the scripts, and as a JSON-RPC request to a worker that was started (and
+warmed up with one call) beforehand. "ping" is the round trip of the protocol alone. Both ways must
+return the same statistics.
+
+Usage: python scripts/benchmarks/bench_worker.py [-n 20]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+PYTHON_PATH = Path(__file__).resolve().parents[2] / "src" / "bin" / "python"
+
+class Worker:
+    def __init__(self):
+        self.process = subprocess.Popen([sys.executable, "worker.py"], cwd=PYTHON_PATH, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        self.next_id = 0
+
+    def call(self, method, params=None):
+        self.next_id += 1
+        self.process.stdin.write(json.dumps({"jsonrpc": "2.0", "id": self.next_id, "method": method, "params": params or {}}) + "\n")
+        self.process.stdin.flush()
+        response = json.loads(self.process.stdout.readline())
+        assert response["id"] == self.next_id and "error" not in response, response
+        return response["result"]
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+def timed(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        result = func()
+    return (time.perf_counter() - start) / count, result
+
+def main():
+    parser = argparse.ArgumentParser(description="RBToolsJS: Python worker benchmark")
+    parser.add_argument("-n", "--count", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "cover.png")
+        Image.radial_gradient("L").convert("RGB").save(path)
+
+        spawned, expected = timed(lambda: json.loads(subprocess.run([sys.executable, "img_file_stat.py", path], cwd=PYTHON_PATH, capture_output=True, text=True, check=True).stdout), args.count)
+
+        worker = Worker()
+        try:
+            start = time.perf_counter()
+            worker.call("img_file_stat", [path])
+            first = time.perf_counter() - start
+            called, result = timed(lambda: worker.call("img_file_stat", [path]), args.count * 10)
+            pinged, _ = timed(lambda: worker.call("ping"), args.count * 10)
+        finally:
+            worker.close()
+        assert result["value"] == expected, "the worker's statistics differ from the script's"
+
+    print("img_file_stat, new process    %8.2f ms" % (spawned * 1000))
+    print("img_file_stat, first call     %8.2f ms  (starts the worker, imports Pillow)" % (first * 1000))
+    print("img_file_stat, worker         %8.3f ms  (%.0fx)" % (called * 1000, spawned / called))
+    print("ping, worker                  %8.3f ms" % (pinged * 1000))
+
+if __name__ == "__main__":
+    main()
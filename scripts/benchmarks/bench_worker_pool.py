@@ -0,0 +1,120 @@
+"""
+Benchmark: "worker.py" on one shared thread pool vs "worker.py --pool" under a mixed load.
+
+A burst of CPU-bound "webp_data_url" jobs on a large cover (thumbnail cache off) is sent together
+with cheap I/O-bound "img_file_stat" calls. On the shared pool the stats wait behind the textures;
+with --pool they run on the "io" class, which keeps its own warm process whatever the texture
+queue holds. The first-call latency shows the preloaded imports, and --max-jobs must recycle the
+texture processes without losing a job.
+
+Usage: python scripts/benchmarks/bench_worker_pool.py [-t 16] [-s 8] [-w 1]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from PIL import Image
+
+PYTHON_PATH = Path(__file__).resolve().parents[2] / "src" / "bin" / "python"
+ENV = dict(os.environ, RBTOOLS_THUMBNAIL_CACHE="0")
+
+class Worker:
+    def __init__(self, *args):
+        self.process = subprocess.Popen([sys.executable, "worker.py", *args], cwd=PYTHON_PATH, env=ENV, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        self.next_id = 0
+        self.lock = threading.Lock()
+        self.waiting = {}
+        self.reader = threading.Thread(target=self.read, daemon=True)
+        self.reader.start()
+
+    def read(self):
+        for line in self.process.stdout:
+            response = json.loads(line)
+            event, slot = self.waiting.pop(response["id"])
+            slot.append((time.perf_counter(), response))
+            event.set()
+
+    def send(self, method, params=None):
+        event, slot = threading.Event(), []
+        with self.lock:
+            self.next_id += 1
+            self.waiting[self.next_id] = (event, slot)
+            self.process.stdin.write(json.dumps({"jsonrpc": "2.0", "id": self.next_id, "method": method, "params": params or {}}) + "\n")
+            self.process.stdin.flush()
+        sent = time.perf_counter()
+
+        def wait():
+            event.wait()
+            done, response = slot[0]
+            assert "error" not in response, response
+            return done - sent, response["result"]
+        return wait
+
+    def call(self, method, params=None):
+        return self.send(method, params)()
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+def run(args, worker_args, cover, small):
+    start = time.perf_counter()
+    worker = Worker(*worker_args)
+    try:
+        worker.call("ping")
+        started = time.perf_counter() - start
+        first, _ = worker.call("img_file_stat", [small])
+
+        textures = [worker.send("webp_data_url", [cover, 256, 256]) for _ in range(args.textures)]
+        stats = []
+        for _ in range(args.stats):
+            stats.append(worker.send("img_file_stat", [small]))
+            time.sleep(0.005)
+        stat_latencies = [wait()[0] for wait in stats]
+        texture_latencies = [wait()[0] for wait in textures]
+        pool_stats = worker.call("stats")[1] if "--pool" in worker_args else None
+    finally:
+        worker.close()
+    return started, first, stat_latencies, texture_latencies, pool_stats
+
+def main():
+    parser = argparse.ArgumentParser(description="RBToolsJS: Python worker pool benchmark")
+    parser.add_argument("-t", "--textures", type=int, default=16)
+    parser.add_argument("-s", "--stats", type=int, default=8)
+    parser.add_argument("-w", "--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        cover = os.path.join(folder, "cover.png")
+        small = os.path.join(folder, "small.png")
+        Image.radial_gradient("L").resize((2000, 2000)).convert("RGB").save(cover)
+        Image.radial_gradient("L").save(small)
+
+        workers = str(args.workers)
+        configs = [
+            ("threads", ["-w", workers]),
+            ("--pool", ["-w", workers, "--pool"]),
+            ("--pool --max-jobs 4", ["-w", workers, "--pool", "--max-jobs", "4"]),
+        ]
+        for name, worker_args in configs:
+            started, first, stat_latencies, texture_latencies, pool_stats = run(args, worker_args, cover, small)
+            print("%s" % name)
+            print("  start + ping                %8.1f ms" % (started * 1000))
+            print("  first img_file_stat         %8.1f ms" % (first * 1000))
+            print("  img_file_stat under load    %8.1f ms median, %.1f ms max" % (statistics.median(stat_latencies) * 1000, max(stat_latencies) * 1000))
+            print("  webp_data_url under load    %8.1f ms median, %.1f ms max" % (statistics.median(texture_latencies) * 1000, max(texture_latencies) * 1000))
+            if pool_stats:
+                texture = pool_stats["texture"]
+                print("  texture class: %d completed, %d recycled, %d errors" % (texture["completed"], texture["recycled"], texture["errors"]))
+                assert texture["completed"] == args.textures and texture["errors"] == 0
+
+if __name__ == "__main__":
+    main()
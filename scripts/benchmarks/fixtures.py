@@ -0,0 +1,283 @@
+"""
+Synthetic fixtures for the benchmarks, generated offline from a seed.
+
+- `make_stfs`: a CON package holding the given files, with a share of its data blocks shuffled to
+  fragment the block chains.
+- `make_mogg`: an encrypted MOGG of any version from 11 to 17, built by re-encrypting a version 10
+  MOGG with "lib/mogg.py" itself.
+- `make_tpl`: a single texture TPL of any format, palette formats included.
+- `make_pkg3`: a small PS3 PKG3 (retail AES-CTR or debug XOR-SHA1) of the given files.
+
+Every generator returns bytes; the same arguments always give the same bytes.
+"""
+
+import contextlib
+import hashlib
+import io
+import random
+import struct
+import sys
+from pathlib import Path
+from typing import Dict
+
+PYTHON_PATH = Path(__file__).resolve().parents[2] / "src" / "bin" / "python"
+if str(PYTHON_PATH) not in sys.path:
+    sys.path.insert(0, str(PYTHON_PATH))
+
+STFS_BLOCK = 0x1000
+STFS_HEADER_SIZE = 0xC000
+# Entry ID of a CON whose hash tables are one block long
+STFS_ENTRY_ID = 0xAD0E
+STFS_END_OF_CHAIN = 0xFFFFFF
+
+def random_bytes(size: int, seed: int) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+def stfs_files(total_size: int, count: int, seed=1) -> Dict[str, bytes]:
+    """count files of random sizes adding up to about total_size, spread over a few folders."""
+    rnd = random.Random(seed)
+    weights = [rnd.uniform(0.2, 1.0) for _ in range(count)]
+    scale = total_size / sum(weights)
+    return {
+        "songs/song%d/file%d.bin" % (i % 4, i): rnd.randbytes(max(1, int(weight * scale)))
+        for i, weight in enumerate(weights)
+    }
+
+def _stfs_disk_block(block: int) -> int:
+    """On-disk block of a data block, as STFS.fix_blocknum() with one-block hash tables."""
+    adjust = 0
+    if block >= 0xAA:
+        adjust += block // 0xAA + 1
+    if block >= 0x70E4:
+        adjust += block // 0x70E4 + 1
+    return adjust + block
+
+def _stfs_hash_record(block: int):
+    """(on-disk table block, record index) of a data block, as STFS.get_blockhash()."""
+    table = block // 0xAA * 0xAB
+    if block >= 0xAA:
+        table += block // 0x70E4 + 1
+        if block >= 0x70E4:
+            table += 1
+    return table - 1, block % 0xAA
+
+def make_stfs(files: Dict[str, bytes], fragmentation=0.0, seed=1) -> bytes:
+    """A CON package of files ("folder/name" paths), with fragmentation (0 to 1) of its data blocks out of order."""
+    rnd = random.Random(seed)
+    folders = []
+    for path in files:
+        parts = path.split("/")[:-1]
+        for i in range(len(parts)):
+            folder = "/".join(parts[:i + 1])
+            if folder not in folders:
+                folders.append(folder)
+
+    # (name, is folder, parent index, data)
+    entries = []
+    index = {}
+    for folder in folders:
+        index[folder] = len(entries)
+        entries.append((folder.split("/")[-1], True, index.get(folder.rpartition("/")[0], -1), b""))
+    for path, data in files.items():
+        entries.append((path.split("/")[-1], False, index.get(path.rpartition("/")[0], -1), data))
+
+    table_blocks = (len(entries) * 0x40 + STFS_BLOCK - 1) // STFS_BLOCK
+    total_blocks = table_blocks + sum((len(entry[3]) + STFS_BLOCK - 1) // STFS_BLOCK for entry in entries)
+    order = list(range(table_blocks, total_blocks))
+    moved = rnd.sample(range(len(order)), int(len(order) * fragmentation))
+    for i, j in zip(moved, rnd.sample(moved, len(moved))):
+        order[i], order[j] = order[j], order[i]
+
+    blocks = {}
+    position = 0
+    filetable = bytearray()
+    for name, is_folder, parent, data in entries:
+        count = (len(data) + STFS_BLOCK - 1) // STFS_BLOCK
+        chain = order[position:position + count]
+        position += count
+        for i, block in enumerate(chain):
+            blocks[block] = (data[i * STFS_BLOCK:(i + 1) * STFS_BLOCK], chain[i + 1] if i + 1 < count else STFS_END_OF_CHAIN)
+        record = bytearray(0x40)
+        encoded = name.encode()
+        record[:len(encoded)] = encoded
+        record[0x28] = (0x80 if is_folder else 0) | len(encoded)
+        record[0x29:0x2C] = record[0x2C:0x2F] = count.to_bytes(3, "little")
+        record[0x2F:0x32] = (chain[0] if chain else 0).to_bytes(3, "little")
+        record[0x32:0x38] = struct.pack(">hI", parent, len(data))
+        filetable += record
+    filetable += bytes(table_blocks * STFS_BLOCK - len(filetable))
+    for i in range(table_blocks):
+        blocks[i] = (bytes(filetable[i * STFS_BLOCK:(i + 1) * STFS_BLOCK]), i + 1 if i + 1 < table_blocks else STFS_END_OF_CHAIN)
+
+    last = max(max(_stfs_disk_block(block), _stfs_hash_record(block)[0]) for block in range(total_blocks))
+    out = bytearray(STFS_HEADER_SIZE + (last + 1) * STFS_BLOCK)
+    out[0:4] = b"CON "
+    out[0x340:0x344] = struct.pack(">I", STFS_ENTRY_ID)
+    out[0x37C:0x37E] = struct.pack("<H", table_blocks)
+    out[0x395:0x399] = struct.pack(">I", total_blocks)
+    out[0x411:0x419] = "Test".encode("utf-16-be")
+    for block, (data, next_block) in blocks.items():
+        offset = STFS_HEADER_SIZE + _stfs_disk_block(block) * STFS_BLOCK
+        out[offset:offset + len(data)] = data
+        table, record = _stfs_hash_record(block)
+        offset = STFS_HEADER_SIZE + table * STFS_BLOCK + record * 0x18
+        out[offset:offset + 0x14] = hashlib.sha1(data.ljust(STFS_BLOCK, b"\0")).digest()
+        out[offset + 0x14] = 0x80
+        out[offset + 0x15:offset + 0x18] = next_block.to_bytes(3, "big")
+    return bytes(out)
+
+MOGG_VERSIONS = tuple(range(11, 18))
+# Game ID of the version 17 MOGGs (1 is Rock Band 4)
+MOGG_V17_GAME = 1
+
+class _KeepOpen(io.BytesIO):
+    """A BytesIO that survives the close() of reencrypt_mogg()."""
+
+    def close(self) -> None:
+        pass
+
+def make_mogg(version: int, payload_size: int, seed=1, xbox=True, red=False) -> bytes:
+    """An encrypted MOGG of version 11 to 17 around payload_size bytes of OGG-looking data."""
+    from lib.mogg import reencrypt_mogg
+
+    rnd = random.Random(seed)
+    seek_entries = 2
+    header = bytearray(20 + seek_entries * 8 + 16)
+    if version > 11:
+        # Magic A/B, PS3 and Xbox key masks, [version 17 game,] key index
+        header += rnd.randbytes(16 + 32) + (MOGG_V17_GAME.to_bytes(8, "little") if version == 17 else b"") + rnd.randrange(6).to_bytes(8, "little")
+    struct.pack_into("<5I", header, 0, 10, len(header), 0x10, 20000, seek_entries)
+    header[20 + seek_entries * 8:20 + seek_entries * 8 + 16] = rnd.randbytes(16)
+    plain = bytes(header) + b"OggS" + rnd.randbytes(payload_size - 4)
+
+    out = _KeepOpen()
+    with contextlib.redirect_stdout(io.StringIO()):
+        failed = reencrypt_mogg(xbox, red, version, io.BytesIO(plain), out)
+    assert not failed, "could not encrypt a version %d MOGG" % version
+    return out.getvalue()
+
+TPL_MAGIC = 0x0020AF30
+TPL_DATA_OFFSET = 0x40
+# TPL palette format of the CI fixtures (RGB5A3) and palette sizes
+TPL_PALETTE_FORMAT = 2
+TPL_PALETTE_ITEMS = {8: 16, 9: 256, 10: 0x4000}
+
+def tpl_image(width: int, height: int):
+    """An RGBA gradient with some alpha, as a PIL image."""
+    from PIL import Image
+
+    red = Image.linear_gradient("L").resize((width, height))
+    green = Image.linear_gradient("L").transpose(Image.Transpose.ROTATE_90).resize((width, height))
+    blue = Image.radial_gradient("L").resize((width, height))
+    alpha = Image.linear_gradient("L").transpose(Image.Transpose.ROTATE_180).resize((width, height))
+    return Image.merge("RGBA", (red, green, blue, alpha))
+
+def make_tpl(format: int, width: int, height: int, seed=1) -> bytes:
+    """A TPL with one texture of the format ID (see lib.tpl.FORMAT_NAMES). Palette formats get random indices."""
+    from lib import tpl_codec
+    from lib.tpl import FORMAT_NAMES, TPLHeader, TPLPaletteHeader, TPLTexture, TPLTextureHeader
+
+    rnd = random.Random(seed)
+    name = FORMAT_NAMES[format]
+    if format in TPL_PALETTE_ITEMS:
+        items = TPL_PALETTE_ITEMS[format]
+        size = tpl_codec.texture_size(format, width, height)
+        if format == 10:
+            data = b"".join(struct.pack(">H", rnd.randrange(items)) for _ in range(size // 2))
+        else:
+            data = rnd.randbytes(size)
+        palette = rnd.randbytes(items * 2)
+    else:
+        data = getattr(tpl_codec, "encode_" + name.lower())(tpl_image(width, height))
+        palette = b""
+
+    palette_offset = TPL_DATA_OFFSET + len(data) if palette else 0
+    palette_header_size = TPLPaletteHeader.size if palette else 0
+    out = bytearray(TPL_DATA_OFFSET)
+    out[0:TPLHeader.size] = TPLHeader(TPL_MAGIC, 1, TPLHeader.size).pack()
+    texture_offset = TPLHeader.size + TPLTexture.size
+    out[TPLHeader.size:texture_offset] = TPLTexture(texture_offset, palette_offset).pack()
+    out[texture_offset:texture_offset + TPLTextureHeader.size] = TPLTextureHeader(height, width, format, TPL_DATA_OFFSET).pack()
+    out += data
+    if palette:
+        out += TPLPaletteHeader(len(palette) // 2, 0, 0, TPL_PALETTE_FORMAT, palette_offset + palette_header_size).pack()
+        out += palette
+    return bytes(out)
+
+PKG3_DATA_OFFSET = 0x400
+PKG3_FILE_FLAGS = 0x3
+PKG3_CONTENT_ID = "UP0006-BLUS30050_00-RBTOOLSBENCH0001"
+
+def _pkg3_align(size: int) -> int:
+    return (size + 0xF) & ~0xF
+
+def pkg3_module():
+    """lib.pkg with its PKG3 structure definitions finalized, which its command line does on start."""
+    from lib import pkg
+
+    for fields, name in (
+        (pkg.CONST_PKG3_MAIN_HEADER_FIELDS, "PKG3 Main Header"),
+        (pkg.CONST_PKG3_PS3_DIGEST_FIELDS, "PKG3 PS3 0x40 Digest"),
+        (pkg.CONST_PKG3_EXT_HEADER_FIELDS, "PKG3 Ext Header"),
+        (pkg.CONST_PKG3_ITEM_ENTRY_FIELDS, "PKG3 Item Entry"),
+    ):
+        if "STRUCTURE_SIZE" not in fields:
+            pkg.finalizeBytesStructure(fields, pkg.CONST_PKG3_HEADER_ENDIAN, name, "", 0)
+    return pkg
+
+def make_pkg3(files: Dict[str, bytes], debug=False, seed=1) -> bytes:
+    """A PS3 PKG3 of files, encrypted with the retail PS3 content key or, for debug, the XOR-SHA1 stream."""
+    from Cryptodome.Cipher import AES
+    from Cryptodome.Hash import SHA1
+    from Cryptodome.Util import Counter
+
+    pkg = pkg3_module()
+    rnd = random.Random(seed)
+    digest = rnd.randbytes(16)
+    data_riv = rnd.randbytes(16)
+
+    # Items info: the item entries, then the names, then the data, each 16-byte aligned
+    entry_size = pkg.CONST_PKG3_ITEM_ENTRY_FIELDS["STRUCTURE_SIZE"]
+    names = [name.encode() for name in files]
+    offset = len(files) * entry_size
+    name_offsets = []
+    for name in names:
+        name_offsets.append(offset)
+        offset += _pkg3_align(len(name))
+    body = bytearray(offset)
+    data_offsets = []
+    for data in files.values():
+        data_offsets.append(len(body))
+        body += data + bytes(_pkg3_align(len(data)) - len(data))
+    for i, (name, data) in enumerate(zip(names, files.values())):
+        struct.pack_into(">2I2QI4x", body, i * entry_size, name_offsets[i], len(name), data_offsets[i], len(data), PKG3_FILE_FLAGS)
+        body[name_offsets[i]:name_offsets[i] + len(name)] = name
+
+    if debug:
+        key = bytearray(0x40)
+        key[0x00:0x08] = key[0x08:0x10] = digest[0x00:0x08]
+        key[0x10:0x18] = key[0x18:0x20] = digest[0x08:0x10]
+        counter = int.from_bytes(key, "big")
+        for i in range(0, len(body), 0x10):
+            mask = SHA1.new((counter + i // 0x10).to_bytes(0x40, "big")).digest()
+            body[i:i + 0x10] = bytes(a ^ b for a, b in zip(body[i:i + 0x10], mask))
+    else:
+        counter = Counter.new(128, initial_value=int.from_bytes(data_riv, "big"))
+        body = bytearray(AES.new(pkg.CONST_PKG3_CONTENT_KEYS[0]["KEY"], AES.MODE_CTR, counter=counter).encrypt(bytes(body)))
+
+    header_size = pkg.CONST_PKG3_MAIN_HEADER_FIELDS["STRUCTURE_SIZE"]
+    metadata_offset = header_size + pkg.CONST_PKG3_PS3_DIGEST_FIELDS["STRUCTURE_SIZE"]
+    metadata = b"".join(struct.pack(">2I", entry_type, len(value)) + value for entry_type, value in (
+        (0x01, struct.pack(">I", 3)),  # DRM type: free
+        (0x02, struct.pack(">I", 4)),  # Content type: game data
+        (0x03, struct.pack(">I", 0)),
+        (0x04, struct.pack(">Q", len(body))),
+    ))
+    head = bytearray(PKG3_DATA_OFFSET)
+    struct.pack_into(
+        ">4s2H4I3Q48s16s16s", head, 0,
+        pkg.CONST_PKG3_MAGIC, 0x0000 if debug else 0x8000, 0x1, metadata_offset, 4, PKG3_DATA_OFFSET - header_size, len(files),
+        PKG3_DATA_OFFSET + len(body), PKG3_DATA_OFFSET, len(body), PKG3_CONTENT_ID.encode(), digest, data_riv,
+    )
+    head[metadata_offset:metadata_offset + len(metadata)] = metadata
+    return bytes(head + body)
@@ -0,0 +1,57 @@
+"""
+Check: the HMX headers of `lib/headers.py` against `imageHeaders` ("src/lib/image/headers.ts"), the
+table the TypeScript encoder writes png_xbox/png_ps3 textures with.
+
+- Every "<size>pDTX1/5" entry of the table must be what `hmx_header_for` returns for a Rock Band 3
+  texture of that size and format.
+- Every registry entry covered by the table (RB3, square, with mips) must have its bytes, except the
+  ones of `KNOWN_DIFFERENCES`, header files of game textures kept for detection only.
+
+Usage: python scripts/benchmarks/test_image_headers.py (or with pytest)
+"""
+
+import re
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "src" / "bin" / "python"))
+
+from lib.headers import FORMAT_NAMES, hmx_header_for, registry
+
+TS_HEADERS = ROOT / "src" / "lib" / "image" / "headers.ts"
+
+# Header files whose bytes differ from the table on purpose -> why
+KNOWN_DIFFERENCES = {
+    "RB3_256x256_DXT1": "bytes per line of the game files (128), the table has 256",
+}
+
+def image_headers():
+    """(side, FourCC) -> the 32 bytes of each png_xbox/png_ps3 entry of `imageHeaders`."""
+    table = {}
+    for side, kind, values in re.findall(r"'(\d+)pDTX([15])': \[([\d, ]+)\]", TS_HEADERS.read_text(encoding="utf-8")):
+        table[(int(side), b"DXT" + kind.encode())] = bytes(int(value) for value in values.split(","))
+    assert table, "no png_xbox/png_ps3 headers found in %s" % TS_HEADERS
+    return table
+
+def test_hmx_header_for_matches_table():
+    for (side, fourcc), data in image_headers().items():
+        assert hmx_header_for(side, side, fourcc) == data, "%dp%s" % (side, fourcc.decode())
+
+def test_registry_matches_table():
+    table = image_headers()
+    names = {name: fourcc for fourcc, name in FORMAT_NAMES.items()}
+    for entry in registry().entries.values():
+        key = entry.key
+        data = table.get((key.width, names[key.format]))
+        if key.game != "RB3" or key.width != key.height or not key.mips or data is None:
+            continue
+        if entry.name in KNOWN_DIFFERENCES:
+            assert entry.data != data, "%s now matches the table, remove it from KNOWN_DIFFERENCES" % entry.name
+            continue
+        assert entry.data == data, entry.name
+
+if __name__ == "__main__":
+    for test in (test_hmx_header_for_matches_table, test_registry_matches_table):
+        test()
+        print("ok", test.__name__)
@@ -10,6 +10,12 @@ except ImportError:
     print("Pillow is not installed. Installing...")
     install("Pillow")
 
+try:
+    import numpy
+except ImportError:
+    print("NumPy is not installed. Installing...")
+    install("numpy")
+
 try:
     import mido
 except ImportError:
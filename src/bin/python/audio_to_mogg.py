@@ -3,6 +3,8 @@ from typing import List
 from pydub import AudioSegment
 from pydub.exceptions import CouldntDecodeError
 from pathlib import Path
+from lib.progress import Progress, add_arguments as add_progress_arguments, open_channel, status
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
 
 def channel_order_fix(audio_channels: List[AudioSegment]) -> List[AudioSegment]:
     """
@@ -139,49 +141,63 @@ def join_audio_files(input_files: List[str], output_file: str, quality: int) ->
     """
     audio_channels = []
 
-    # Load each input file and separate stereo to mono
-    for file in input_files:
-        try:
-            if os.path.exists(file):
-                if is_valid_audio_file(file):
-                    audio = AudioSegment.from_file(file)
-                    channels = separate_stereo_to_mono(audio)
-                    audio_channels.extend(channels)
+    # The bytes of the input files count as they're loaded, the export only gets a status message
+    total = sum(os.path.getsize(file) for file in input_files if os.path.isfile(file))
+    with Progress('audio_to_mogg', total, len(input_files) + 1) as progress:
+        # Load each input file and separate stereo to mono
+        for file in input_files:
+            try:
+                if os.path.exists(file):
+                    if is_valid_audio_file(file):
+                        audio = AudioSegment.from_file(file)
+                        channels = separate_stereo_to_mono(audio)
+                        audio_channels.extend(channels)
+                        progress.advance(os.path.getsize(file))
+                        progress.file(file, os.path.getsize(file))
+                    else:
+                        status(f"{file} is not a valid audio file.", "warning")
                 else:
-                    print(f"{file} is not a valid audio file.")
-            else:
-                print(f"{file} does not exist.")
-        except Exception as e:
-            print(f"Error processing {file}: {e}")
+                    status(f"{file} does not exist.", "warning")
+            except Exception as e:
+                status(f"Error processing {file}: {e}", "error")
 
-    # Export multitrack audio to file
-    try:
-        multitrack = channel_order_fix(AudioSegment.from_mono_audiosegments(*audio_channels).split_to_mono())
-
-        AudioSegment.from_mono_audiosegments(*multitrack).export(Path(output_file).with_suffix('.ogg'), format='ogg', codec='libvorbis', parameters=['-q', str(quality)])
-    except ValueError:
-        backing_path = input_files[[i for i, file_path in enumerate(input_files) if file_path.endswith("backing.wav")][0]]
-        backing_segment: AudioSegment = AudioSegment.from_file(backing_path)
-        backing_len = len(backing_segment)
-        backing_segment = backing_segment[:backing_len]
-        backing_framerate = backing_segment.frame_rate
-        backing_samplewidth = backing_segment.sample_width
-        new_list = list(map(lambda path: map_paths_to_audio(path, backing_segment, backing_len, backing_framerate, backing_samplewidth), input_files))
-
-        mono_list = []
-        for audio in new_list:
-            for segments in audio.split_to_mono():
-                mono_list.append(segments)
+        status(f"Exporting {Path(output_file).with_suffix('.ogg')}")
+
+        # Export multitrack audio to file
+        try:
+            multitrack = channel_order_fix(AudioSegment.from_mono_audiosegments(*audio_channels).split_to_mono())
+
+            AudioSegment.from_mono_audiosegments(*multitrack).export(Path(output_file).with_suffix('.ogg'), format='ogg', codec='libvorbis', parameters=['-q', str(quality)])
+        except ValueError:
+            backing_path = input_files[[i for i, file_path in enumerate(input_files) if file_path.endswith("backing.wav")][0]]
+            backing_segment: AudioSegment = AudioSegment.from_file(backing_path)
+            backing_len = len(backing_segment)
+            backing_segment = backing_segment[:backing_len]
+            backing_framerate = backing_segment.frame_rate
+            backing_samplewidth = backing_segment.sample_width
+            new_list = list(map(lambda path: map_paths_to_audio(path, backing_segment, backing_len, backing_framerate, backing_samplewidth), input_files))
+
+            mono_list = []
+            for audio in new_list:
+                for segments in audio.split_to_mono():
+                    mono_list.append(segments)
         
-        multitrack = channel_order_fix(AudioSegment.from_mono_audiosegments(*mono_list).split_to_mono())
+            multitrack = channel_order_fix(AudioSegment.from_mono_audiosegments(*mono_list).split_to_mono())
+
+            AudioSegment.from_mono_audiosegments(*multitrack).export(Path(output_file).with_suffix('.ogg'), format='ogg', codec='libvorbis', parameters=['-q', str(quality)])
 
-        AudioSegment.from_mono_audiosegments(*multitrack).export(Path(output_file).with_suffix('.ogg'), format='ogg', codec='libvorbis', parameters=['-q', str(quality)])
+        output_path = Path(output_file).with_suffix('.ogg')
+        progress.file(str(output_path), os.path.getsize(output_path))
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Join multiple audio files into a single multitrack file')
     parser.add_argument('input_files', nargs='+', help='Input audio files to be joined')
     parser.add_argument('-o', '--output', default='./output.ogg', help='Output multitrack file')
     parser.add_argument('-q', '--quality', type=int, choices=range(1, 11), default=3, help='Quality level from 1 to 10 (default: 3)')
+    add_progress_arguments(parser)
+    add_profiling_arguments(parser)
     args = parser.parse_args()
+    open_channel(args)
 
-    join_audio_files(args.input_files, args.output, args.quality)
+    with profiled('audio_to_mogg', args, args.output):
+        join_audio_files(args.input_files, args.output, args.quality)
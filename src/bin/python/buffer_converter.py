@@ -1,6 +1,8 @@
-import sys, json, base64
+import argparse, sys, json, base64
 from io import BytesIO
-from PIL import Image
+from lib.framing import read_frames
+from lib.thumbnail_cache import cached_file
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
 
 def buffer_converter(base64_string: str, dest_path: str, width: int = 256, height: int = 256, interpolation: str = 'BILINEAR', quality: int = 100) -> None:
   """
@@ -21,28 +23,49 @@ def buffer_converter(base64_string: str, dest_path: str, width: int = 256, heigh
   quality: int, optional
     The quality value of the output image. Only used on lossy format, such as JPEG and WEBP (Default is `100`).
   """
-  
-  image_data = base64.b64decode(base64_string)
-  try:
-    with Image.open(BytesIO(image_data)) as img:
-      if img.mode != 'RGB':
-        img = img.convert('RGB')
+  raw_buffer_converter(base64.b64decode(base64_string), dest_path, width, height, interpolation, quality)
 
+def raw_buffer_converter(image_data: bytes, dest_path: str, width: int = 256, height: int = 256, interpolation: str = 'BILINEAR', quality: int = 100) -> None:
+  """
+  Same as `buffer_converter`, from the raw bytes of the image file.
+  """
+  def create() -> None:
+    # Pillow is only imported on a cache miss
+    from PIL import Image
+    from lib.resize import letterbox
+    with Image.open(BytesIO(image_data)) as img:
       if (img.width == width and img.height == height):
+        if img.mode != 'RGB':
+          img = img.convert('RGB')
         img.save(dest_path, quality=quality)
       else:
-        # resized = img.resize((width, height), resample=Image.Resampling[interpolation])
-        x, y = img.size
-        size = max(width, x, y)
-        new_im = Image.new('RGB', (size, size), (0,0,0))
-        new_im.paste(img, (int((size - x) / 2), int((size - y) / 2)))
-        new_im.thumbnail((width,height), resample=Image.Resampling[interpolation])
-        new_im.save(dest_path, quality=quality)
-        
-  except Exception as e:
-    raise e
+        letterbox(img, width, height, interpolation).save(dest_path, quality=quality)
+
+  cached_file(image_data, 'image_converter', {'width': width, 'height': height, 'interpolation': interpolation, 'quality': quality}, dest_path, create)
+
+def buffer_converter_binary() -> None:
+  """
+  Binary mode: reads pairs of length-prefixed frames from stdin, a JSON object with the `dest`, `width`, `height`, `interpolation` and `quality` values, then the raw bytes of the image file.
+  """
+  frames = read_frames(sys.stdin.buffer)
+  for options in frames:
+    arg = json.loads(options)
+    image_data = next(frames, None)
+    if image_data is None:
+      raise EOFError('The stream ended before the image of the options frame')
+    raw_buffer_converter(image_data, arg['dest'], arg['width'], arg['height'], arg['interpolation'], arg['quality'])
 
 if __name__ == '__main__':
-  stdin = sys.stdin.read()
-  arg = json.loads(stdin)
-  buffer_converter(arg['buf'], arg['dest'], arg['width'], arg['height'], arg['interpolation'], arg['quality'])
\ No newline at end of file
+  parser = argparse.ArgumentParser(description='RBToolsJS: Image Buffer Converter (reads a JSON object with the Base64-encoded buffer from stdin)', epilog='By Ruggery Iury Corrêa.')
+  parser.add_argument('-b', '--binary', help='Read length-prefixed frames of options and raw image buffers from stdin, instead of JSON with Base64', action='store_true')
+
+  add_profiling_arguments(parser)
+  arg = parser.parse_args()
+
+  with profiled('buffer_converter', arg):
+    if arg.binary:
+      buffer_converter_binary()
+    else:
+      stdin = sys.stdin.read()
+      arg = json.loads(stdin)
+      buffer_converter(arg['buf'], arg['dest'], arg['width'], arg['height'], arg['interpolation'], arg['quality'])
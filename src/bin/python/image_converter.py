@@ -1,5 +1,6 @@
 import argparse
-from PIL import Image
+from lib.thumbnail_cache import cached_file
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
 
 def image_converter(src_path: str, dest_path: str, width: int = 256, height: int = 256, interpolation: str = 'BILINEAR', quality: int = 100) -> dict:
   """
@@ -20,24 +21,19 @@ def image_converter(src_path: str, dest_path: str, width: int = 256, height: int
   quality: int, optional
     The quality value of the output image. Only used on lossy format, such as JPEG and WEBP (Default is `100`).
   """
-  try:
+  def create() -> None:
+    # Pillow is only imported on a cache miss
+    from PIL import Image
+    from lib.resize import letterbox
     with Image.open(src_path) as img:
-      if img.mode != 'RGB':
-        img = img.convert('RGB')
-
       if (img.width == width and img.height == height):
+        if img.mode != 'RGB':
+          img = img.convert('RGB')
         img.save(dest_path, quality=quality)
       else:
-        # resized = img.resize((width, height), resample=Image.Resampling[interpolation])
-        x, y = img.size
-        size = max(width, x, y)
-        new_im = Image.new('RGB', (size, size), (0,0,0))
-        new_im.paste(img, (int((size - x) / 2), int((size - y) / 2)))
-        new_im.thumbnail((width,height), resample=Image.Resampling[interpolation])
-        new_im.save(dest_path, quality=quality)
-      
-  except Exception as e:
-    raise e
+        letterbox(img, width, height, interpolation).save(dest_path, quality=quality)
+
+  cached_file(src_path, 'image_converter', {'width': width, 'height': height, 'interpolation': interpolation, 'quality': quality}, dest_path, create)
 
 if __name__ == '__main__':
   parser = argparse.ArgumentParser( description='RBToolsJS: Image Converter CLI', epilog='By Ruggery Iury Corrêa.')
@@ -48,6 +44,8 @@ if __name__ == '__main__':
   parser.add_argument('-i', '--interpolation', help='The interpolation method used when resizing the image', default='BILINEAR', type=str, required=False)
   parser.add_argument('-q', '--quality', help='The quality value of the output image. Only used on lossy format, such as JPEG and WEBP', default=100, type=int, required=False)
 
+  add_profiling_arguments(parser)
   arg = parser.parse_args()
-  
-  image_converter(arg.src_path, arg.dest_path, arg.width, arg.height, arg.interpolation, arg.quality)
\ No newline at end of file
+
+  with profiled('image_converter', arg, arg.dest_path):
+    image_converter(arg.src_path, arg.dest_path, arg.width, arg.height, arg.interpolation, arg.quality)
\ No newline at end of file
@@ -1,8 +1,27 @@
-import sys, base64
-from PIL import Image
-from io import BytesIO
+import argparse, sys, base64
+from lib.framing import read_frames, write_frame
+from lib.thumbnail_cache import cached_bytes
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
 
-def img_buffer_to_webp_data_url(base64_string: str) -> str:
+def img_buffer_to_webp(image_data: bytes, size: int = 0) -> bytes:
+  """
+  Converts an image file buffer to a lossless WEBP file buffer.
+
+  Parameters
+  ----------
+  image_data : bytes
+    The raw bytes of the image file.
+  size : int
+    When given, the image is scaled down to fit a square of this size. DDS textures decode only the smallest mip level that is at least this big.
+  """
+  def create() -> bytes:
+    # Pillow is only imported on a cache miss
+    from lib.webp import image_buffer_webp
+    return image_buffer_webp(image_data, size)
+
+  return cached_bytes(image_data, 'img_buffer_to_webp', {'size': size}, create)
+
+def img_buffer_to_webp_data_url(base64_string: str, size: int = 0) -> str:
   """
   Converts a Base64-encoded Buffer string to DataURL in lossless WEBP format.
   
@@ -10,20 +29,32 @@ def img_buffer_to_webp_data_url(base64_string: str) -> str:
   ----------
   base64_string : str
     A base64-encoded string to be converted to Data URL
+  size : int
+    When given, the image is scaled down to fit a square of this size. DDS textures decode only the smallest mip level that is at least this big.
   """
-  image_data = base64.b64decode(base64_string)
-
-  # Open the image from the bytes
-  image = Image.open(BytesIO(image_data))
+  webp = img_buffer_to_webp(base64.b64decode(base64_string), size)
+  data_url = f"data:image/webp;base64,{base64.b64encode(webp).decode('utf-8')}"
+  print(data_url)
+  return data_url
 
-  with BytesIO() as output:
-    image.save(output, format="WEBP", quality=100)
-    webp_data = output.getvalue()
-    base64_data = base64.b64encode(webp_data).decode('utf-8')
-    data_url = f"data:image/webp;base64,{base64_data}"
-    print(data_url)
-    return data_url
+def img_buffer_to_webp_binary(size: int = 0) -> None:
+  """
+  Binary mode: reads length-prefixed frames of raw image file bytes from stdin and writes a frame with the raw WEBP file bytes of each one to stdout.
+  """
+  for image_data in read_frames(sys.stdin.buffer):
+    write_frame(sys.stdout.buffer, img_buffer_to_webp(image_data, size))
   
 if __name__ == '__main__':
-  base64_string = sys.stdin.read()
-  img_buffer_to_webp_data_url(base64_string)
\ No newline at end of file
+  parser = argparse.ArgumentParser(description='RBToolsJS: Image Buffer to WEBP DataURL (reads the Base64-encoded buffer from stdin)', epilog='By Ruggery Iury Corrêa.')
+  parser.add_argument('-s', '--size', help='Scale the image down to fit this size, decoding only the needed mip level of DDS textures', default=0, type=int, required=False)
+  parser.add_argument('-b', '--binary', help='Read length-prefixed raw image buffers from stdin and write length-prefixed raw WEBP files to stdout, instead of Base64 in and a data URL out', action='store_true')
+
+  add_profiling_arguments(parser)
+  arg = parser.parse_args()
+
+  with profiled('img_buffer_to_webp_data_url', arg):
+    if arg.binary:
+      img_buffer_to_webp_binary(arg.size)
+    else:
+      base64_string = sys.stdin.read()
+      img_buffer_to_webp_data_url(base64_string, arg.size)
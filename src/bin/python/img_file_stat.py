@@ -1,5 +1,5 @@
 import argparse, json
-from PIL import Image
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
 
 def img_file_stat(file_path: str) -> dict:
   """
@@ -10,6 +10,8 @@ def img_file_stat(file_path: str) -> dict:
   file_path : str
     The path of the image file.
   """
+  # Imported after the arguments are parsed
+  from PIL import Image
   try:
     with Image.open(file_path) as img:
       status = {
@@ -30,6 +32,8 @@ if __name__ == '__main__':
   parser = argparse.ArgumentParser(description='RBToolsJS: Image File Stat CLI', epilog='By Ruggery Iury Corrêa.')
   parser.add_argument('file_path', help='The path of the image file', type=str)
 
+  add_profiling_arguments(parser)
   arg = parser.parse_args()
-  
-  img_file_stat(arg.file_path)
\ No newline at end of file
+
+  with profiled('img_file_stat', arg):
+    img_file_stat(arg.file_path)
\ No newline at end of file
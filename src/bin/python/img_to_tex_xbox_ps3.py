@@ -0,0 +1,59 @@
+import argparse
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
+
+def img_to_tex_xbox_ps3(src_path: str, dest_path: str, size: int = 256, dxt5: bool = True, game: str = 'RB3', interpolation: str = 'BILINEAR', quality: str = 'normal', threads: int = 0) -> None:
+  """
+  Converts any compatible image file to a PNG_XBOX or PNG_PS3 texture file, with mip maps, without leaving this process.
+
+  Parameters
+  ----------
+  src_path : str
+    The path of the image file.
+  dest_path : str
+    The destination path of the texture file. Files ending with `.png_xbox` have their bytes swapped.
+  size : int, optional
+    The width and height of the texture (Default is `256`).
+  dxt5 : bool, optional
+    Uses DXT5 encoding, DXT1 if `False` (Default is `True`).
+  game : str, optional
+    The game whose header (from the `headers` folder) goes on the texture file (Default is `'RB3'`).
+  interpolation : str, optional
+    The interpolation method used when resizing the image (Default if `'BILINEAR'`).
+  quality : str, optional
+    The DXT endpoint search, one of `'fast'`, `'normal'` or `'best'` (Default is `'normal'`).
+  threads : int, optional
+    The number of threads used to compress the blocks, `0` picks it by the texture size (Default is `0`).
+  """
+  # Pillow and NumPy are imported after the arguments are parsed
+  from PIL import Image
+  from lib.dds import encode_hmx_texture
+  from lib.headers import hmx_header_for
+  from lib.resize import letterbox
+
+  with Image.open(src_path) as img:
+    if img.width != size or img.height != size:
+      img = letterbox(img, size, size, interpolation)
+    else:
+      img = img.convert('RGBA')
+
+    header = hmx_header_for(size, size, b'DXT5' if dxt5 else b'DXT1', game)
+    texture = encode_hmx_texture(img, header, dest_path.lower().endswith('.png_xbox'), quality, threads or None)
+    with open(dest_path, 'wb') as f:
+      f.write(texture)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='RBToolsJS: PNG_XBOX/PNG_PS3 Texture Encoder', epilog='By Ruggery Iury Corrêa.')
+  parser.add_argument('src_path', help='The source image file path to be converted', type=str)
+  parser.add_argument('dest_path', help='The destination path of the texture file (.png_xbox or .png_ps3)', type=str)
+  parser.add_argument('-x', '--size', help='The width and height of the texture', type=int, default=256, required=False)
+  parser.add_argument('-dxt1', '--dxt1', help='Uses DXT1 encoding instead of DXT5', action='store_true')
+  parser.add_argument('-g', '--game', help='The game whose texture header is used', default='RB3', type=str, required=False)
+  parser.add_argument('-i', '--interpolation', help='The interpolation method used when resizing the image', default='BILINEAR', type=str, required=False)
+  parser.add_argument('-q', '--quality', help='The DXT endpoint search: fast, normal or best', default='normal', choices=['fast', 'normal', 'best'], type=str, required=False)
+  parser.add_argument('-t', '--threads', help='The number of threads used to compress the blocks (0 picks it by the texture size)', default=0, type=int, required=False)
+
+  add_profiling_arguments(parser)
+  arg = parser.parse_args()
+
+  with profiled('img_to_tex_xbox_ps3', arg, arg.dest_path):
+    img_to_tex_xbox_ps3(arg.src_path, arg.dest_path, arg.size, not arg.dxt1, arg.game, arg.interpolation, arg.quality, arg.threads)
@@ -0,0 +1,43 @@
+"""
+The RBToolsJS Python libraries, importable in-process (with `src/bin/python` on `sys.path`).
+
+The names below are the stable API (see `lib.api` and `lib.songs`): STFS containers, MOGG
+decryption and stats, texture decoding, image conversion and the songs of a CON file with their
+assets, taking paths, bytes or file objects. They are loaded on first use, so the scripts importing
+single modules (`from lib.stfs import STFS`) don't pay for them.
+"""
+
+API_VERSION = 1
+
+__all__ = [
+    "API_VERSION",
+    "MOGGStat",
+    "RGBAImage",
+    "STFSEntry",
+    "convert_image",
+    "decode_texture",
+    "decode_texture_rgba",
+    "decrypt_mogg",
+    "extract_stfs",
+    "extract_stfs_file",
+    "mogg_stat",
+    "open_stfs",
+    "read_source",
+    "read_stfs_file",
+    "song_assets",
+    "stfs_entries",
+]
+
+# Exported names defined outside of lib.api -> their module
+_MODULES = {
+    "song_assets": "songs",
+}
+
+def __getattr__(name: str):
+    if name in __all__:
+        import importlib
+        return getattr(importlib.import_module("." + _MODULES.get(name, "api"), __name__), name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
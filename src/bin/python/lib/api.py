@@ -0,0 +1,220 @@
+"""
+In-process API of the libraries, for programs that import them instead of running the scripts.
+
+Every function takes a file path, the file bytes or a binary file object, and returns bytes, Pillow
+images or the dataclasses below, so a batch pipeline can chain them without temporary files or a
+process per call. Errors are raised (`ValueError` for data that can't be read, `FileNotFoundError`
+for a missing file in a container) instead of being printed. Pillow and NumPy are only imported by
+the texture and image functions.
+
+The names exported by the package (`import lib`) are the stable ones; the modules behind them may
+change.
+"""
+
+import os
+from dataclasses import asdict, dataclass
+from io import BytesIO
+from typing import IO, TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
+
+from . import mogg
+from .ogg import vorbis_info
+from .stfs import STFS
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+Source = Union[str, "os.PathLike[str]", bytes, bytearray, memoryview, IO[bytes]]
+Progress = Optional[Callable[[int], None]]
+
+# The MOGG versions decrypt_mogg_bytes() has a key for, 10 being unencrypted
+MOGG_VERSIONS = range(10, 18)
+
+def read_source(source: Source) -> Union[bytes, bytearray, memoryview]:
+    """The bytes of a source: bytes-like sources are used as they are, files are read to the end."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    if hasattr(source, "read"):
+        return source.read()  # type: ignore[union-attr]
+    with open(source, "rb") as f:  # type: ignore[arg-type]
+        return f.read()
+
+def _extension(source: Source) -> str:
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.splitext(os.fspath(source))[1].lower().lstrip(".")
+    return os.path.splitext(getattr(source, "name", "") or "")[1].lower().lstrip(".")
+
+# STFS
+
+@dataclass(slots=True)
+class STFSEntry:
+    path: str
+    size: int
+    is_directory: bool
+
+def open_stfs(source: Source) -> STFS:
+    """Opens a CON/LIVE/PIRS container. File objects must be seekable and stay open while it's used."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return STFS("<memory>", BytesIO(source))  # type: ignore[arg-type]
+    if hasattr(source, "read"):
+        return STFS(getattr(source, "name", "<stream>"), source)  # type: ignore[arg-type]
+    return STFS(os.fspath(source))  # type: ignore[arg-type]
+
+def stfs_entries(con: STFS) -> List[STFSEntry]:
+    """The files and folders of a container, by their full path ("/songs/songs.dta")."""
+    return [STFSEntry(path, listing.size, listing.isdirectory) for path, listing in con.allfiles.items()]
+
+def read_stfs_file(con: STFS, path: str, progress: Progress = None) -> bytes:
+    """The contents of one file of a container. progress(size) is called for every block read."""
+    listing = con.allfiles.get(path)
+    if listing is None or listing.isdirectory:
+        raise FileNotFoundError("%s: no file %s in the container" % (con.filename, path))
+    return con.read_file(listing, progress=progress)
+
+def extract_stfs_file(source: Source, path: str, progress: Progress = None) -> bytes:
+    """The contents of one file of a container, opening and closing the container around it."""
+    con = open_stfs(source)
+    try:
+        return read_stfs_file(con, path, progress)
+    finally:
+        con.close()
+
+def extract_stfs(source: Union[Source, STFS], dest_path: str, flatten = False, progress: Progress = None) -> List[str]:
+    """
+    Extracts the files of a container into dest_path, keeping their folders (or all in dest_path
+    itself with flatten, like stfs_extract_all_files.py), and returns the paths written.
+    """
+    con = source if isinstance(source, STFS) else open_stfs(source)
+    written = []
+    try:
+        for path, listing in con.allfiles.items():
+            # "/songs/" is listed as an empty file on top of the "/songs" folder
+            if listing.isdirectory or path.endswith("/"):
+                continue
+            target = os.path.join(dest_path, os.path.basename(path) if flatten else path.lstrip("/"))
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(con.read_file(listing, progress=progress))
+            written.append(target)
+    finally:
+        if con is not source:
+            con.close()
+    return written
+
+# MOGG
+
+@dataclass(slots=True)
+class MOGGStat:
+    version: int
+    is_encrypted: bool
+    sample_rate: int
+    channels: int
+    duration_ms: int
+    bit_rate: int
+    size_bytes: int
+
+    @property
+    def duration(self) -> str:
+        """"MM:SS", or "HH:MM:SS" from one hour on."""
+        minutes, seconds = divmod(self.duration_ms // 1000, 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours:02}:{minutes:02}:{seconds:02}" if hours else f"{minutes:02}:{seconds:02}"
+
+    @property
+    def size(self) -> str:
+        return f"{self.size_bytes / (1024 ** 2):.2f} MB"
+
+    def as_dict(self) -> Dict[str, Any]:
+        """The stat with the keys printed by mogg_file_stat.py."""
+        stat = asdict(self)
+        stat["duration"] = self.duration
+        stat["size"] = self.size
+        return stat
+
+def decrypt_mogg(source: Source, red = False, xbox = True) -> bytearray:
+    """The OGG Vorbis data of a MOGG file, decrypted in memory."""
+    data = read_source(source)
+    if len(data) < 20 or data[0] not in MOGG_VERSIONS:
+        raise ValueError("Not a MOGG file, or unknown encryption version: %d" % (data[0] if data else -1))
+    ogg = mogg.decrypt_mogg_bytes(xbox, red, bytes(data))
+    if ogg[0:4] != b"OggS":
+        raise ValueError("The MOGG file could not be decrypted: no OggS header in the decrypted data")
+    return ogg
+
+def mogg_stat(source: Source, red = False, xbox = True) -> MOGGStat:
+    """The audio stats of a MOGG file, read from its decrypted OGG data without ffprobe."""
+    data = read_source(source)
+    ogg = decrypt_mogg(data, red, xbox)
+    info = vorbis_info(ogg)
+    return MOGGStat(data[0], data[0] != 10, info.sample_rate, info.channels, info.duration_ms, info.bit_rate, info.size)
+
+# Textures and images
+
+TPL_MAGIC = b"\x00\x20\xaf\x30"
+DDS_MAGIC = b"DDS "
+
+def decode_texture(source: Source, kind: Optional[str] = None, size = 0) -> "Image.Image":
+    """
+    Decodes a png_xbox, png_ps3, png_wii, TPL or DDS texture, or any image Pillow reads, into an
+    RGBA image.
+
+    kind is the texture's extension ("png_xbox"...), taken from the path of the source when not
+    given; TPL and DDS data are also recognized by their magic. With size, only the smallest mip
+    level at least this big is decoded, then scaled down to fit a square of this size.
+    """
+    kind = (kind or _extension(source)).lower().lstrip(".")
+    data = read_source(source)
+    magic = bytes(data[0:4])
+    if kind in ("png_xbox", "png_ps3"):
+        from .dds import HMXTexture
+        texture: Any = HMXTexture(data, byte_swapped=kind == "png_xbox")
+    elif kind == "png_wii":
+        from .tpl import TPLFile, wii_tpl_header
+        # The TPL header takes the place of the HMX one, as in tpl.PNG_WII
+        texture = TPLFile(data, wii_tpl_header(bytes(data[0:32])), 32, mips=data[6] + 1)
+    elif kind == "tpl" or magic == TPL_MAGIC:
+        from .tpl import TPLFile
+        texture = TPLFile(data)
+    elif kind == "dds" or magic == DDS_MAGIC:
+        from .dds import DDSFile
+        texture = DDSFile(data)
+    else:
+        from PIL import Image
+        image = Image.open(BytesIO(data))
+        if size:
+            image.thumbnail((size, size), resample=Image.Resampling.BILINEAR)
+        return image.convert("RGBA")
+
+    image = texture.toImage(texture.level_for_size(size) if size else 0)
+    if size:
+        from PIL import Image
+        image.thumbnail((size, size), resample=Image.Resampling.BILINEAR)
+    return image
+
+@dataclass(slots=True)
+class RGBAImage:
+    width: int
+    height: int
+    # width * height RGBA pixels, row by row
+    data: bytes
+
+def decode_texture_rgba(source: Source, kind: Optional[str] = None, size = 0) -> RGBAImage:
+    """decode_texture() as raw RGBA pixels, for callers that don't use Pillow."""
+    image = decode_texture(source, kind, size)
+    return RGBAImage(image.width, image.height, image.tobytes())
+
+def convert_image(source: Union[Source, "Image.Image"], format = "PNG", width = 256, height = 256, interpolation = "BILINEAR", quality = 100, kind: Optional[str] = None) -> bytes:
+    """
+    An image or texture (see decode_texture()), letterboxed into a black width x height square, as
+    the bytes of an image file of the given Pillow format (PNG, JPEG, WEBP...). quality is only used
+    by lossy formats.
+    """
+    from PIL import Image
+    from .resize import letterbox
+    image = source if isinstance(source, Image.Image) else decode_texture(source, kind)
+    if image.width != width or image.height != height:
+        image = letterbox(image, width, height, interpolation)
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+    with BytesIO() as output:
+        image.save(output, format=format, quality=quality)
+        return output.getvalue()
@@ -0,0 +1,424 @@
+"""
+DDS (DirectDraw Surface) texture reader with vectorized BC1/BC3/BC5 (DXT1, DXT5, ATI2) decoders.
+
+Used for the textures of the Xbox 360 and PS3 games (png_xbox/png_ps3), which are DDS data behind a
+HMX header and are read directly by `HMXTexture`. Any level of the mip chain can be decoded on its
+own, reading only that level's bytes, so small previews don't pay for a full resolution decode.
+
+The decoders take the raw block data plus the image size and return an `(height, width, 4)` `uint8`
+RGBA array, matching the output of Pillow's DDS plugin. The DXT1/DXT5 encoders share the endpoint
+search of the TPL CMP encoder, and `encode_hmx_texture` writes whole png_xbox/png_ps3 files.
+"""
+
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+from typing import Any, Callable, ClassVar, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from .tpl_codec import CMP_QUALITIES, CMP_THREADS_MIN_PIXELS, as_rgba, encode_blocks, fit_dxt1_blocks, level_dimensions, level_for_size, read_array, tile
+
+DDS_MAGIC = b"DDS "
+
+@dataclass(slots=True)
+class DDSHeader:
+    """The 124-byte DDS_HEADER that follows the magic, with its DDS_PIXELFORMAT."""
+    flags: int = 0
+    height: int = 0
+    width: int = 0
+    pitch: int = 0
+    depth: int = 0
+    mip_count: int = 0
+    pf_flags: int = 0
+    fourcc: bytes = b""
+    rgb_bits: int = 0
+    masks: Tuple[int, int, int, int] = (0, 0, 0, 0)
+    caps: int = 0
+
+    _struct: ClassVar[struct.Struct] = struct.Struct("<7L44x2L4s5L4L4x")
+    size: ClassVar[int] = 124
+    DDSD_MIPMAPCOUNT: ClassVar[int] = 0x20000
+
+    @classmethod
+    def unpack(cls, data, offset=0) -> "DDSHeader":
+        (header_size, flags, height, width, pitch, depth, mip_count, pf_size, pf_flags, fourcc, rgb_bits,
+         r_mask, g_mask, b_mask, a_mask, caps, caps2, caps3, caps4) = cls._struct.unpack_from(data, offset)
+        if header_size != cls.size:
+            raise ValueError("Invalid DDS header size: %d" % header_size)
+        return cls(flags, height, width, pitch, depth, mip_count, pf_flags, fourcc, rgb_bits, (r_mask, g_mask, b_mask, a_mask), caps)
+
+def _rgb565(colors: np.ndarray) -> np.ndarray:
+    """Expand RGB565 values to `(..., 3)` 8-bit RGB, replicating the top bits."""
+    r = (colors >> 11) & 0x1F
+    g = (colors >> 5) & 0x3F
+    b = colors & 0x1F
+    return np.stack(((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)), axis=-1)
+
+def _unblock(blocks: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Rearrange `(blocks, 16, ...)` 4x4 block pixels, stored row by row, into a `(height, width, ...)` image."""
+    cols, rows = max(1, (width + 3) // 4), max(1, (height + 3) // 4)
+    channels = blocks.shape[2:]
+    image = blocks.reshape(rows, cols, 4, 4, *channels).swapaxes(1, 2).reshape(rows * 4, cols * 4, *channels)
+    return image[:height, :width]
+
+def _color_blocks(blocks: np.ndarray, opaque_only: bool) -> np.ndarray:
+    """Decode the 8-byte color part of BC1/BC3 blocks into `(blocks, 16, 4)` RGBA.
+
+    BC1 blocks with color0 <= color1 use the 3-color mode with a transparent black 4th color, BC3
+    blocks (opaque_only) always use 4 colors.
+    """
+    c0 = blocks[:, 0:2].copy().view("<u2")[:, 0].astype(np.uint32)
+    c1 = blocks[:, 2:4].copy().view("<u2")[:, 0].astype(np.uint32)
+    p0, p1 = _rgb565(c0), _rgb565(c1)
+    four = (c0 > c1)[:, None] | opaque_only
+    palette = np.zeros((blocks.shape[0], 4, 4), dtype=np.uint32)
+    palette[:, 0, 0:3] = p0
+    palette[:, 1, 0:3] = p1
+    palette[:, 2, 0:3] = np.where(four, (2 * p0 + p1) // 3, (p0 + p1) // 2)
+    palette[:, 3, 0:3] = np.where(four, (p0 + 2 * p1) // 3, 0)
+    palette[:, 0:3, 3] = 255
+    palette[:, 3, 3] = np.where(four[:, 0], 255, 0)
+    bits = blocks[:, 4:8].copy().view("<u4")[:, 0]
+    indices = (bits[:, None] >> np.arange(0, 32, 2, dtype=np.uint32)) & 0x03
+    return np.take_along_axis(palette, indices[..., None].astype(np.intp), axis=1).astype(np.uint8)
+
+def _alpha_blocks(blocks: np.ndarray) -> np.ndarray:
+    """Decode 8-byte BC3 alpha (or BC5 channel) blocks into `(blocks, 16)` values."""
+    a0 = blocks[:, 0].astype(np.uint32)
+    a1 = blocks[:, 1].astype(np.uint32)
+    eight = (a0 > a1)[:, None]
+    steps = np.arange(1, 7, dtype=np.uint32)
+    palette = np.empty((blocks.shape[0], 8), dtype=np.uint32)
+    palette[:, 0] = a0
+    palette[:, 1] = a1
+    six = ((7 - steps) * a0[:, None] + steps * a1[:, None]) // 7
+    four = ((5 - steps[:4]) * a0[:, None] + steps[:4] * a1[:, None]) // 5
+    # a0 <= a1 has 4 interpolated values, then 0 and 255
+    four = np.concatenate((four, np.broadcast_to(np.array([0, 255], dtype=np.uint32), (blocks.shape[0], 2))), axis=1)
+    palette[:, 2:8] = np.where(eight, six, four)
+    # 48 bits of 3-bit indices, little-endian
+    raw = np.zeros((blocks.shape[0], 8), dtype=np.uint8)
+    raw[:, 0:6] = blocks[:, 2:8]
+    bits = raw.view("<u8")[:, 0]
+    indices = (bits[:, None] >> np.arange(0, 48, 3, dtype=np.uint64)) & 0x07
+    return np.take_along_axis(palette, indices.astype(np.intp), axis=1).astype(np.uint8)
+
+def swap16(data) -> np.ndarray:
+    """Swap the two bytes of every 16-bit word of data, returning a new `uint8` array.
+
+    A trailing odd byte is kept as is, like the original byte swapper of "swap_rb_art_bytes.py" does.
+    """
+    out = np.frombuffer(data, dtype=np.uint8).copy()
+    out[:len(out) & ~1].view("<u2").byteswap(inplace=True)
+    return out
+
+def block_count(width: int, height: int) -> int:
+    return max(1, (width + 3) // 4) * max(1, (height + 3) // 4)
+
+def decode_dxt1(data: bytes, width: int, height: int) -> np.ndarray:
+    """DXT1 (BC1): 8-byte blocks of two RGB565 colors and 2-bit indices, optional 1-bit alpha."""
+    blocks = read_array(data, "u1", block_count(width, height) * 8).reshape(-1, 8)
+    return _unblock(_color_blocks(blocks, False), width, height)
+
+def decode_dxt5(data: bytes, width: int, height: int) -> np.ndarray:
+    """DXT5 (BC3): 16-byte blocks, an interpolated alpha block followed by a DXT1 color block."""
+    blocks = read_array(data, "u1", block_count(width, height) * 16).reshape(-1, 16)
+    pixels = _color_blocks(blocks[:, 8:16], True)
+    pixels[:, :, 3] = _alpha_blocks(blocks[:, 0:8])
+    return _unblock(pixels, width, height)
+
+def decode_ati2(data: bytes, width: int, height: int) -> np.ndarray:
+    """ATI2 (BC5): 16-byte blocks of two interpolated channels (red, then green), used for normal maps."""
+    blocks = read_array(data, "u1", block_count(width, height) * 16).reshape(-1, 16)
+    pixels = np.zeros((blocks.shape[0], 16, 4), dtype=np.uint8)
+    pixels[:, :, 0] = _alpha_blocks(blocks[:, 0:8])
+    pixels[:, :, 1] = _alpha_blocks(blocks[:, 8:16])
+    pixels[:, :, 3] = 255
+    return _unblock(pixels, width, height)
+
+# FourCC -> (decoder, bytes per 4x4 block)
+DECODERS: Dict[bytes, Tuple[Callable[[bytes, int, int], np.ndarray], int]] = {
+    b"DXT1": (decode_dxt1, 8),
+    b"DXT5": (decode_dxt5, 16),
+    b"ATI2": (decode_ati2, 16),
+    b"BC5U": (decode_ati2, 16),
+}
+
+def level_size(fourcc: bytes, width: int, height: int) -> int:
+    """Size in bytes of one image of the given size."""
+    return block_count(width, height) * DECODERS[fourcc][1]
+
+def _encode_color_blocks(pixels: np.ndarray, quality: str, alpha: bool) -> np.ndarray:
+    """Compress `(blocks, 16, 4)` RGBA pixels into `(blocks, 8)` BC1 color blocks."""
+    c0, c1, indices = fit_dxt1_blocks(pixels, quality, alpha)
+    # 2-bit indices, first pixel in the least significant bits
+    bits = (indices.astype(np.uint32) << np.arange(0, 32, 2, dtype=np.uint32)).sum(axis=1, dtype=np.uint32)
+    blocks = np.empty((pixels.shape[0], 8), dtype=np.uint8)
+    blocks[:, 0:2] = c0.astype("<u2").view(np.uint8).reshape(-1, 2)
+    blocks[:, 2:4] = c1.astype("<u2").view(np.uint8).reshape(-1, 2)
+    blocks[:, 4:8] = bits.astype("<u4").view(np.uint8).reshape(-1, 4)
+    return blocks
+
+def _encode_alpha_blocks(alpha: np.ndarray) -> np.ndarray:
+    """Compress `(blocks, 16)` alpha values into `(blocks, 8)` BC3 alpha blocks.
+
+    The endpoints are the block's highest and lowest alpha (8-value mode), every pixel takes the
+    nearest of the values the decoder interpolates between them.
+    """
+    values = alpha.astype(np.int32)
+    a0, a1 = values.max(axis=1), values.min(axis=1)
+    weights = np.array([7, 0, 6, 5, 4, 3, 2, 1], dtype=np.int32)
+    palette = (weights * a0[:, None] + (7 - weights) * a1[:, None]) // 7
+    indices = np.abs(values[:, :, None] - palette[:, None, :]).argmin(axis=-1)
+    # 48 bits of 3-bit indices, little-endian
+    bits = (indices.astype(np.uint64) << np.arange(0, 48, 3, dtype=np.uint64)).sum(axis=1, dtype=np.uint64)
+    blocks = np.empty((alpha.shape[0], 8), dtype=np.uint8)
+    blocks[:, 0] = a0
+    blocks[:, 1] = a1
+    blocks[:, 2:8] = bits.astype("<u8").view(np.uint8).reshape(-1, 8)[:, 0:6]
+    return blocks
+
+def _encode_dxt5_blocks(pixels: np.ndarray, quality: str) -> np.ndarray:
+    return np.concatenate((_encode_alpha_blocks(pixels[..., 3]), _encode_color_blocks(pixels, quality, False)), axis=1)
+
+def _image_blocks(image: Any, quality: str, threads: Optional[int]) -> Tuple[np.ndarray, int]:
+    if quality not in CMP_QUALITIES:
+        raise ValueError("Unknown DXT quality %r, expected one of %s" % (quality, ", ".join(CMP_QUALITIES)))
+    pixels = as_rgba(image)
+    height, width = pixels.shape[:2]
+    if threads is None:
+        threads = min(4, os.cpu_count() or 1) if width * height >= CMP_THREADS_MIN_PIXELS else 1
+    # The edge is repeated into the padding, so it does not skew the block colors
+    return tile(pixels, 4, 4, edge=True).reshape(-1, 16, 4), threads
+
+def encode_dxt1(image: Any, quality="normal", threads: Optional[int] = None) -> bytes:
+    """DXT1 (BC1), the inverse of `decode_dxt1`. Pixels under `CMP_ALPHA_THRESHOLD` alpha are transparent.
+
+    `quality` is one of `CMP_QUALITIES`. Threads work like in `tpl_codec.encode_cmp`.
+    """
+    blocks, threads = _image_blocks(image, quality, threads)
+    return encode_blocks(lambda part: _encode_color_blocks(part, quality, True), blocks, 8, threads).tobytes()
+
+def encode_dxt5(image: Any, quality="normal", threads: Optional[int] = None) -> bytes:
+    """DXT5 (BC3), the inverse of `decode_dxt5`, with the same quality and threads options as `encode_dxt1`."""
+    blocks, threads = _image_blocks(image, quality, threads)
+    return encode_blocks(lambda part: _encode_dxt5_blocks(part, quality), blocks, 16, threads).tobytes()
+
+# FourCC -> encoder
+ENCODERS: Dict[bytes, Callable[..., bytes]] = {
+    b"DXT1": encode_dxt1,
+    b"DXT5": encode_dxt5,
+}
+
+def mip_chain(image: Image.Image, levels: int) -> List[Image.Image]:
+    """The first levels images of the mip chain of image, each one a box filtered half of the previous."""
+    chain = [image]
+    for level in range(1, levels):
+        size = level_dimensions(image.width, image.height, level)
+        if size == chain[-1].size:
+            break
+        chain.append(chain[-1].resize(size, Image.Resampling.BOX))
+    return chain
+
+def encode_mips(image: Image.Image, fourcc: bytes, levels: int, quality="normal", threads: Optional[int] = None) -> bytes:
+    """Encodes the first levels images of the mip chain of image, one after the other like in a DDS file."""
+    encoder = ENCODERS[fourcc]
+    return b"".join(encoder(level, quality, threads) for level in mip_chain(image.convert("RGBA"), levels))
+
+class DDSFile:
+    """A DDS texture read in one go (or memory-mapped with use_mmap), decoded one mip level at a time.
+
+    The source is a file path or the DDS bytes. The mip count of the header is only trusted as far
+    as the data goes, since some of our headers always claim 10 levels.
+    """
+
+    def __init__(self, source: Union[str, bytes, bytearray, memoryview], use_mmap = False) -> None:
+        self.filename = source if isinstance(source, str) else None
+        self.use_mmap = use_mmap
+        self._source = None if self.filename else source
+        self._mmap = None
+        self._header: Optional[DDSHeader] = None
+
+    def __enter__(self) -> "DDSFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self.filename:
+            self._source = None
+
+    @property
+    def source(self):
+        if self._source is None:
+            with open(self.filename, "rb") as f:
+                if self.use_mmap:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._source = self._mmap
+                else:
+                    self._source = f.read()
+        return self._source
+
+    @property
+    def header(self) -> DDSHeader:
+        if self._header is None:
+            if bytes(self.source[0:4]) != DDS_MAGIC:
+                raise ValueError("Not a DDS file: bad magic %r" % bytes(self.source[0:4]))
+            self._header = DDSHeader.unpack(self.source, 4)
+            if self._header.fourcc not in DECODERS:
+                raise TypeError("Unsupported DDS format: %r" % self._header.fourcc)
+        return self._header
+
+    @property
+    def data_offset(self) -> int:
+        return 4 + DDSHeader.size
+
+    @property
+    def width(self) -> int:
+        return self.header.width
+
+    @property
+    def height(self) -> int:
+        return self.header.height
+
+    @property
+    def fourcc(self) -> bytes:
+        return self.header.fourcc
+
+    @property
+    def mip_levels(self) -> int:
+        """Number of images in the mip chain (counting the full size one) that are present in the data."""
+        declared = self.header.mip_count if self.header.flags & DDSHeader.DDSD_MIPMAPCOUNT else 1
+        available = len(self.source) - self.data_offset
+        levels = 0
+        while levels < max(1, declared):
+            size = level_size(self.fourcc, *level_dimensions(self.width, self.height, levels))
+            if size > available:
+                break
+            available -= size
+            levels += 1
+        return max(1, levels)
+
+    def level_offset(self, level: int) -> int:
+        offset = self.data_offset
+        for i in range(level):
+            offset += level_size(self.fourcc, *level_dimensions(self.width, self.height, i))
+        return offset
+
+    def level_for_size(self, size: int) -> int:
+        """The smallest mip level that is still at least size pixels on its largest side."""
+        return level_for_size(self.width, self.height, self.mip_levels, size)
+
+    def level_data(self, level: int):
+        """The block data of one mip level, without copying it out of the source."""
+        offset = self.level_offset(level)
+        return memoryview(self.source)[offset:offset + level_size(self.fourcc, *level_dimensions(self.width, self.height, level))]
+
+    def decode(self, level = 0) -> np.ndarray:
+        """Decodes one mip level into a (height, width, 4) RGBA array, reading only its bytes."""
+        if not 0 <= level < self.mip_levels:
+            raise ValueError("DDS mip level %d out of range (%d levels)" % (level, self.mip_levels))
+        width, height = level_dimensions(self.width, self.height, level)
+        return DECODERS[self.fourcc][0](self.level_data(level), width, height)
+
+    def toImage(self, level = 0) -> Image.Image:
+        return Image.fromarray(self.decode(level), "RGBA")
+
+# HMX format ID -> (DDS FourCC, bits per pixel)
+HMX_FORMATS: Dict[int, Tuple[bytes, int]] = {
+    8: (b"DXT1", 4),
+    24: (b"DXT5", 8),
+    32: (b"ATI2", 8),
+}
+
+@dataclass(slots=True)
+class HMXHeader:
+    """The 32-byte header Harmonix games put in place of the DDS one on png_xbox/png_ps3 textures.
+
+    Most games write it little-endian from the first byte, some big-endian, and Dance Central 3 and
+    Blitz start it 4 bytes later. `unpack` tries each layout and keeps the first one whose format,
+    bit depth and size make sense.
+    """
+    version: int = 1
+    bpp: int = 4
+    format: int = 8
+    mip_count: int = 0
+    width: int = 0
+    height: int = 0
+    bytes_per_line: int = 0
+    big_endian: bool = False
+    offset: int = 0
+
+    _structs: ClassVar[Dict[bool, struct.Struct]] = {False: struct.Struct("<2BLB3H"), True: struct.Struct(">2BLB3H")}
+    size: ClassVar[int] = 32
+    # (offset of the version byte, big-endian) in the order they are tried
+    LAYOUTS: ClassVar[Tuple[Tuple[int, bool], ...]] = ((0, False), (0, True), (4, False), (4, True))
+
+    @classmethod
+    def unpack(cls, data, offset=0) -> "HMXHeader":
+        for shift, big_endian in cls.LAYOUTS:
+            version, bpp, format, mip_count, width, height, bytes_per_line = cls._structs[big_endian].unpack_from(data, offset + shift)
+            if HMX_FORMATS.get(format & 0xFF, (None, None))[1] == bpp and width and height:
+                return cls(version, bpp, format, mip_count, width, height, bytes_per_line, big_endian, shift)
+        raise ValueError("Unknown HMX texture header: %s" % bytes(data[offset:offset + 16]).hex())
+
+    def pack(self) -> bytes:
+        header = bytearray(self.size)
+        self._structs[self.big_endian].pack_into(header, self.offset, self.version, self.bpp, self.format, self.mip_count, self.width, self.height, self.bytes_per_line)
+        return bytes(header)
+
+    @property
+    def fourcc(self) -> bytes:
+        return HMX_FORMATS[self.format & 0xFF][0]
+
+class HMXTexture(DDSFile):
+    """A png_xbox/png_ps3 texture, decoded straight from its HMX header and DDS block data.
+
+    png_xbox data is stored as byte-swapped 16-bit words, which are swapped back one mip level at a
+    time while decoding, so no DDS copy of the file is written. byte_swapped defaults to what the file
+    extension says; textures given as bytes are taken as png_ps3 unless told otherwise.
+    """
+
+    def __init__(self, source: Union[str, bytes, bytearray, memoryview], byte_swapped: Optional[bool] = None, use_mmap = False) -> None:
+        super().__init__(source, use_mmap)
+        if byte_swapped is None:
+            byte_swapped = bool(self.filename) and self.filename.lower().endswith(".png_xbox")
+        self.byte_swapped = byte_swapped
+        self._hmx_header: Optional[HMXHeader] = None
+
+    @property
+    def hmx_header(self) -> HMXHeader:
+        if self._hmx_header is None:
+            self._hmx_header = HMXHeader.unpack(self.source)
+        return self._hmx_header
+
+    @property
+    def header(self) -> DDSHeader:
+        if self._header is None:
+            hmx = self.hmx_header
+            self._header = DDSHeader(flags=0x1007 | DDSHeader.DDSD_MIPMAPCOUNT, height=hmx.height, width=hmx.width, mip_count=hmx.mip_count + 1, pf_flags=0x4, fourcc=hmx.fourcc)
+        return self._header
+
+    @property
+    def data_offset(self) -> int:
+        return HMXHeader.size
+
+    def level_data(self, level: int):
+        data = super().level_data(level)
+        return swap16(data) if self.byte_swapped else data
+
+def encode_hmx_texture(image: Image.Image, header: bytes, byte_swapped = False, quality = "normal", threads: Optional[int] = None) -> bytes:
+    """Encodes image into a png_ps3 texture (png_xbox with byte_swapped) behind the given 32-byte HMX header.
+
+    The format and the number of mip levels are the ones the header declares (see `headers.hmx_header_for`).
+    """
+    hmx = HMXHeader.unpack(header)
+    data = encode_mips(image, hmx.fourcc, hmx.mip_count + 1, quality, threads)
+    return bytes(header) + (swap16(data).tobytes() if byte_swapped else data)
@@ -0,0 +1,44 @@
+"""
+Length-prefixed binary frames over a byte stream, used by the scripts' `--binary` mode on stdin/stdout.
+
+Each frame is a 4-byte big-endian unsigned length followed by that many raw bytes, so image buffers
+go through the pipe as they are instead of Base64 text inside JSON.
+"""
+
+import struct
+from typing import BinaryIO, Iterator, Optional
+
+LENGTH = struct.Struct(">L")
+
+def read_exactly(stream: BinaryIO, size: int) -> bytearray:
+    """Reads size bytes, looping over short reads of pipes. Raises EOFError when the stream ends first."""
+    data = bytearray(size)
+    view = memoryview(data)
+    position = 0
+    while position < size:
+        count = stream.readinto(view[position:])
+        if not count:
+            raise EOFError("Stream ended after %d of %d bytes" % (position, size))
+        position += count
+    return data
+
+def read_frame(stream: BinaryIO) -> Optional[bytearray]:
+    """The payload of the next frame, or None if the stream ends before a new frame starts."""
+    prefix = stream.read(LENGTH.size)
+    if not prefix:
+        return None
+    if len(prefix) < LENGTH.size:
+        prefix += read_exactly(stream, LENGTH.size - len(prefix))
+    return read_exactly(stream, LENGTH.unpack(prefix)[0])
+
+def read_frames(stream: BinaryIO) -> Iterator[bytearray]:
+    while True:
+        frame = read_frame(stream)
+        if frame is None:
+            return
+        yield frame
+
+def write_frame(stream: BinaryIO, data: bytes) -> None:
+    stream.write(LENGTH.pack(len(data)))
+    stream.write(data)
+    stream.flush()
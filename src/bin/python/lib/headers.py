@@ -0,0 +1,123 @@
+"""
+Registry of the HMX texture headers of "src/bin/headers", used on png_xbox/png_ps3 textures.
+
+The header files are named `GAME_WIDTHxHEIGHT_FORMAT[_NOMIP][_VARIANT].header`. They are read once
+per process, on first use, into a dict keyed by `HeaderKey` and a dict keyed by their bytes. Both
+picking the header of a new texture and recognizing the header of an existing one (from its first
+32 bytes) are then a dict lookup, with no file I/O.
+
+Most files hold the first 16 bytes of the 32-byte header. The Dance Central 3 and Blitz ones hold 11
+bytes, from byte 5 to byte 15.
+"""
+
+import os
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from .dds import HMX_FORMATS, HMXHeader
+
+HEADERS_PATH = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "..", "headers"))
+
+# DDS FourCC -> format name used on the header file names
+FORMAT_NAMES: Dict[bytes, str] = {b"DXT1": "DXT1", b"DXT5": "DXT5", b"ATI2": "NORMAL"}
+
+# Length of the header files -> offset of their bytes in the 32-byte header
+FILE_OFFSETS: Dict[int, int] = {16: 0, 11: 5}
+
+# (side, FourCC) -> (mip count, bytes per line) of the square Rock Band 3 textures written by the
+# TypeScript encoder, from `imageHeaders` ("src/lib/image/headers.ts"). They win over the header
+# files, which don't have 1024 and 2048 and differ on the bytes per line of 256x256 DXT1.
+IMAGE_HEADERS: Dict[Tuple[int, bytes], Tuple[int, int]] = {
+    (256, b"DXT1"): (4, 256),
+    (256, b"DXT5"): (4, 256),
+    (512, b"DXT1"): (5, 256),
+    (512, b"DXT5"): (5, 512),
+    (1024, b"DXT1"): (5, 1024),
+    (1024, b"DXT5"): (5, 1024),
+    (2048, b"DXT1"): (6, 2048),
+    (2048, b"DXT5"): (6, 2048),
+}
+
+class HeaderKey(NamedTuple):
+    game: str
+    width: int
+    height: int
+    format: str
+    mips: bool = True
+    variant: str = ""
+
+class HeaderEntry(NamedTuple):
+    name: str
+    key: HeaderKey
+    # The whole 32-byte header, zero where the file has no bytes
+    data: bytes
+
+    @property
+    def hmx_header(self) -> HMXHeader:
+        return HMXHeader.unpack(self.data)
+
+def parse_header_name(name: str) -> HeaderKey:
+    """The key of a header file name (without the ".header" extension), e.g. "GH2_512x256_DXT5_NOMIP"."""
+    game, size, format, *rest = name.split("_")
+    width, height = (int(side) for side in size.split("x"))
+    return HeaderKey(game, width, height, format, "NOMIP" not in rest, "_".join(part for part in rest if part != "NOMIP"))
+
+class HeaderRegistry:
+    """All the header files of a folder, loaded at once."""
+
+    def __init__(self, path: str = HEADERS_PATH) -> None:
+        self.path = path
+        self.entries: Dict[HeaderKey, HeaderEntry] = {}
+        self._by_bytes: Dict[bytes, HeaderEntry] = {}
+        for filename in sorted(os.listdir(path)):
+            name, ext = os.path.splitext(filename)
+            if ext != ".header":
+                continue
+            with open(os.path.join(path, filename), "rb") as f:
+                raw = f.read()
+            if len(raw) not in FILE_OFFSETS:
+                raise ValueError("Unexpected %d-byte texture header: %s" % (len(raw), filename))
+            data = bytearray(HMXHeader.size)
+            data[FILE_OFFSETS[len(raw)]:FILE_OFFSETS[len(raw)] + len(raw)] = raw
+            entry = HeaderEntry(name, parse_header_name(name), bytes(data))
+            self.entries[entry.key] = entry
+            # Some games share headers, the first name in alphabetical order is kept
+            self._by_bytes.setdefault(raw, entry)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, game: str, width: int, height: int, format: str, mips = True, variant = "") -> Optional[HeaderEntry]:
+        return self.entries.get(HeaderKey(game, width, height, format, mips, variant))
+
+    def detect(self, data) -> Optional[HeaderEntry]:
+        """The header file matching the first 32 bytes of a texture, or None if there is none."""
+        for length, offset in FILE_OFFSETS.items():
+            entry = self._by_bytes.get(bytes(data[offset:offset + length]))
+            if entry is not None:
+                return entry
+        return None
+
+@lru_cache(maxsize=None)
+def registry() -> HeaderRegistry:
+    """The registry of "src/bin/headers", loaded on the first call."""
+    return HeaderRegistry()
+
+def hmx_header_for(width: int, height: int, fourcc: bytes, game = "RB3", mips = True) -> bytes:
+    """The 32-byte HMX header of a texture of this size and format.
+
+    Square Rock Band 3 textures get the header of `IMAGE_HEADERS`, the same bytes as the TypeScript
+    encoder. Other textures use the header file of the game when there is one, else one built in the
+    layout of the Rock Band 3 headers, with mip levels down to 16 pixels on the smallest side (or
+    none without mips).
+    """
+    format = next(key for key, (name, _) in HMX_FORMATS.items() if name == fourcc)
+    bpp = HMX_FORMATS[format][1]
+    if game == "RB3" and mips and width == height and (width, fourcc) in IMAGE_HEADERS:
+        mip_count, bytes_per_line = IMAGE_HEADERS[(width, fourcc)]
+        return HMXHeader(1, bpp, format, mip_count, width, height, bytes_per_line).pack()
+    entry = registry().get(game, width, height, FORMAT_NAMES[fourcc], mips)
+    if entry is not None:
+        return entry.data
+    mip_count = max(0, min(width, height).bit_length() - 5) if mips else 0
+    return HMXHeader(1, bpp, format, mip_count, width, height, width * bpp // 8).pack()
@@ -0,0 +1,118 @@
+"""
+Counters and timers on the hot paths of the libraries: STFS block reads, MOGG key generation and
+decryption, TPL decoding (per format), and PKG reads and decryption.
+
+Each point counts its calls, the bytes they went through, and their wall and CPU time (CPU time of
+the calling thread). A call that raises isn't counted.
+
+Instrumentation is off unless the `RBTOOLS_INSTRUMENT` environment variable is set when the libraries
+are imported. Off, `timed()` returns the functions it decorates as they are, so the hot paths run
+exactly the code they'd run without it. "1"/"on" turns it on; any other value is a path the counters
+are written to, as JSON, when the process exits. The worker (`worker.py --instrument`) also serves
+them with its `instrumentation` method.
+"""
+
+import atexit
+import functools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar, Union
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Point name -> [calls, bytes, wall nanoseconds, CPU nanoseconds]
+Counters = Dict[str, List[int]]
+
+_SETTING = os.environ.get("RBTOOLS_INSTRUMENT", "")
+ENABLED = _SETTING.lower() not in ("", "0", "off", "false", "no")
+
+_counters: Counters = {}
+_lock = threading.Lock()
+
+def returned_size(result, *args, **kwargs) -> int:
+    """Size of a call: the length of what it returned."""
+    return len(result)
+
+def record(name: str, size: int, wall_ns: int, cpu_ns: int) -> None:
+    with _lock:
+        counter = _counters.get(name)
+        if counter is None:
+            counter = _counters[name] = [0, 0, 0, 0]
+        counter[0] += 1
+        counter[1] += size
+        counter[2] += wall_ns
+        counter[3] += cpu_ns
+
+def timed(name: Union[str, Callable[..., str]], size: Optional[Callable[..., int]] = None) -> Callable[[F], F]:
+    """
+    Decorator counting the calls of a function under name, which is either a string or a function
+    of the call's arguments. size(result, *args, **kwargs) gives the bytes of a call, None counts none.
+    """
+    def decorate(function: F) -> F:
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            wall = time.perf_counter_ns()
+            cpu = time.thread_time_ns()
+            result = function(*args, **kwargs)
+            cpu = time.thread_time_ns() - cpu
+            wall = time.perf_counter_ns() - wall
+            record(name(*args, **kwargs) if callable(name) else name, size(result, *args, **kwargs) if size else 0, wall, cpu)
+            return result
+        return wrapper  # type: ignore[return-value]
+    return decorate
+
+def snapshot() -> Counters:
+    """A copy of the counters of this process."""
+    with _lock:
+        return {name: list(counter) for name, counter in _counters.items()}
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+
+def merge(snapshots: Iterable[Counters]) -> Counters:
+    """Sums the counters of many processes."""
+    total: Counters = {}
+    for counters in snapshots:
+        for name, counter in counters.items():
+            total[name] = [a + b for a, b in zip(total.get(name, [0, 0, 0, 0]), counter)]
+    return total
+
+def report(counters: Optional[Counters] = None) -> Dict[str, Dict[str, Any]]:
+    """The counters (this process's by default) as JSON-ready objects, sorted by point name."""
+    if counters is None:
+        counters = snapshot()
+    return {
+        name: {
+            "calls": calls,
+            "bytes": size,
+            "wallMs": wall / 1e6,
+            "cpuMs": cpu / 1e6,
+            "mbPerSecond": size / (wall / 1e9) / 1e6 if size and wall else None,
+        }
+        for name, (calls, size, wall, cpu) in sorted(counters.items())
+    }
+
+def write(path: str, counters: Optional[Counters] = None) -> None:
+    # Only imported when writing, this module is imported by every library
+    import json
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report(counters), f, indent=2)
+
+# What's written at exit, replaced by programs whose counters live in other processes
+_collect: Callable[[], Counters] = snapshot
+
+def export_at_exit(collect: Callable[[], Counters]) -> None:
+    """Makes the file written at exit hold collect()'s counters instead of this process's."""
+    global _collect
+    _collect = collect
+
+def _write_at_exit() -> None:
+    write(_SETTING, _collect())
+
+if ENABLED and _SETTING.lower() not in ("1", "on", "true", "yes"):
+    atexit.register(_write_at_exit)
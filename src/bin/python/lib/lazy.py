@@ -0,0 +1,33 @@
+"""
+Deferred imports of heavy third-party packages.
+
+`LazyModule` takes the place of an `import package.submodule` statement: the global name of the
+package is bound to a stand-in, and the first attribute read on it imports the package with the
+listed submodules and rebinds the global name to the real package. From then on the module's code
+reads the package straight from its globals, at no extra cost.
+"""
+
+import importlib
+from types import ModuleType
+from typing import Any, Dict
+
+class LazyModule:
+    """Stand-in for a package in the globals of a module, imported on first use."""
+
+    def __init__(self, namespace: Dict[str, Any], name: str, *submodules: str) -> None:
+        self._namespace = namespace
+        self._name = name
+        self._submodules = submodules
+
+    def load(self) -> ModuleType:
+        for submodule in self._submodules:
+            importlib.import_module(submodule)
+        module = importlib.import_module(self._name)
+        self._namespace[self._name] = module
+        return module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        return "<lazy module %r>" % self._name
@@ -9,9 +9,11 @@ See https://milo.ipg.pw/index.php/MOGG_File_Format
 """
 
 from io import BufferedReader
-from typing import Literal
+from typing import Callable, Literal, Optional
 from Crypto.Cipher import AES
 import sys
+from .instrument import timed
+from .progress import status
 
 masher = b'\x39\xa2\xbf\x53\x7d\x88\x1d\x03\x35\x38\xa3\x80\x45\x24\xee\xca\x25\x6d\xa5\xc2\x65\xa9\x94\x73\xe5\x74\xeb\x54\xe5\x95\x3f\x1c'
 ctrkey_11 = b'\x37\xb2\xe2\xb9\x1c\x74\xfa\x9e\x38\x81\x08\xea\x36\x23\xdb\xe4'
@@ -110,7 +112,12 @@ b'\x81\x84\x19\x91\x45\x40\x3f\x9d\x7c\x47\xf4\x5d\x57\x56\x80\x30\xd9\x98\x1c\x
 b'\xb5\xa2\x15\x9d\x15\x86\x9f\x6e\x80\x55\x8c\xe6\x6c\x68\x71\xee\x7e\xed\x19\x9c\xb0\x80\xc5\x5f\xdc\x9f\xd1\x4a\x01\x36\xf4\x39',
 ]
 
-def do_crypt(key: bytearray, mogg_data: bytearray, decmogg_data: bytearray, file_nonce: bytearray, ogg_offset: int) -> None:
+# do_crypt() calls its progress callback every this many bytes (a multiple of the AES block size),
+# and once more with the rest
+PROGRESS_STEP = 0x10000
+
+@timed("mogg.do_crypt", lambda result, key, mogg_data, decmogg_data, file_nonce, ogg_offset, *args, **kwargs: len(mogg_data) - ogg_offset)
+def do_crypt(key: bytearray, mogg_data: bytearray, decmogg_data: bytearray, file_nonce: bytearray, ogg_offset: int, progress: Optional[Callable[[int], None]] = None) -> None:
     cipher = AES.new(key, AES.MODE_ECB)
     nonce = bytearray(16)
     nonce[0:16] = file_nonce[0:16]
@@ -124,16 +131,22 @@ def do_crypt(key: bytearray, mogg_data: bytearray, decmogg_data: bytearray, file
                     break
             block_mask = bytearray(cipher.encrypt(nonce))
             block_offset = 0
+            if progress is not None and not (i - ogg_offset) % PROGRESS_STEP:
+                progress(PROGRESS_STEP)
         decmogg_data[i] = (mogg_data[i] ^ block_mask[block_offset]) & 0xff
         block_offset = block_offset + 1
+    if progress is not None and len(mogg_data) > ogg_offset:
+        # The bytes since the last full step
+        progress(len(mogg_data) - ogg_offset - (len(mogg_data) - ogg_offset - 1) // PROGRESS_STEP * PROGRESS_STEP)
     return
 
+@timed("mogg.gen_key")
 def gen_key(xbox: bool, hvkey: bytes, mogg_data: bytes, version: int) -> bytearray:
     ps3key = gen_key_inner(False, hvkey, mogg_data, version)
     xboxkey = gen_key_inner(True, hvkey, mogg_data, version)
 
     if ps3key != xboxkey:
-        print("ps3 key does not match xbox key, decryption may fail")
+        status("ps3 key does not match xbox key, decryption may fail", "warning")
 
     match xbox:
         case True:
@@ -151,10 +164,10 @@ def gen_key_inner(xbox: bool, hvkey: bytes, mogg_data: bytes, version: int) -> b
     else:
         key_mask[0:16] = mogg_data[20+hmx_header_size*8+16+16:20+hmx_header_size*8+16+32]
     if not xbox and version == 13 and key_mask == bad_mask_1:
-        print("found a bad C3 PS3 key mask, correcting")
+        status("found a bad C3 PS3 key mask, correcting")
         key_mask = bytearray(b'\xa5\xce\xfd\x06\x11\x93\x23\x21\xf8\x87\x85\xea\x95\xe4\x94\xd4')
     if not xbox and version == 12 and key_mask == bad_mask_2:
-        print("found a bad C3 PS3 key mask, correcting")
+        status("found a bad C3 PS3 key mask, correcting")
         key_mask = bytearray(b'\xf1\xb4\xb8\xb0\x48\xaf\xcb\x9b\x4b\x53\xe0\x56\x64\x57\x68\x39')
     if xbox:
         mask_cipher = AES.new(hvkey, AES.MODE_ECB)
@@ -177,7 +190,7 @@ def gen_key_inner(xbox: bool, hvkey: bytes, mogg_data: bytes, version: int) -> b
             case 10:
                 v17_game = "FUSER"
             case _:
-                print("Unknown game! Please notify LocalH and send him the song package.")
+                print("Unknown game! Please notify LocalH and send him the song package.", file=sys.stderr)
                 sys.exit(2)
     key_index = int.from_bytes(mogg_data[hdr_offset:hdr_offset+8], "little") % 6
     if xbox:
@@ -639,7 +652,8 @@ def ogg_to_hmxa(encmogg_data: bytearray, ogg_offset: int, hmx_header_size: int)
     encmogg_data[ogg_offset:ogg_offset+4] = bytearray(b'\x48\x4D\x58\x41')
     return
 
-def decrypt_mogg(xbox: bool, red: bool, fin: BufferedReader, fout: BufferedReader) -> bool:
+# progress(size) is called as the bytes of the file are done, the header first
+def decrypt_mogg(xbox: bool, red: bool, fin: BufferedReader, fout: BufferedReader, progress: Optional[Callable[[int], None]] = None) -> bool:
     failed = False
     mogg_data = fin.read()
     decmogg_data = bytearray(mogg_data)
@@ -649,15 +663,15 @@ def decrypt_mogg(xbox: bool, red: bool, fin: BufferedReader, fout: BufferedReade
     hmx_header_size = int.from_bytes(mogg_data[16:20], "little")
 
     if version == 10:
-        print("version 10 mogg, nothing to do")
+        status("version 10 mogg, nothing to do")
         fout.close()
         return True
 
     if version != 11:
         if red:
-            print("using red keys")
+            status("using red keys")
         else:
-            print("using green keys")
+            status("using green keys")
 
     match version:
         case 11:
@@ -693,7 +707,7 @@ def decrypt_mogg(xbox: bool, red: bool, fin: BufferedReader, fout: BufferedReade
                 hvkey = hvkey_17
             key = gen_key(xbox, hvkey, mogg_data, 17)
         case _:
-            print("Unknown encryption version! Please notify LocalH and send him the song package.")
+            print("Unknown encryption version! Please notify LocalH and send him the song package.", file=sys.stderr)
             sys.exit(2)
    
     decmogg_data[0:ogg_offset] = mogg_data[0:ogg_offset] # copy header to output buffer
@@ -707,20 +721,22 @@ def decrypt_mogg(xbox: bool, red: bool, fin: BufferedReader, fout: BufferedReade
     nonce_offset = 20 + hmx_header_size * 8
     nonce = bytearray(mogg_data[nonce_offset:nonce_offset+16])
     
-    do_crypt(key, mogg_data, decmogg_data, nonce, ogg_offset)
+    if progress is not None:
+        progress(min(ogg_offset, len(mogg_data)))
+    do_crypt(key, mogg_data, decmogg_data, nonce, ogg_offset, progress)
 
     if decmogg_data[ogg_offset:ogg_offset+4] == bytearray(b'\x48\x4d\x58\x41'):
         hmxa_to_ogg(decmogg_data, ogg_offset, hmx_header_size)
     elif version != 11:
-        print("decrypted data did not start with HMXA (484D5841), should be OggS (4F676753)")
+        status("decrypted data did not start with HMXA (484D5841), should be OggS (4F676753)", "warning")
 
     if not decmogg_data[ogg_offset:ogg_offset+4] == bytearray(b'\x4f\x67\x67\x53'):
-        print("OggS header not present")
+        status("OggS header not present", "error")
         fout.close()
         failed = True
     else:
         decmogg_data[0] = 10
-        print("decryption successful, wrote version 10 to mogg header")
+        status("decryption successful, wrote version 10 to mogg header")
 
     if not failed:
         fout.write(decmogg_data)
@@ -737,9 +753,9 @@ def reencrypt_mogg(xbox: bool, red: bool, enc_ver: int, fin: BufferedReader, fou
     hmx_header_size = int.from_bytes(mogg_data[16:20], "little")
 
     if red:
-        print("using red keys to encrypt")
+        status("using red keys to encrypt")
     else:
-        print("using green keys to encrypt")
+        status("using green keys to encrypt")
 
     match enc_ver:
         case 11:
@@ -775,7 +791,7 @@ def reencrypt_mogg(xbox: bool, red: bool, enc_ver: int, fin: BufferedReader, fou
                 hvkey = hvkey_17
             key = gen_key(xbox, hvkey, mogg_data, 17)
         case _:
-            print("Unknown encryption version! Please notify LocalH and send him the song package.")
+            print("Unknown encryption version! Please notify LocalH and send him the song package.", file=sys.stderr)
             sys.exit(2)
    
     encmogg_data[0:ogg_offset] = mogg_data[0:ogg_offset] # copy header to output buffer
@@ -790,10 +806,10 @@ def reencrypt_mogg(xbox: bool, red: bool, enc_ver: int, fin: BufferedReader, fou
         if mogg_data[ogg_offset:ogg_offset+4] == bytearray(b'\x4f\x67\x67\x53'):
             ogg_to_hmxa(mogg_data, ogg_offset, hmx_header_size)
         else:
-            print("decrypted data did not start with OggS (4F676753)")
+            status("decrypted data did not start with OggS (4F676753)", "warning")
 
         if not mogg_data[ogg_offset:ogg_offset+4] == bytearray(b'\x48\x4D\x58\x41'):
-            print("HMXA header not present")
+            status("HMXA header not present", "error")
             fout.close()
             failed = True
 
@@ -802,7 +818,7 @@ def reencrypt_mogg(xbox: bool, red: bool, enc_ver: int, fin: BufferedReader, fou
         do_crypt(key, mogg_data, encmogg_data, nonce, ogg_offset)
     
         encmogg_data[0] = enc_ver
-        print(f'encryption successful, wrote version {enc_ver} to mogg header')
+        status(f'encryption successful, wrote version {enc_ver} to mogg header')
     
         if not failed:
             fout.write(encmogg_data)
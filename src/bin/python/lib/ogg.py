@@ -0,0 +1,60 @@
+"""
+Stream information of Ogg Vorbis data in memory: channels, sample rate, bitrate and duration.
+
+This is what the MOGG stats need from ffprobe, read straight from the identification header and the
+granule position of the last page, so decrypted MOGGs don't have to be written to a file first.
+"""
+
+import struct
+from dataclasses import dataclass
+from typing import Union
+
+OGG_MAGIC = b"OggS"
+
+# Capture pattern, version, header type, granule position, serial number, page sequence, CRC, segments
+_PAGE = struct.Struct("<4sBBqLLLB")
+# Vorbis version, channels, sample rate, maximum, nominal and minimum bitrates
+_IDENTIFICATION = struct.Struct("<LBLiii")
+
+@dataclass(slots=True)
+class VorbisInfo:
+    channels: int
+    sample_rate: int
+    nominal_bitrate: int
+    samples: int
+    size: int
+
+    @property
+    def duration_ms(self) -> int:
+        return self.samples * 1000 // self.sample_rate if self.sample_rate else 0
+
+    @property
+    def bit_rate(self) -> int:
+        """The average bitrate of the whole stream (size over duration), the one ffprobe reports for the format."""
+        return self.size * 8 * self.sample_rate // self.samples if self.samples else 0
+
+def vorbis_info(data: Union[bytes, bytearray]) -> VorbisInfo:
+    """Reads the information of the first logical stream of an Ogg Vorbis file."""
+    if len(data) < _PAGE.size or data[0:4] != OGG_MAGIC:
+        raise ValueError("Not an Ogg stream")
+    serial = _PAGE.unpack_from(data, 0)[4]
+    packet = _PAGE.size + data[_PAGE.size - 1]
+    if data[packet:packet + 7] != b"\x01vorbis":
+        raise ValueError("Not an Ogg Vorbis stream")
+    _, channels, sample_rate, _, nominal_bitrate, _ = _IDENTIFICATION.unpack_from(data, packet + 7)
+
+    # The granule position of the last page of the stream is its length in samples. Pages where no
+    # packet ends have a granule position of -1, and the search goes on before them.
+    samples = 0
+    end = len(data)
+    while True:
+        offset = data.rfind(OGG_MAGIC, 0, end)
+        if offset < 0:
+            break
+        if offset + _PAGE.size <= len(data):
+            _, version, _, granule, page_serial, _, _, _ = _PAGE.unpack_from(data, offset)
+            if version == 0 and page_serial == serial and granule >= 0:
+                samples = granule
+                break
+        end = offset
+    return VorbisInfo(channels, sample_rate, nominal_bitrate, samples, len(data))
@@ -82,14 +82,23 @@ import base64
 import xml.etree.ElementTree
 import math
 import datetime
+import enum
+
+## Heavy packages below are imported on first use, so that reading the header of a local file
+## doesn't pay for the HTTP and crypto stacks
+try:
+    from .lazy import LazyModule
+    from .instrument import returned_size, timed
+    from .progress import Progress, add_arguments as add_progress_arguments, open_channel as open_progress_channel
+except ImportError:
+    ## Run as a script
+    from lazy import LazyModule
+    from instrument import returned_size, timed
+    from progress import Progress, add_arguments as add_progress_arguments, open_channel as open_progress_channel
 
 ## pip install requests
 ## https://pypi.org/project/requests/
-import requests
-
-## pip install aenum
-## https://pypi.org/project/aenum/
-import aenum
+requests = LazyModule(globals(), "requests")
 
 ## pip install fastxor
 ## https://pypi.org/project/fastxor/
@@ -98,18 +107,15 @@ import fastxor
 ## pip install pycryptodomex
 ## https://pypi.org/project/pycryptodomex/
 ## https://www.pycryptodome.org/en/latest/src/installation.html
-import Cryptodome.Cipher.AES
-import Cryptodome.Util.Counter
-import Cryptodome.Hash
+Cryptodome = LazyModule(globals(), "Cryptodome", "Cryptodome.Cipher.AES", "Cryptodome.Util.Counter", "Cryptodome.Hash.CMAC", "Cryptodome.Hash.HMAC", "Cryptodome.Hash.SHA1", "Cryptodome.Hash.SHA256")
 
 ## pip install packaging
 ## https://pypi.org/project/packaging/
-import packaging.version
+## (imported by useCryptodomeCMAC())
 
 ## pip install ecdsa
 ## https://pypi.org/project/ecdsa/
-import ecdsa.ecdsa
-import ecdsa.ellipticcurve
+ecdsa = LazyModule(globals(), "ecdsa", "ecdsa.ecdsa", "ecdsa.ellipticcurve")
 
 
 ## Debug level for Python initializations (will be reset in "main" code)
@@ -234,24 +240,32 @@ except:
 
 ### pycryptodomex <3.7.2 CMAC error workaround
 ### https://github.com/Legrandin/pycryptodome/issues/238
-if packaging.version.parse(Cryptodome.__version__) >= packaging.version.parse("3.7.2"):
-    dprint("pycryptodomex", Cryptodome.__version__, "(>= 3.7.2) is good")
-    ### https://www.pycryptodome.org/en/latest/src/hash/cmac.html
-    def newCMAC(key):
+### Checked on the first CMAC, not at import
+Cryptodome_CMAC = None
+def useCryptodomeCMAC():
+    global Cryptodome_CMAC
+    if Cryptodome_CMAC is None:
+        import packaging.version
+        if packaging.version.parse(Cryptodome.__version__) >= packaging.version.parse("3.7.2"):
+            dprint("pycryptodomex", Cryptodome.__version__, "(>= 3.7.2) is good")
+            Cryptodome_CMAC = True
+        else:
+            dprint("pycryptodomex", Cryptodome.__version__, "(< 3.7.2) has an error in CMAC copying, therefore switching to module cryptography for CMAC hashing")
+            Cryptodome_CMAC = False
+    return Cryptodome_CMAC
+def newCMAC(key):
+    if useCryptodomeCMAC():
+        ### https://www.pycryptodome.org/en/latest/src/hash/cmac.html
         return Cryptodome.Hash.CMAC.new(key, ciphermod=Cryptodome.Cipher.AES)
-    def getCMACDigest(self):
-        return self.digest()
-else:
-    dprint("pycryptodomex", Cryptodome.__version__, "(< 3.7.2) has an error in CMAC copying, therefore switching to module cryptography for CMAC hashing")
     import cryptography.hazmat.backends
-    import cryptography.hazmat.primitives.hashes
     import cryptography.hazmat.primitives.cmac
     import cryptography.hazmat.primitives.ciphers.algorithms
     ### https://cryptography.io/en/latest/hazmat/primitives/mac/cmac/
-    def newCMAC(key):
-        return cryptography.hazmat.primitives.cmac.CMAC(cryptography.hazmat.primitives.ciphers.algorithms.AES(key), backend=cryptography.hazmat.backends.default_backend())
-    def getCMACDigest(self):
-        return self.finalize()
+    return cryptography.hazmat.primitives.cmac.CMAC(cryptography.hazmat.primitives.ciphers.algorithms.AES(key), backend=cryptography.hazmat.backends.default_backend())
+def getCMACDigest(self):
+    if useCryptodomeCMAC():
+        return self.digest()
+    return self.finalize()
 
 ## Python 2/3 shortcoming: older zlib modules do not support compression dictionaries
 Zrif_Support = False
@@ -292,7 +306,7 @@ CONST_FMT_UINT64, CONST_FMT_UINT32, CONST_FMT_UINT16, CONST_FMT_UINT8 = "Q", "L"
 CONST_FMT_INT64, CONST_FMT_INT32, CONST_FMT_INT16, CONST_FMT_INT8 = "q", "l", "h", "b"
 CONST_FMT_CHAR = "s"
 #
-CONST_AES_EMPTY_IV = bytes(Cryptodome.Cipher.AES.block_size)
+CONST_AES_EMPTY_IV = bytes(0x10)  ## Cryptodome.Cipher.AES.block_size, without importing pycryptodomex
 #
 CONST_REGEX_HEX_DIGITS = re.compile("^[0-9a-fA-F]+$", flags=re.UNICODE|re.IGNORECASE)
 #
@@ -318,8 +332,29 @@ CONST_ZRIF_COMPRESSION_DICTIONARY = bytes.fromhex("00000000000000000000000000000
 CONST_CONTENT_ID_SIZE = 0x30  ## not 0x24 anymore, due to pkg2zip's extraction code for PSM's RW/System/content_id
 CONST_SHA256_HASH_SIZE = 0x20
 #
+## --> Ordered enumerations, same as aenum.OrderedEnum (members compare by value)
+class OrderedEnum(enum.Enum):
+    def __ge__(self, other):
+        if self.__class__ is other.__class__:
+            return self._value_ >= other._value_
+        return NotImplemented
+
+    def __gt__(self, other):
+        if self.__class__ is other.__class__:
+            return self._value_ > other._value_
+        return NotImplemented
+
+    def __le__(self, other):
+        if self.__class__ is other.__class__:
+            return self._value_ <= other._value_
+        return NotImplemented
+
+    def __lt__(self, other):
+        if self.__class__ is other.__class__:
+            return self._value_ < other._value_
+        return NotImplemented
 ## --> Platforms
-class CONST_PLATFORM(aenum.OrderedEnum):
+class CONST_PLATFORM(OrderedEnum):
     def __str__(self):
         return unicode(self.value)
 
@@ -331,7 +366,7 @@ class CONST_PLATFORM(aenum.OrderedEnum):
     PSM = "PSM"
     PS4 = "PS4"
 ## --> Package Types
-class CONST_PKG_TYPE(aenum.OrderedEnum):
+class CONST_PKG_TYPE(OrderedEnum):
     def __str__(self):
         return unicode(self.value)
 
@@ -343,7 +378,7 @@ class CONST_PKG_TYPE(aenum.OrderedEnum):
     AVATAR = "Avatar"
     LIVEAREA = "Livearea"
 ## --> Package Sub Types
-class CONST_PKG_SUB_TYPE(aenum.OrderedEnum):
+class CONST_PKG_SUB_TYPE(OrderedEnum):
     def __str__(self):
         return unicode(self.value)
 
@@ -968,9 +1003,7 @@ for Number, Curve in CONST_ECDSA_VSH_CURVES.items():
     if not "INT" in Curve["GZ"] \
     or Curve["GZ"]["INT"] is None:
         Curve["GZ"]["INT"] = 1  ## equal to 1 when converting from affine coordinates
-    # --> Build Curve
-    Curve["CURVE"] = ecdsa.ellipticcurve.CurveFp(Curve["P"]["INT"], Curve["A"]["INT"], Curve["B"]["INT"])
-    Curve["POINT"] = ecdsa.ellipticcurve.PointJacobi(Curve["CURVE"], Curve["GX"]["INT"], Curve["GY"]["INT"], Curve["GZ"]["INT"], order=Curve["N"]["INT"], generator=False)
+    # --> The curve itself is built by getEcdsaVshPubKey()
 del Key
 del Size
 del Bit_Len
@@ -1016,15 +1049,24 @@ for Number, PubKey in CONST_ECDSA_VSH_PUBKEYS.items():
                 Value = PubKey[Key]
             dprint("VSH ECDSA {} PubKey {}:".format(Number, Key), Value)
             del Value
-    # --> Build Public Key
-    PubPoint = ecdsa.ellipticcurve.Point(CONST_ECDSA_VSH_CURVES[PubKey["CURVE"]]["CURVE"], PubKey["X"]["INT"], PubKey["Y"]["INT"], order=CONST_ECDSA_VSH_CURVES[PubKey["CURVE"]]["N"]["INT"])
-    PubKey["PUBKEY"] = ecdsa.ecdsa.Public_key(CONST_ECDSA_VSH_CURVES[PubKey["CURVE"]]["POINT"], PubPoint, verify=True)
-del PubPoint
+    # --> The public key itself is built by getEcdsaVshPubKey()
 del Key
 del Size
 del PubKey
 del Number
 
+def getEcdsaVshPubKey(number):
+    ## Builds the ECDSA curve and public key on first use, only PKG3 extended header signatures need them
+    PubKey = CONST_ECDSA_VSH_PUBKEYS[number]
+    if not "PUBKEY" in PubKey:
+        Curve = CONST_ECDSA_VSH_CURVES[PubKey["CURVE"]]
+        if not "POINT" in Curve:
+            Curve["CURVE"] = ecdsa.ellipticcurve.CurveFp(Curve["P"]["INT"], Curve["A"]["INT"], Curve["B"]["INT"])
+            Curve["POINT"] = ecdsa.ellipticcurve.PointJacobi(Curve["CURVE"], Curve["GX"]["INT"], Curve["GY"]["INT"], Curve["GZ"]["INT"], order=Curve["N"]["INT"], generator=False)
+        PubPoint = ecdsa.ellipticcurve.Point(Curve["CURVE"], PubKey["X"]["INT"], PubKey["Y"]["INT"], order=Curve["N"]["INT"])
+        PubKey["PUBKEY"] = ecdsa.ecdsa.Public_key(Curve["POINT"], PubPoint, verify=True)
+    return PubKey["PUBKEY"]
+
 
 ##
 ## Special Case Definitions
@@ -1072,7 +1114,7 @@ def specialToJSON(python_object):
         return unicode(python_object)
     if isinstance(python_object, PkgXorSha1Counter):
         return unicode(python_object)
-    if isinstance(python_object, aenum.Enum):
+    if isinstance(python_object, enum.Enum):
         return unicode(python_object)
     raise TypeError("".join((repr(python_object), " is not JSON serializable")))
 
@@ -1414,6 +1456,7 @@ class PkgInputReader():
         if function_debug_level >= 3:
             dprint("[INPUT] Data stream is of class", file_part["STREAM"].__class__.__name__)
 
+    @timed("pkg.PkgInputReader.read", returned_size)
     def read(self, offset, size, function_debug_level=0):
         result = bytearray()
         read_offset = offset
@@ -1528,6 +1571,7 @@ class PkgAesCtrCounter():
         counter = Cryptodome.Util.Counter.new(self._key_bits, initial_value=start_counter)
         self._aes = Cryptodome.Cipher.AES.new(self._key, Cryptodome.Cipher.AES.MODE_CTR, counter=counter)
 
+    @timed("pkg.PkgAesCtrCounter.decrypt", returned_size)
     def decrypt(self, offset, data):
         self._setOffset(offset)
         self._block_offset += len(data)
@@ -1561,6 +1605,7 @@ class PkgXorSha1Counter():
             self._counter += count
             self._block_offset += count * self._block_size
 
+    @timed("pkg.PkgXorSha1Counter.decrypt", returned_size)
     def decrypt(self, offset, encrypted_data):
         self._setOffset(offset)
         self._block_offset += len(encrypted_data)
@@ -2446,7 +2491,7 @@ def checkNpdHeader(header_fields, header_bytes, results, function_debug_level):
         sha1_int = int.from_bytes(sha1, byteorder="big")
         del sha1
         ## --> verify
-        results["EXT_HDR_ECDSA"] = CONST_ECDSA_VSH_PUBKEYS[0]["PUBKEY"].verifies(sha1_int, signature)
+        results["EXT_HDR_ECDSA"] = getEcdsaVshPubKey(0).verifies(sha1_int, signature)
         del sha1_int
         del signature
         #
@@ -2771,7 +2816,8 @@ def parsePkg3ItemsInfo(header_fields, meta_data, input_stream, function_debug_le
     return item_entries, items_info_bytes
 
 
-def processPkg3Item(extractions_fields, item_entry, input_stream, item_data, size=None, extractions=None, function_debug_level=0):
+## progress(size) is called with the item data size of each block written to the extractions
+def processPkg3Item(extractions_fields, item_entry, input_stream, item_data, size=None, extractions=None, function_debug_level=0, progress=None):
     if function_debug_level >= 2:
         dprint(">>>>> PKG3 Body Item Entry #{} {}:".format(item_entry["INDEX"], item_entry["NAME"]))
 
@@ -2884,6 +2930,9 @@ def processPkg3Item(extractions_fields, item_entry, input_stream, item_data, siz
                     extract["ITEM_BYTES_WRITTEN"] += extract["STREAM"].write(write_bytes[block_data_ofs:block_data_ofs+block_data_size])
             del key
             del extract
+            #
+            if not progress is None:
+                progress(block_data_size)
 
         ## Prepare for next data block
         rest_size -= block_size
@@ -3181,6 +3230,7 @@ If you state URLs then only the necessary bytes are downloaded into memory.\nNot
     parser.add_argument("--unclean", action="store_true", help=help_unclean)
     parser.add_argument("--unknown", action="store_true", help=help_unknown)
     parser.add_argument("--debug", "-d", metavar="LEVEL", type=int, default=0, choices=choices_debug, help=help_debug)
+    add_progress_arguments(parser)
 
     return parser
 
@@ -3194,6 +3244,8 @@ if __name__ == "__main__":
         ## Check parameters from command line
         Parser = createArgParser()
         Arguments = Parser.parse_args()
+        ## JSON-lines progress events of the extractions: can be set via '--progress-fd'
+        open_progress_channel(Arguments)
         ## Global Debug [Verbosity] Level: can be set via '--debug='/'-d'
         Debug_Level = Arguments.debug
         ## Output Format: can be set via '-f'/'--format='
@@ -5025,6 +5077,8 @@ if __name__ == "__main__":
                 if not Pkg_Item_Entries is None \
                 and Process_Extractions:
                     Item_Entries_Sorted = sorted(Pkg_Item_Entries, key=lambda x: (x["IS_FILE_OFS"], x["INDEX"]))
+                    Extract_Progress = Progress("pkg_extract", sum(Item_Entry["DATASIZE"] for Item_Entry in Item_Entries_Sorted), len(Item_Entries_Sorted)).start()
+                    Extract_Errors = 0
                     for Item_Entry in Item_Entries_Sorted:
                         ## Initialize per-item variables
                         Item_Data = None
@@ -5383,8 +5437,10 @@ if __name__ == "__main__":
                                 Item_Data = Package["ITEM_BYTES"][Item_Index]
                             #
                             try:
-                                processPkg3Item(Extractions_Fields, Item_Entry, Input_Stream, Item_Data, extractions=Use_Extractions, function_debug_level=max(0, Debug_Level))
+                                processPkg3Item(Extractions_Fields, Item_Entry, Input_Stream, Item_Data, extractions=Use_Extractions, function_debug_level=max(0, Debug_Level), progress=Extract_Progress.advance)
+                                Extract_Progress.file(Item_Entry["NAME"], Item_Entry["DATASIZE"])
                             except:
+                                Extract_Errors += 1
                                 Extract_Key = None
                                 Extract = None
                                 for Extract_Key, Extract in Extractions.items():
@@ -5408,6 +5464,9 @@ if __name__ == "__main__":
                     del Use_Extractions
                     del Item_Data
                     #
+                    Extract_Progress.finish("{} item(s) could not be extracted".format(Extract_Errors) if Extract_Errors else None)
+                    del Extract_Progress
+                    del Extract_Errors
                     del Item_Entry
                     del Item_Entries_Sorted
 
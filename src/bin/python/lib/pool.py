@@ -0,0 +1,362 @@
+"""
+Pool of warm worker processes, split into operation classes.
+
+Each class (CPU-bound texture work, MOGG audio, I/O-bound STFS extraction...) owns its own worker
+processes, which import the class's modules once when they start, and its own queue. A class runs at
+most `processes * threads` jobs at once, whatever the load on the other classes. A worker is
+replaced by a fresh one after `max_jobs` jobs, or once its resident memory goes over `max_rss`
+bytes, so leaks and fragmented heaps of long runs don't build up. The old worker goes on taking jobs
+while its replacement warms up, so recycling never leaves a class short of a process.
+
+Workers are started from a `forkserver` process where the platform has one (`spawn` elsewhere), so
+a replacement is never forked from the threads of the pool itself. `stats()` reports the queue
+depth, the jobs in flight and a latency histogram of each class, and `instrumentation()` the counters
+of `lib/instrument.py` summed over every worker, when instrumentation is on.
+"""
+
+import bisect
+import importlib
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterable, List, Tuple
+
+from . import instrument
+
+# Upper bounds (in milliseconds) of the latency histogram buckets, the last one counts the rest
+LATENCY_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class WorkerDied(RuntimeError):
+    """A worker process exited while running a job."""
+
+@dataclass
+class OperationClass:
+    """How the jobs of one class of operations run."""
+    name: str
+    # Warm worker processes, and jobs each one runs at once on its own threads
+    processes: int = 1
+    threads: int = 1
+    # Modules every worker of the class imports before taking its first job
+    preload: Tuple[str, ...] = ()
+    # A worker is replaced after this many jobs / once its RSS is over this many bytes (0 never)
+    max_jobs: int = 0
+    max_rss: int = 0
+
+    @property
+    def concurrency(self) -> int:
+        return self.processes * self.threads
+
+def rss_bytes() -> int:
+    """Resident memory of this process, 0 where it can't be read."""
+    try:
+        with open("/proc/self/statm", "rb") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # Peak rather than current RSS, in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+def _worker_main(connection, handler: Callable[[Any], Any], preload: Iterable[str], threads: int) -> None:
+    """Entry point of a worker process: imports preload, then runs handler on every job it receives."""
+    for module in preload:
+        importlib.import_module(module)
+    send_lock = threading.Lock()
+
+    def send(message) -> None:
+        with send_lock:
+            connection.send(message)
+
+    def run(job_id: int, payload) -> None:
+        try:
+            ok, value = True, handler(payload)
+        except BaseException as e:
+            ok, value = False, "%s: %s" % (type(e).__name__, e)
+        # The instrumentation counters of the process so far ride along with each result
+        send((job_id, ok, value, rss_bytes(), instrument.snapshot() if instrument.ENABLED else None))
+
+    send((None, True, "ready", rss_bytes(), None))
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        while True:
+            try:
+                job = connection.recv()
+            except EOFError:
+                break
+            if job is None:
+                break
+            executor.submit(run, *job)
+
+class _Worker:
+    """The pool side of one worker process."""
+
+    def __init__(self, context, operation_class: OperationClass, handler: Callable[[Any], Any]) -> None:
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_connection, handler, operation_class.preload, operation_class.threads),
+            name="rbtools-%s" % operation_class.name,
+            daemon=True,
+        )
+        self.process.start()
+        child_connection.close()
+        self.send_lock = threading.Lock()
+        self.jobs: Dict[int, Tuple[Future, float]] = {}
+        self.completed = 0
+        self.rss = 0
+        self.counters: instrument.Counters = {}
+        # Retiring: its replacement is starting, it takes jobs until then. Draining: it takes no more
+        # jobs, and stops once the ones it has are done.
+        self.retiring = False
+        self.draining = False
+
+    def wait_ready(self) -> None:
+        """Waits for the preload imports. Raises EOFError if the process died doing them."""
+        _, _, _, self.rss, _ = self.connection.recv()
+
+    def send(self, job_id: int, payload) -> None:
+        with self.send_lock:
+            self.connection.send((job_id, payload))
+
+    def stop(self) -> None:
+        try:
+            with self.send_lock:
+                self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
+
+@dataclass
+class _ClassState:
+    operation_class: OperationClass
+    queue: Deque[Tuple[int, Any, Future, float]] = field(default_factory=deque)
+    workers: List[_Worker] = field(default_factory=list)
+    # Workers being started in place of recycled ones
+    starting: int = 0
+    submitted: int = 0
+    completed: int = 0
+    errors: int = 0
+    recycled: int = 0
+    histogram: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    latency_total: float = 0.0
+    # Instrumentation counters of the workers that were stopped
+    stopped_counters: instrument.Counters = field(default_factory=dict)
+
+    @property
+    def in_flight(self) -> int:
+        return sum(len(worker.jobs) for worker in self.workers)
+
+class WorkerPool:
+    """
+    Runs `handler(payload)` on warm worker processes, routing each payload to the class picked by
+    `route(payload)`. `submit()` returns a `concurrent.futures.Future` of the handler's return value.
+
+    The handler, and the payloads and values, must be picklable; the handler is looked up by name in
+    the worker processes, so it has to be a module-level function.
+    """
+
+    def __init__(self, classes: Iterable[OperationClass], handler: Callable[[Any], Any], route: Callable[[Any], str]) -> None:
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._handler = handler
+        self._route = route
+        self._condition = threading.Condition()
+        self._closed = False
+        self._next_id = 0
+        self._classes: Dict[str, _ClassState] = {operation_class.name: _ClassState(operation_class) for operation_class in classes}
+
+        # Every worker is started before waiting on any of them, so they warm up at the same time
+        for state in self._classes.values():
+            for _ in range(state.operation_class.processes):
+                state.workers.append(_Worker(self._context, state.operation_class, handler))
+        for state in self._classes.values():
+            for worker in state.workers:
+                worker.wait_ready()
+                self._start_reader(state, worker)
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+
+    def _start_reader(self, state: _ClassState, worker: _Worker) -> None:
+        threading.Thread(target=self._read, args=(state, worker), name="%s-reader" % worker.process.name, daemon=True).start()
+
+    def submit(self, payload) -> Future:
+        name = self._route(payload)
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("cannot submit to a pool that was shut down")
+            state = self._classes[name]
+            self._next_id += 1
+            state.queue.append((self._next_id, payload, future, time.perf_counter()))
+            state.submitted += 1
+            self._dispatch(state)
+        return future
+
+    def _dispatch(self, state: _ClassState) -> None:
+        """Sends queued jobs of a class to its least busy workers with a free slot. Called holding the condition."""
+        threads = state.operation_class.threads
+        while state.queue:
+            free = [worker for worker in state.workers if not worker.draining and len(worker.jobs) < threads]
+            if not free:
+                return
+            worker = min(free, key=lambda worker: len(worker.jobs))
+            job_id, payload, future, submitted_at = state.queue.popleft()
+            worker.jobs[job_id] = (future, submitted_at)
+            worker.send(job_id, payload)
+
+    def _read(self, state: _ClassState, worker: _Worker) -> None:
+        """Settles the futures of a worker's jobs as their results come back, until the worker exits."""
+        while True:
+            try:
+                job_id, ok, value, rss, counters = worker.connection.recv()
+            except (EOFError, OSError):
+                break
+            done_at = time.perf_counter()
+            with self._condition:
+                future, submitted_at = worker.jobs.pop(job_id)
+                worker.completed += 1
+                worker.rss = rss
+                if counters is not None:
+                    worker.counters = counters
+                self._record(state, (done_at - submitted_at) * 1000, ok)
+                limits = state.operation_class
+                if not worker.retiring and ((limits.max_jobs and worker.completed >= limits.max_jobs) or (limits.max_rss and rss >= limits.max_rss)):
+                    self._retire(state, worker)
+                if worker.draining and not worker.jobs:
+                    self._remove(state, worker)
+                self._dispatch(state)
+                self._condition.notify_all()
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+
+        with self._condition:
+            if worker not in state.workers:
+                return
+            # The process died: its jobs fail, and it's replaced unless the pool is closing
+            lost = list(worker.jobs.values())
+            worker.jobs.clear()
+            for _, submitted_at in lost:
+                self._record(state, (time.perf_counter() - submitted_at) * 1000, False)
+            if not worker.retiring:
+                self._retire(state, worker)
+            self._remove(state, worker)
+            self._condition.notify_all()
+        worker.process.join(1)
+        code = worker.process.exitcode
+        for future, _ in lost:
+            future.set_exception(WorkerDied("worker process of class %r exited with code %s" % (state.operation_class.name, code)))
+
+    def _record(self, state: _ClassState, latency_ms: float, ok: bool) -> None:
+        state.completed += 1
+        state.errors += not ok
+        state.latency_total += latency_ms
+        state.histogram[bisect.bisect_left(LATENCY_BUCKETS, latency_ms)] += 1
+
+    def _retire(self, state: _ClassState, worker: _Worker) -> None:
+        """Starts a replacement for a worker in the background, the worker keeps taking jobs until it's ready. Called holding the condition."""
+        worker.retiring = True
+        if self._closed and not state.queue:
+            worker.draining = True
+            return
+        state.recycled += 1
+        state.starting += 1
+        threading.Thread(target=self._start_replacement, args=(state, worker), daemon=True).start()
+
+    def _remove(self, state: _ClassState, worker: _Worker) -> None:
+        """Takes a worker out of its class and stops its process. Called holding the condition."""
+        worker.draining = True
+        if worker in state.workers:
+            state.workers.remove(worker)
+            state.stopped_counters = instrument.merge((state.stopped_counters, worker.counters))
+            threading.Thread(target=worker.stop, daemon=True).start()
+
+    def _start_replacement(self, state: _ClassState, retired: _Worker) -> None:
+        worker = _Worker(self._context, state.operation_class, self._handler)
+        try:
+            worker.wait_ready()
+        except EOFError:
+            with self._condition:
+                state.starting -= 1
+                # The retired worker goes on taking jobs, unless nothing is left to run them
+                if retired not in state.workers and not state.workers and not state.starting:
+                    lost = list(state.queue)
+                    state.queue.clear()
+                else:
+                    lost = []
+                for job in lost:
+                    self._record(state, (time.perf_counter() - job[3]) * 1000, False)
+                self._condition.notify_all()
+            worker.process.join()
+            for _, _, future, _ in lost:
+                future.set_exception(WorkerDied("worker process of class %r exited with code %s while starting" % (state.operation_class.name, worker.process.exitcode)))
+            return
+        with self._condition:
+            state.starting -= 1
+            state.workers.append(worker)
+            self._start_reader(state, worker)
+            retired.draining = True
+            if not retired.jobs:
+                self._remove(state, retired)
+            self._dispatch(state)
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth, jobs in flight, counters and latency histogram (time from submit() to the result) of each class."""
+        with self._condition:
+            return {
+                name: {
+                    "workers": len(state.workers),
+                    "starting": state.starting,
+                    "concurrency": state.operation_class.concurrency,
+                    "queued": len(state.queue),
+                    "inFlight": state.in_flight,
+                    "submitted": state.submitted,
+                    "completed": state.completed,
+                    "errors": state.errors,
+                    "recycled": state.recycled,
+                    "rss": [worker.rss for worker in state.workers],
+                    "latency": {
+                        "meanMs": state.latency_total / state.completed if state.completed else 0.0,
+                        "buckets": [*LATENCY_BUCKETS, None],
+                        "counts": list(state.histogram),
+                    },
+                }
+                for name, state in self._classes.items()
+            }
+
+    def instrumentation(self) -> instrument.Counters:
+        """The instrumentation counters of every worker, running or stopped, summed. Each worker reports them with its results."""
+        with self._condition:
+            return instrument.merge(
+                [state.stopped_counters for state in self._classes.values()]
+                + [worker.counters for state in self._classes.values() for worker in state.workers]
+            )
+
+    def shutdown(self) -> None:
+        """Waits for the submitted jobs, then stops every worker."""
+        with self._condition:
+            self._closed = True
+            self._condition.wait_for(lambda: all(not state.queue and not state.in_flight and not state.starting for state in self._classes.values()))
+            workers = [worker for state in self._classes.values() for worker in state.workers]
+            for state in self._classes.values():
+                state.stopped_counters = instrument.merge([state.stopped_counters] + [worker.counters for worker in state.workers])
+                state.workers.clear()
+        for worker in workers:
+            worker.stop()
@@ -0,0 +1,99 @@
+"""
+Profiling mode shared by the scripts: `--profile` writes a cProfile dump of the run (open it with
+`python -m pstats` or snakeviz), and `--trace-malloc [N]` a report of the peak memory traced by
+tracemalloc and the N lines holding the most memory when the run ends.
+
+Both can also be turned on with environment variables, so runs started by the TS wrappers are
+profiled without changing their command lines: `RBTOOLS_PROFILE=1` and `RBTOOLS_TRACE_MALLOC=N`
+(`1` uses the default of 25 lines).
+
+The reports go next to the output of the script: "<output>.<script>.prof" and
+"<output>.<script>.malloc.txt", or into the folder given by `--profile-dir` / `RBTOOLS_PROFILE_DIR`.
+Scripts without an output file write them to "rbtools-profiles" under the temporary folder, named
+after the script and the process ID. Nothing is printed, so the output of the script is unchanged.
+
+cProfile only sees the main thread: the work of thread pools shows up as the time spent waiting
+on them. tracemalloc sees every thread.
+"""
+
+import argparse
+import contextlib
+import os
+from typing import Iterator, Optional
+
+DEFAULT_TOP = 25
+DISABLED = ("", "0", "off", "false", "no")
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group("profiling")
+    group.add_argument("--profile", help="Writes a cProfile dump of the run next to the output", action="store_true")
+    group.add_argument("--trace-malloc", help="Writes the peak traced memory and the N lines holding the most memory at the end of the run next to the output (default N: %d)" % DEFAULT_TOP, nargs="?", const=DEFAULT_TOP, default=0, type=int, metavar="N")
+    group.add_argument("--profile-dir", help="The folder the profiling reports are written to, instead of next to the output", type=str, required=False)
+
+def settings(args: Optional[argparse.Namespace] = None):
+    """(profile, trace_malloc lines, report folder) from the arguments, or else the environment."""
+    profile = getattr(args, "profile", False) or os.environ.get("RBTOOLS_PROFILE", "").lower() not in DISABLED
+    top = getattr(args, "trace_malloc", 0)
+    if not top:
+        value = os.environ.get("RBTOOLS_TRACE_MALLOC", "").strip().lower()
+        # Any other switch value turns it on with the default line count, no warning: the callers fail on stderr output
+        top = 0 if value in DISABLED else int(value) if value.isdigit() and value != "1" else DEFAULT_TOP
+    folder = getattr(args, "profile_dir", None) or os.environ.get("RBTOOLS_PROFILE_DIR") or None
+    return profile, top, folder
+
+def report_path(name: str, output: Optional[str], folder: Optional[str], suffix: str) -> str:
+    if output:
+        output = os.path.normpath(os.path.abspath(output))
+        stem = "%s.%s" % (os.path.basename(output), name)
+        folder = folder or os.path.dirname(output)
+    else:
+        import tempfile
+        stem = "%s-%d" % (name, os.getpid())
+        folder = folder or os.path.join(tempfile.gettempdir(), "rbtools-profiles")
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, stem + suffix)
+
+def write_malloc_report(path: str, name: str, top: int) -> None:
+    import tracemalloc
+    current, peak = tracemalloc.get_traced_memory()
+    # Leaves out what tracemalloc, cProfile and the import system hold themselves
+    statistics = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "*/cProfile.py"),
+        tracemalloc.Filter(False, "*/profile.py"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    )).statistics("lineno")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("%s: peak %.1f MB traced, %.1f MB still held at the end\n\n" % (name, peak / 1e6, current / 1e6))
+        f.write("Top %d lines by memory held at the end:\n" % top)
+        for statistic in statistics[:top]:
+            frame = statistic.traceback[0]
+            f.write("%10.1f KB %8d blocks  %s:%d\n" % (statistic.size / 1e3, statistic.count, frame.filename, frame.lineno))
+
+@contextlib.contextmanager
+def profiled(name: str, args: Optional[argparse.Namespace] = None, output: Optional[str] = None) -> Iterator[None]:
+    """Profiles the body as set by args (see add_arguments()) or the environment, writing the reports at its end, even if it raises."""
+    profile, top, folder = settings(args)
+    if not profile and not top:
+        yield
+        return
+
+    # Only imported when profiling
+    profiler = None
+    if top:
+        import tracemalloc
+        tracemalloc.start()
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(report_path(name, output, folder, ".prof"))
+        if top:
+            write_malloc_report(report_path(name, output, folder, ".malloc.txt"), name, top)
+            tracemalloc.stop()
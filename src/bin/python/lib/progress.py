@@ -0,0 +1,130 @@
+"""
+Machine-readable progress of long-running operations, as JSON lines on a channel of their own.
+
+The channel is a file descriptor given with `--progress-fd` (or the `RBTOOLS_PROGRESS_FD`
+environment variable), typically an extra pipe opened by the caller as fd 3, so the events never
+mix with the results on stdout or the errors on stderr. Without a channel, reporting costs a
+counter update and a check.
+
+Every event is one JSON object on its own line, with "event", "operation" and "time" (seconds since
+the operation started):
+- "start": the "total" bytes and "files" the operation is going to process.
+- "progress": bytes "done", "total" and "bytesPerSecond", at most once every `interval` seconds.
+- "file": a file is done, with its "path" and "size", and "filesDone".
+- "status": a "message" of the libraries ("decryption successful", a warning...) and its "level".
+- "end": "ok", bytes "done", "total", "bytesPerSecond", and the "error" message when it failed.
+
+The status messages are sent as events, never to stdout. Without a channel, the errors go to stderr
+and the other messages are dropped: the callers take any stderr output as a failure.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from typing import IO, Optional
+
+_channel: Optional[IO[str]] = None
+_lock = threading.Lock()
+_local = threading.local()
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--progress-fd", help="Writes JSON-lines progress events to this open file descriptor (3 for the first extra pipe)", type=int, required=False)
+
+def open_channel(args: Optional[argparse.Namespace] = None) -> None:
+    """Opens the channel given by args (see add_arguments()), or else by the environment."""
+    global _channel
+    fd = getattr(args, "progress_fd", None)
+    if fd is None and os.environ.get("RBTOOLS_PROGRESS_FD", "").strip().isdigit():
+        # Other values are ignored, like an unset variable
+        fd = int(os.environ["RBTOOLS_PROGRESS_FD"])
+    if fd is not None:
+        _channel = os.fdopen(fd, "w", encoding="utf-8", buffering=1, closefd=False)
+
+def enabled() -> bool:
+    return _channel is not None
+
+def emit(event: dict) -> None:
+    if _channel is None:
+        return
+    # Only imported when a channel is open, the libraries import this module
+    import json
+    line = json.dumps(event, ensure_ascii=False) + "\n"
+    with _lock:
+        try:
+            _channel.write(line)
+        except OSError:
+            # The reader went away, the operation goes on without it
+            pass
+
+def status(message: str, level: str = "info") -> None:
+    """Sends a status message of the operation running on this thread, if any."""
+    if _channel is None:
+        if level == "error":
+            print(message, file=sys.stderr)
+        return
+    current: Optional[Progress] = getattr(_local, "current", None)
+    if current is not None:
+        current.emit("status", level=level, message=message)
+    else:
+        emit({"event": "status", "level": level, "message": message})
+
+class Progress:
+    """
+    Progress of one operation, a context manager sending its "start" and "end" events (or call
+    start() and finish() around it).
+
+    `advance(size)` is cheap enough to be called on every block read or written, and can be passed
+    to the libraries as their progress callback.
+    """
+
+    def __init__(self, operation: str, total: int = 0, files: int = 0, interval: float = 0.1) -> None:
+        self.operation = operation
+        self.total = total
+        self.files = files
+        self.interval = interval
+        self.done = 0
+        self.files_done = 0
+        self.started = time.perf_counter()
+        self._next_report = 0.0
+        self._parent: Optional[Progress] = None
+
+    def __enter__(self) -> "Progress":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.finish(None if exc_type is None else "%s: %s" % (exc_type.__name__, exc))
+
+    def start(self) -> "Progress":
+        self.started = time.perf_counter()
+        self._next_report = self.started + self.interval
+        self._parent = getattr(_local, "current", None)
+        _local.current = self
+        self.emit("start", total=self.total, files=self.files)
+        return self
+
+    def finish(self, error: Optional[str] = None) -> None:
+        _local.current = self._parent
+        fields = {"ok": error is None, "done": self.done, "total": self.total, "filesDone": self.files_done, "bytesPerSecond": self.rate()}
+        if error is not None:
+            fields["error"] = error
+        self.emit("end", **fields)
+
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def emit(self, event: str, **fields) -> None:
+        emit({"event": event, "operation": self.operation, "time": round(time.perf_counter() - self.started, 4), **fields})
+
+    def advance(self, size: int) -> None:
+        self.done += size
+        if _channel is not None and time.perf_counter() >= self._next_report:
+            self._next_report = time.perf_counter() + self.interval
+            self.emit("progress", done=self.done, total=self.total, bytesPerSecond=self.rate())
+
+    def file(self, path: str, size: int) -> None:
+        self.files_done += 1
+        if _channel is not None:
+            self.emit("file", path=path, size=size, filesDone=self.files_done, done=self.done, total=self.total)
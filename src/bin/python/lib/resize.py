@@ -0,0 +1,55 @@
+"""
+Letterboxed resizing of album art, shared by the image converters and the WEBP data URL builders.
+
+The converters used to paste the source on a black square as big as its largest side, then shrink
+that square to the target size. `letterbox` gives the same picture by shrinking the source alone
+(JPEG sources decoding straight at a reduced DCT scale through `draft()`, the rest going through
+`reduce()` before the final resample) and pasting it on a black square of the target size, so the
+full resolution canvas is never allocated.
+"""
+
+from typing import Tuple
+
+from PIL import Image
+
+# Passed to Image.resize(): the image is first reduced by an integer factor with Image.reduce(), as
+# long as it stays at least this many times the target size, as Image.thumbnail() does
+REDUCING_GAP = 2.0
+
+def letterbox_geometry(source_size: Tuple[int, int], width: int, height: int) -> Tuple[int, Tuple[int, int], Tuple[int, int]]:
+    """(side of the output square, size of the scaled source, its offset) of a letterboxed resize.
+
+    Matches pasting the source centered on a black square of max(width, source width, source
+    height) pixels and calling thumbnail((width, height)) on it: sources smaller than the target are
+    not scaled up.
+    """
+    x, y = source_size
+    canvas = max(width, x, y)
+    side = min(canvas, width, height)
+    scale = side / canvas
+    scaled = (max(1, min(side, round(x * scale))), max(1, min(side, round(y * scale))))
+    offset = (min(side - scaled[0], round(int((canvas - x) / 2) * scale)), min(side - scaled[1], round(int((canvas - y) / 2) * scale)))
+    return side, scaled, offset
+
+def draft(image: Image.Image, width: int, height: int) -> None:
+    """Lets a JPEG that hasn't been loaded yet decode at the smallest DCT scale still bigger than the letterboxed size."""
+    if image.format == "JPEG":
+        _, scaled, _ = letterbox_geometry(image.size, width, height)
+        image.draft("RGB", scaled)
+
+def letterbox(image: Image.Image, width: int, height: int, interpolation: str = "BILINEAR") -> Image.Image:
+    """An RGB copy of image, scaled to fit width x height and centered on a black square."""
+    # The geometry comes from the original size even when draft() made the decoded image smaller
+    original_size = image.size
+    draft(image, width, height)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    side, scaled, offset = letterbox_geometry(original_size, width, height)
+    if image.size != scaled:
+        image = image.resize(scaled, resample=Image.Resampling[interpolation], reducing_gap=REDUCING_GAP)
+    if scaled == (side, side):
+        return image
+    output = Image.new("RGB", (side, side), (0, 0, 0))
+    output.paste(image, offset)
+    return output
@@ -0,0 +1,147 @@
+"""
+Large results (decoded textures, decrypted OGG data, extracted files) handed to the host in shared
+memory, instead of going through the JSON responses of the worker as Base64.
+
+A request to the worker picks where the bytes of its result are written with its "output" member:
+- {"type": "shm"}: a new `multiprocessing.shared_memory` segment for each bytes value, with a name
+  made up by the worker ({"type": "shm", "name": "..."} names the first one). POSIX only. The host
+  owns the segments: it reads them (on Linux, "/dev/shm/<name>") and unlinks them, or calls the
+  `release_shared_memory` method of the worker.
+- {"type": "mmap", "path": "...", "offset": 0, "size": N}: a file created by the host, which maps
+  it itself. The values are written one after the other from offset on, each one aligned to
+  `ALIGNMENT` bytes, within size bytes (up to the end of the file by default).
+
+Each bytes value of the result is then replaced by a handle, {"shm": name, "offset": 0, "length": n}
+or {"path": path, "offset": offset, "length": n}. Without an output, bytes values are sent as
+{"base64": "..."}. The bytes are copied once, into the segment or the mapping, and never pass
+through the pipe or socket of the worker, nor through the pool's pipes to its processes.
+"""
+
+import base64
+import dataclasses
+import mmap
+import os
+from typing import Any, Dict, List, Optional
+
+# Start of each value in a mapped file: a cache line, so any typed array can view it in place
+ALIGNMENT = 64
+
+BYTES_TYPES = (bytes, bytearray, memoryview)
+
+class Base64Output:
+    def write(self, data) -> Dict[str, Any]:
+        return {"base64": base64.b64encode(data).decode("ascii")}
+
+    def close(self) -> None:
+        pass
+
+    def discard(self) -> None:
+        pass
+
+class SharedMemoryOutput:
+    def __init__(self, name: Optional[str] = None) -> None:
+        if os.name != "posix":
+            raise ValueError("shm outputs need POSIX shared memory, use an mmap output")
+        self.name = name
+        self.names: List[str] = []
+
+    def write(self, data) -> Dict[str, Any]:
+        # multiprocessing is only imported when used
+        from multiprocessing import resource_tracker, shared_memory
+        length = len(data)
+        name, self.name = self.name, None
+        segment = shared_memory.SharedMemory(name=name, create=True, size=max(1, length))
+        try:
+            segment.buf[:length] = data
+        except BaseException:
+            segment.close()
+            segment.unlink()
+            raise
+        # The segment belongs to the host from now on: it must outlive this process, whose
+        # resource tracker would remove it at exit
+        resource_tracker.unregister(segment._name, "shared_memory")  # type: ignore[attr-defined]
+        segment.close()
+        self.names.append(segment.name)
+        return {"shm": segment.name, "offset": 0, "length": length}
+
+    def close(self) -> None:
+        pass
+
+    def discard(self) -> None:
+        """Removes the segments written so far, when the result can't be sent after all."""
+        for name in self.names:
+            release_shared_memory(name)
+        self.names = []
+
+class MappedFileOutput:
+    def __init__(self, path: str, offset: int = 0, size: Optional[int] = None) -> None:
+        if offset < 0 or (size is not None and size < 0):
+            raise ValueError("mmap outputs need a positive offset and size")
+        self.path = path
+        self.file = open(path, "r+b")
+        file_size = os.fstat(self.file.fileno()).st_size
+        self.position = offset
+        self.end = file_size if size is None else offset + size
+        if self.end > file_size:
+            self.file.close()
+            raise ValueError("%s: %d bytes from offset %d go past the end of the file (%d bytes)" % (path, self.end - offset, offset, file_size))
+        self.map = mmap.mmap(self.file.fileno(), 0) if file_size else None
+
+    def write(self, data) -> Dict[str, Any]:
+        length = len(data)
+        offset = -(-self.position // ALIGNMENT) * ALIGNMENT
+        if offset + length > self.end:
+            raise ValueError("%s: a result of %d bytes doesn't fit at offset %d (the output ends at %d)" % (self.path, length, offset, self.end))
+        if length:
+            self.map[offset:offset + length] = data  # type: ignore[index]
+        self.position = offset + length
+        return {"path": self.path, "offset": offset, "length": length}
+
+    def close(self) -> None:
+        if self.map is not None:
+            self.map.flush()
+            self.map.close()
+        self.file.close()
+
+    def discard(self) -> None:
+        # The region belongs to the host, which ignores it without a handle
+        pass
+
+def result_output(spec: Optional[Dict[str, Any]]):
+    """The output described by the "output" member of a request (see the module docstring)."""
+    if spec is None:
+        return Base64Output()
+    if not isinstance(spec, dict):
+        raise ValueError("output must be an object")
+    kind = spec.get("type")
+    if kind == "shm":
+        return SharedMemoryOutput(spec.get("name"))
+    if kind == "mmap":
+        if not isinstance(spec.get("path"), str):
+            raise ValueError("mmap outputs need the path of the file")
+        return MappedFileOutput(spec["path"], int(spec.get("offset", 0)), None if spec.get("size") is None else int(spec["size"]))
+    raise ValueError("Unknown output type: %r" % kind)
+
+def encode_result(value: Any, output) -> Any:
+    """value with each bytes value written to output and replaced by its handle. Dataclasses become objects."""
+    if isinstance(value, BYTES_TYPES):
+        return output.write(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        # Not dataclasses.asdict(), which would copy the bytes
+        return {field.name: encode_result(getattr(value, field.name), output) for field in dataclasses.fields(value)}
+    if isinstance(value, dict):
+        return {key: encode_result(item, output) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_result(item, output) for item in value]
+    return value
+
+def release_shared_memory(name: str) -> bool:
+    """Removes a segment written by a shm output. Returns False if it was already gone."""
+    from multiprocessing import shared_memory
+    try:
+        segment = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    segment.close()
+    segment.unlink()
+    return True
@@ -0,0 +1,130 @@
+"""
+The songs of a CON file and their assets, read straight from the STFS container in memory.
+
+For each song of "/songs/songs.dta", the album art ("<song>_keep.png_xbox") is decoded into a WEBP
+data URL and the MOGG is decrypted and stat'ed (see `api.mogg_stat`), one song at a time, so a
+library scan never extracts the container or writes temporary files. The assets of a song are
+released before the next one is read.
+
+A song whose art or audio can't be read still gets its record, with the reason in "errors".
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from .api import Progress, Source, decode_texture, mogg_stat, open_stfs, read_stfs_file
+from .progress import status
+from .stfs import STFS
+
+DTA_PATH = "/songs/songs.dta"
+
+# A parsed DTA node: a list of its children, which are nodes, strings, symbols or numbers
+Node = List[Any]
+
+def _tokens(text: str) -> Iterator[Any]:
+    i, length = 0, len(text)
+    while i < length:
+        char = text[i]
+        if char in "()":
+            yield char
+            i += 1
+        elif char.isspace():
+            i += 1
+        elif char == ";":
+            end = text.find("\n", i)
+            i = length if end < 0 else end + 1
+        elif char == '"':
+            end = text.find('"', i + 1)
+            end = length if end < 0 else end
+            # Strings are kept apart from the symbols by their quotes
+            yield ('"', text[i + 1:end])
+            i = end + 1
+        else:
+            start = i
+            while i < length and not text[i].isspace() and text[i] not in '();"':
+                i += 1
+            yield text[start:i].strip("'")
+
+def parse_dta(text: str) -> List[Node]:
+    """The top-level nodes of a DTA file. Strings come out as ('"', value) tuples."""
+    stack: List[Node] = [[]]
+    for token in _tokens(text):
+        if token == "(":
+            stack.append([])
+        elif token == ")":
+            if len(stack) > 1:
+                node = stack.pop()
+                stack[-1].append(node)
+        else:
+            stack[-1].append(token)
+    while len(stack) > 1:
+        node = stack.pop()
+        stack[-1].append(node)
+    return [node for node in stack[0] if isinstance(node, list) and node]
+
+def _child(node: Node, key: str) -> Optional[Node]:
+    for child in node[1:]:
+        if isinstance(child, list) and child and child[0] == key:
+            return child
+    return None
+
+def _value(node: Optional[Node], key: str) -> Optional[str]:
+    child = _child(node, key) if node else None
+    if not child or len(child) < 2:
+        return None
+    value = child[1]
+    return value[1] if isinstance(value, tuple) else str(value)
+
+def _decode_dta(data: bytes) -> str:
+    try:
+        return data.decode()
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+def song_assets(source: Union[Source, STFS], art = True, audio = True, art_size = 256, quality = 100, progress: Progress = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yields one record per song of a CON file: its "id", "name", "artist" and "songname" from the
+    DTA, the "art" (path, size and WEBP "dataURL" scaled to fit art_size, 0 keeping the full size)
+    and the "mogg" stats (path plus the keys of `MOGGStat.as_dict()`), or None for assets that are
+    missing or turned off, and the "errors" of the song.
+
+    progress(size) is called for every block read from the container.
+    """
+    con = source if isinstance(source, STFS) else open_stfs(source)
+    try:
+        if DTA_PATH not in con.allfiles:
+            raise FileNotFoundError("%s: no %s in the container" % (con.filename, DTA_PATH))
+        for entry in parse_dta(_decode_dta(read_stfs_file(con, DTA_PATH, progress))):
+            song_id = str(entry[0]) if not isinstance(entry[0], (list, tuple)) else None
+            songname = _value(_child(entry, "song"), "name") or (song_id and "songs/%s/%s" % (song_id, song_id))
+            short_name = songname.rsplit("/", 1)[-1] if songname else None
+            record: Dict[str, Any] = {"id": song_id, "name": _value(entry, "name"), "artist": _value(entry, "artist"), "songname": songname, "art": None, "mogg": None, "errors": []}
+
+            if art and short_name:
+                path = "/%s/gen/%s_keep.png_xbox" % (songname.rsplit("/", 1)[0], short_name)
+                if path in con.allfiles:
+                    try:
+                        record["art"] = _art(read_stfs_file(con, path, progress), path, art_size, quality)
+                    except Exception as e:
+                        record["errors"].append("%s: %s: %s" % (path, type(e).__name__, e))
+
+            if audio and songname:
+                path = "/%s.mogg" % songname
+                if path in con.allfiles:
+                    try:
+                        record["mogg"] = {"path": path, **mogg_stat(read_stfs_file(con, path, progress)).as_dict()}
+                    except Exception as e:
+                        record["errors"].append("%s: %s: %s" % (path, type(e).__name__, e))
+
+            for error in record["errors"]:
+                status(error, "warning")
+            yield record
+    finally:
+        if con is not source:
+            con.close()
+
+def _art(data: bytes, path: str, size: int, quality: int) -> Dict[str, Any]:
+    from .dds import HMXHeader
+    from .webp import to_data_url
+    header = HMXHeader.unpack(data)
+    image = decode_texture(data, "png_xbox", size).convert("RGB")
+    return {"path": path, "width": header.width, "height": header.height, "dataURL": to_data_url(image, quality)}
@@ -14,7 +14,8 @@ See http://free60.org/STFS
 import struct
 import hashlib
 from io import BufferedReader, BytesIO as StringIO
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Tuple
+from .instrument import returned_size, timed
 
 class STFSHashInfo(object):
     """Whether the block represented by the BlockHashRecord is used, free, old or current."""
@@ -194,19 +195,31 @@ class STFS(object):
             path_components.reverse()
             self.allfiles["/".join((x.decode("UTF-8") for x in path_components))] = fl
 
-    def read_file(self, filelisting: FileListing, size=-1):
+    def read_file(self, filelisting: FileListing, size=-1, progress: Optional[Callable[[int], None]] = None):
         """Given a filelisting object return its data
         This requies checking each blockhash to find the next block.
         In some cases this requires checking two different hash tables.
+        progress(length) is called after each block is read.
         """
         buf = StringIO()
+        for blocknum, readlen in self.get_file_blocks(filelisting, size):
+            buf.write(self.read_block(blocknum, readlen))
+            if progress is not None:
+                progress(readlen)
+        return buf.getvalue()
+
+    def get_file_blocks(self, filelisting: FileListing, size=-1) -> List[Tuple[int, int]]:
+        """Given a filelisting object return the (on-disk block number, length) pairs that hold its data
+        Only the hash tables are read here, so the data blocks can be fetched later in any order.
+        """
+        blocks: List[Tuple[int, int]] = []
         if size == -1:
             size = filelisting.size
         block = filelisting.firstblock
         info = 0x80
         while size > 0 and block > 0 and block < self.allocated_count and info >= 0x80:
             readlen = min(0x1000, size)
-            buf.write(self.read_block(self.fix_blocknum(block), readlen))
+            blocks.append((self.fix_blocknum(block), readlen))
             size -= readlen
             blockhash = self.get_blockhash(
                 block
@@ -218,8 +231,9 @@ class STFS(object):
                 blockhash = self.get_blockhash(block, 1)
             block = blockhash.nextblock
             info = blockhash.info
-        return buf.getvalue()
+        return blocks
 
+    @timed("stfs.get_blockhash")
     def get_blockhash(self, blocknum: int, table_offset=0) -> BlockHashRecord:
         """Given a block number return the hash object that goes with it"""
         record = blocknum % 0xAA
@@ -271,14 +285,24 @@ class STFS(object):
             block_adjust += ((block_num // 0x70E4) + 1) << self.table_size_shift
         return block_adjust + block_num
 
+    @timed("stfs.read_block", returned_size)
     def read_block(self, blocknum: int, length=0x1000) -> bytes:
         """
         Read a block given its block number
         If reading data blocks call fix_blocknum first
         """
-        self.fd.seek(0xC000 + blocknum * 0x1000)
+        self.fd.seek(self.block_offset(blocknum))
         return self.fd.read(length)
 
+    @staticmethod
+    def block_offset(blocknum: int) -> int:
+        """Given an on-disk block number return its byte offset in the container"""
+        return 0xC000 + blocknum * 0x1000
+
+    def close(self) -> None:
+        """Close the underlying file object"""
+        self.fd.close()
+
     # This is a huge, messy struct parsing function.
     # There is almost no logic here, just offsets.
     def parse_header(self, data: bytes) -> None:
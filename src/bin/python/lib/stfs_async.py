@@ -0,0 +1,209 @@
+"""
+Asyncio facade over the STFS reader in "lib/stfs.py".
+
+Every public method returns an awaitable. The blocking work (header parsing, hash table walks,
+data block reads and file writes) runs on a thread pool, while an `asyncio.Semaphore` bounds
+how many files of a container are in flight at once. Data blocks are read with positional reads,
+so several worker threads can pull from the same container without sharing a file cursor.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .stfs import STFS, FileListing
+
+# Contiguous data blocks are merged into one read, up to this many bytes per read.
+MAX_READ_RUN = 0x40000
+
+_default_executor: Optional[ThreadPoolExecutor] = None
+_default_executor_lock = threading.Lock()
+
+def default_executor() -> ThreadPoolExecutor:
+    """Return the thread pool shared by every AsyncSTFS that was not given its own executor"""
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = ThreadPoolExecutor(
+                max_workers=min(32, (os.cpu_count() or 1) + 4), thread_name_prefix="stfs"
+            )
+        return _default_executor
+
+def coalesce_blocks(blocks: Iterable[Tuple[int, int]], max_run=MAX_READ_RUN) -> List[Tuple[int, int]]:
+    """Merge (on-disk block number, length) pairs into (byte offset, length) reads of adjacent blocks"""
+    runs: List[Tuple[int, int]] = []
+    next_offset = -1
+    for blocknum, readlen in blocks:
+        offset = STFS.block_offset(blocknum)
+        if runs and offset == next_offset and runs[-1][1] + readlen <= max_run:
+            runs[-1] = (runs[-1][0], runs[-1][1] + readlen)
+        else:
+            runs.append((offset, readlen))
+        # Only a full block can be followed by another one in the same run
+        next_offset = offset + readlen if readlen == 0x1000 else -1
+    return runs
+
+class _PositionalReader(object):
+    """Thread-safe positional reads on a file path (os.pread, or one file object per thread where it is missing)"""
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self._local = threading.local()
+        self._handles = []
+        self._lock = threading.Lock()
+        self._fileno = None
+        if hasattr(os, "pread"):
+            self._fileno = os.open(filename, os.O_RDONLY)
+
+    def read(self, offset: int, length: int) -> bytes:
+        if self._fileno is not None:
+            data = os.pread(self._fileno, length, offset)
+            while len(data) < length:
+                chunk = os.pread(self._fileno, length - len(data), offset + len(data))
+                if not chunk:
+                    break
+                data += chunk
+            return data
+        fd = getattr(self._local, "fd", None)
+        if fd is None:
+            fd = open(self.filename, "rb")
+            self._local.fd = fd
+            with self._lock:
+                self._handles.append(fd)
+        fd.seek(offset)
+        return fd.read(length)
+
+    def close(self) -> None:
+        if self._fileno is not None:
+            os.close(self._fileno)
+            self._fileno = None
+        with self._lock:
+            for fd in self._handles:
+                fd.close()
+            self._handles = []
+
+class AsyncSTFS(object):
+    """Awaitable view of an STFS container. Create it with `await AsyncSTFS.open(path)`"""
+
+    def __init__(self, stfs: STFS, concurrency=4, executor: Optional[Executor] = None) -> None:
+        assert concurrency > 0, "AsyncSTFS concurrency must be at least 1"
+        self.stfs = stfs
+        self.concurrency = concurrency
+        self.executor = executor or default_executor()
+        self._limit = asyncio.Semaphore(concurrency)
+        # The STFS object keeps a single file cursor for the hash tables
+        self._stfs_lock = threading.Lock()
+        self._reader = _PositionalReader(stfs.filename)
+
+    def __str__(self) -> str:
+        return "AsyncSTFS Object %s (%s)" % (self.stfs.magic, self.stfs.filename)
+
+    @classmethod
+    async def open(cls, filename: str, concurrency=4, executor: Optional[Executor] = None) -> "AsyncSTFS":
+        """Parse the container header and file table off the event loop"""
+        loop = asyncio.get_running_loop()
+        stfs = await loop.run_in_executor(executor or default_executor(), STFS, filename)
+        return cls(stfs, concurrency, executor)
+
+    async def __aenter__(self) -> "AsyncSTFS":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the container file handles"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._close_sync)
+
+    def _close_sync(self) -> None:
+        with self._stfs_lock:
+            self.stfs.close()
+        self._reader.close()
+
+    async def list(self) -> Dict[str, FileListing]:
+        """Return the path to filelisting map of the container"""
+        return dict(self.stfs.allfiles)
+
+    def _resolve(self, file: Union[str, FileListing]) -> FileListing:
+        if isinstance(file, FileListing):
+            return file
+        try:
+            return self.stfs.allfiles[file]
+        except KeyError:
+            raise FileNotFoundError("File %s not found in %s" % (file, self.stfs.filename))
+
+    def _file_runs(self, filelisting: FileListing) -> List[Tuple[int, int]]:
+        with self._stfs_lock:
+            blocks = self.stfs.get_file_blocks(filelisting)
+        return coalesce_blocks(blocks)
+
+    async def _read_unbounded(self, filelisting: FileListing) -> bytes:
+        loop = asyncio.get_running_loop()
+        runs = await loop.run_in_executor(self.executor, self._file_runs, filelisting)
+        chunks = await asyncio.gather(
+            *(loop.run_in_executor(self.executor, self._reader.read, offset, length) for offset, length in runs)
+        )
+        return b"".join(chunks)
+
+    async def read_file(self, file: Union[str, FileListing]) -> bytes:
+        """Return the contents of a file, given its container path or filelisting"""
+        filelisting = self._resolve(file)
+        async with self._limit:
+            return await self._read_unbounded(filelisting)
+
+    async def _extract_one(self, filelisting: FileListing, new_file_path: str) -> str:
+        loop = asyncio.get_running_loop()
+        async with self._limit:
+            file_bytes = await self._read_unbounded(filelisting)
+            await loop.run_in_executor(self.executor, _write_file, new_file_path, file_bytes)
+        return new_file_path
+
+    async def extract_to(self, dest_path: str, flatten=False) -> List[str]:
+        """Extract every file of the container into dest_path and return the written paths
+        With flatten, all files are written on the root of dest_path like "stfs_extract_all_files.py" does:
+        when several files share a name, the last one of the container wins and each path is returned once.
+        """
+        # Target path -> filelisting, so files sharing a target are never written concurrently
+        jobs: Dict[str, FileListing] = {}
+        for filename, filelisting in self.stfs.allfiles.items():
+            # Empty filetable records show up as a nameless file (usually "/songs/")
+            if filelisting.isdirectory or not filelisting.filename:
+                continue
+            components = [c for c in filename.split("/") if c]
+            if flatten:
+                components = components[-1:]
+            path = os.path.join(dest_path, *components)
+            jobs.pop(path, None)
+            jobs[path] = filelisting
+
+        dirs = {os.path.dirname(path) for path in jobs} | {dest_path}
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, _make_dirs, sorted(dirs))
+        return list(await asyncio.gather(*(self._extract_one(fl, path) for path, fl in jobs.items())))
+
+def _write_file(path: str, data: bytes) -> None:
+    with open(path, "wb") as fout:
+        fout.write(data)
+
+def _make_dirs(paths: List[str]) -> None:
+    for path in paths:
+        os.makedirs(path, exist_ok=True)
+
+async def extract_many(
+    jobs: Iterable[Tuple[str, str]], concurrency=2, file_concurrency=4, flatten=False, executor: Optional[Executor] = None
+) -> List[List[str]]:
+    """Extract several (container path, destination folder) jobs from one event loop
+    At most `concurrency` containers are open at once, each with `file_concurrency` files in flight.
+    Returns the written paths of every job, in the same order as the jobs.
+    """
+    limit = asyncio.Semaphore(concurrency)
+
+    async def extract(filename: str, dest_path: str) -> List[str]:
+        async with limit:
+            async with await AsyncSTFS.open(filename, file_concurrency, executor) as con:
+                return await con.extract_to(dest_path, flatten)
+
+    return list(await asyncio.gather(*(extract(filename, dest_path) for filename, dest_path in jobs)))
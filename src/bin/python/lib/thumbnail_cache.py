@@ -0,0 +1,232 @@
+"""
+Content-addressed on-disk cache of converted images and WEBP data URLs.
+
+Entries are keyed by the source (path, size and modification time of a file, or the SHA-256 of a
+buffer), the kind of conversion and its parameters. Each one is a file under the cache folder,
+written atomically (temporary file + rename), whose modification time is bumped on every hit so
+that the least recently used entries are evicted first once the folder grows past its size limit.
+
+This module only uses the standard library: on a hit, the scripts return the cached bytes without
+ever importing Pillow or NumPy.
+
+The cache lives in the cache folder of the user by default ("%LOCALAPPDATA%\\rbtools\\thumbnails" on
+Windows, "$XDG_CACHE_HOME/rbtools/thumbnails" or "~/.cache/rbtools/thumbnails" elsewhere). The
+`RBTOOLS_THUMBNAIL_CACHE` environment variable sets another folder, or turns the cache off with
+"0"/"off", and `RBTOOLS_THUMBNAIL_CACHE_SIZE` sets the size limit in megabytes.
+
+The keys can be guessed, so the folders are created readable by their owner only, and on POSIX the
+cache is turned off when its folder belongs to another user: entries planted there would be served
+as the conversions of this user.
+"""
+
+import hashlib
+import json
+import os
+import stat
+import tempfile
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Union
+
+def user_cache_path() -> str:
+    """The folder of the cache in the cache folder of the user (see the module docstring)."""
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "rbtools", "thumbnails")
+
+DEFAULT_PATH = user_cache_path()
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Eviction goes down to this fraction of the size limit, so it doesn't run on every write
+EVICT_TO = 0.9
+
+Source = Union[str, bytes, bytearray, memoryview]
+
+class ThumbnailCache:
+    """A size-bounded LRU cache of bytes in a folder, shared by every process using the same folder."""
+
+    def __init__(self, path: str = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+        self._size: Optional[int] = None
+
+    def key(self, source: Source, kind: str, **params: Any) -> str:
+        """The key of a conversion of a file path (by path, size and modification time) or of a buffer (by content)."""
+        if isinstance(source, str):
+            stat = os.stat(source)
+            source_id = ["file", os.path.abspath(source), stat.st_size, stat.st_mtime_ns]
+        else:
+            source_id = ["sha256", hashlib.sha256(source).hexdigest()]
+        identity = json.dumps([source_id, kind, params], sort_keys=True)
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key[0:2], key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> bool:
+        """Stores data under key. A folder that can't be written (read-only, full disk...) is counted in `errors` and returns False."""
+        path = self.entry_path(key)
+        temp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException as e:
+            if temp_path is not None:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+            if not isinstance(e, OSError):
+                raise
+            self.errors += 1
+            return False
+        self.writes += 1
+        try:
+            if self._size is None:
+                self._size = self.disk_usage()["bytes"]
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self.evict()
+        except OSError:
+            self.errors += 1
+        return True
+
+    def _entries(self):
+        """(path, size, last use) of every entry, temporary files of unfinished writes excluded."""
+        if not os.path.isdir(self.path):
+            return
+        for folder in os.scandir(self.path):
+            if not folder.is_dir():
+                continue
+            for entry in os.scandir(folder.path):
+                if entry.name.startswith(".tmp-"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime_ns
+
+    def evict(self) -> int:
+        """Deletes the least recently used entries until the cache is under `EVICT_TO` of its limit, returning how many went."""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        size = sum(entry[1] for entry in entries)
+        evicted = 0
+        for path, entry_size, _ in entries:
+            if size <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            size -= entry_size
+            evicted += 1
+        self._size = size
+        self.evictions += evicted
+        return evicted
+
+    def clear(self) -> int:
+        count = 0
+        for path, _, _ in list(self._entries()):
+            try:
+                os.unlink(path)
+                count += 1
+            except OSError:
+                pass
+        self._size = 0
+        return count
+
+    def disk_usage(self) -> Dict[str, int]:
+        entries = list(self._entries())
+        return {"entries": len(entries), "bytes": sum(entry[1] for entry in entries)}
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/write/eviction/error counts of this process, with the entries and bytes on disk."""
+        return {"hits": self.hits, "misses": self.misses, "writes": self.writes, "evictions": self.evictions, "errors": self.errors, **self.disk_usage()}
+
+def private_folder(path: str) -> bool:
+    """Creates path readable by its owner only if it's missing, and tells if this user alone can write to it."""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        info = os.stat(path)
+    except OSError:
+        return False
+    if not stat.S_ISDIR(info.st_mode):
+        return False
+    # Windows has no owner in os.stat(), the folder is under the profile of the user
+    if os.name != "posix":
+        return True
+    if info.st_uid != os.getuid():
+        return False
+    if info.st_mode & 0o077:
+        # A folder of this user left open by an older version or the umask
+        try:
+            os.chmod(path, 0o700)
+        except OSError:
+            return False
+    return True
+
+@lru_cache(maxsize=None)
+def default_cache() -> Optional[ThumbnailCache]:
+    """The cache set by the environment (see the module docstring), or None when it's turned off or its folder isn't private."""
+    path = os.environ.get("RBTOOLS_THUMBNAIL_CACHE", DEFAULT_PATH)
+    if path.lower() in ("", "0", "off", "false", "no") or not private_folder(path):
+        return None
+    size = os.environ.get("RBTOOLS_THUMBNAIL_CACHE_SIZE")
+    return ThumbnailCache(path, int(float(size) * 1024 * 1024) if size else DEFAULT_MAX_BYTES)
+
+def cached_bytes(source: Source, kind: str, params: Dict[str, Any], create: Callable[[], bytes]) -> bytes:
+    """The cached result of a conversion, or create()'s result, which is cached when the cache folder can be written."""
+    cache = default_cache()
+    if cache is None:
+        return create()
+    key = cache.key(source, kind, **params)
+    data = cache.get(key)
+    if data is None:
+        data = create()
+        cache.put(key, data)
+    return data
+
+def cached_data_url(source: Source, kind: str, params: Dict[str, Any], create: Callable[[], str]) -> str:
+    return cached_bytes(source, kind, params, lambda: create().encode("utf-8")).decode("utf-8")
+
+def cached_file(source: Source, kind: str, params: Dict[str, Any], dest_path: str, create: Callable[[], None]) -> None:
+    """Writes the cached result of a conversion to dest_path, or runs create() (which writes dest_path) and caches the file."""
+    if default_cache() is None:
+        create()
+        return
+    created = []
+
+    def convert() -> bytes:
+        create()
+        created.append(dest_path)
+        with open(dest_path, "rb") as f:
+            return f.read()
+
+    # The output format follows the extension of dest_path
+    data = cached_bytes(source, kind, dict(params, ext=os.path.splitext(dest_path)[1].lower()), convert)
+    if not created:
+        with open(dest_path, "wb") as f:
+            f.write(data)
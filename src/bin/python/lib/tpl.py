@@ -9,293 +9,283 @@ https://pypi.org/project/Wii.py/
 """
 
 import struct
-import sys
 import hashlib
+import mmap
 import os
+from dataclasses import dataclass
+from typing import ClassVar, List, Optional, Tuple, Union
 from Crypto.Cipher import AES
+from io import BytesIO
 from PIL import Image
-
-class StructType(tuple):
-    def __getitem__(self, value):
-        return [self] * value
-    def __call__(self, value, endian='<'):
-        if type(value) == type(b''):
-            return struct.unpack(endian + tuple.__getitem__(self, 0), value[:tuple.__getitem__(self, 1)])[0]
-        else:
-            return struct.pack(endian + tuple.__getitem__(self, 0), value)
-
-class StructException(Exception):
-    pass
-
-class Struct(object):
-    _slots = ('__attrs__', '__baked__', '__defs__', '__endian__', '__next__', '__sizes__', '__values__')
-
-    int8 = StructType(('b', 1))
-    uint8 = StructType(('B', 1))
-
-    int16 = StructType(('h', 2))
-    uint16 = StructType(('H', 2))
-
-    int32 = StructType(('l', 4))
-    uint32 = StructType(('L', 4))
-
-    int64 = StructType(('q', 8))
-    uint64 = StructType(('Q', 8))
-
-    float = StructType(('f', 4))
-
-    def string(cls, len, offset=0, encoding=None, stripNulls=False, value=''):
-        return StructType(('string', (len, offset, encoding, stripNulls, value)))
-    string = classmethod(string)
-
-    LE = '<'
-    BE = '>'
-    __endian__ = '<'
-
-    def __init__(self, func=None, unpack=None, **kwargs):
-        self.__defs__ = []
-        self.__sizes__ = []
-        self.__attrs__ = []
-        self.__values__ = {}
-        self.__next__ = True
-        self.__baked__ = False
-
-        if func == None:
-            self.__format__()
-        else:
-            sys.settrace(self.__trace__)
-            func()
-            for name in func.__code__.co_varnames:
-                value = self.__frame__.f_locals[name]
-                self.__setattr__(name, value)
-
-        self.__baked__ = True
-
-        if unpack != None:
-            if isinstance(unpack, tuple):
-                self.unpack(*unpack)
-            else:
-                self.unpack(unpack)
-
-        if len(kwargs):
-            for name in kwargs:
-                self.__values__[name] = kwargs[name]
-
-    def __trace__(self, frame, event, arg):
-        self.__frame__ = frame
-        sys.settrace(None)
-
-    def __setattr__(self, name, value):
-        if name in self._slots:
-            return object.__setattr__(self, name, value)
-
-        if self.__baked__ == False:
-            if not isinstance(value, list):
-                value = [value]
-                attrname = name
-            else:
-                attrname = '*' + name
-
-            self.__values__[name] = None
-
-            for sub in value:
-                if isinstance(sub, Struct):
-                    sub = sub.__class__
-                try:
-                    if issubclass(sub, Struct):
-                        sub = ('struct', sub)
-                except TypeError:
-                    pass
-                type_, size = tuple(sub)
-                if type_ == 'string':
-                    self.__defs__.append(Struct.string)
-                    self.__sizes__.append(size)
-                    self.__attrs__.append(attrname)
-                    self.__next__ = True
-
-                    if attrname[0] != '*':
-                        self.__values__[name] = size[3]
-                    elif self.__values__[name] == None:
-                        self.__values__[name] = [size[3] for val in value]
-                elif type_ == 'struct':
-                    self.__defs__.append(Struct)
-                    self.__sizes__.append(size)
-                    self.__attrs__.append(attrname)
-                    self.__next__ = True
-
-                    if attrname[0] != '*':
-                        self.__values__[name] = size()
-                    elif self.__values__[name] == None:
-                        self.__values__[name] = [size() for val in value]
-                else:
-                    if self.__next__:
-                        self.__defs__.append('')
-                        self.__sizes__.append(0)
-                        self.__attrs__.append([])
-                        self.__next__ = False
-
-                    self.__defs__[-1] += type_
-                    self.__sizes__[-1] += size
-                    self.__attrs__[-1].append(attrname)
-
-                    if attrname[0] != '*':
-                        self.__values__[name] = 0
-                    elif self.__values__[name] == None:
-                        self.__values__[name] = [0 for val in value]
-        else:
-            try:
-                self.__values__[name] = value
-            except KeyError:
-                raise AttributeError(name)
-
-    def __getattr__(self, name):
-        if self.__baked__ == False:
-            return name
-        else:
-            try:
-                return self.__values__[name]
-            except KeyError:
-                raise AttributeError(name)
-
-    def __len__(self):
-        ret = 0
-        arraypos, arrayname = None, None
-
-        for i in range(len(self.__defs__)):
-            sdef, size, attrs = self.__defs__[i], self.__sizes__[i], self.__attrs__[i]
-
-            if sdef == Struct.string:
-                size, offset, encoding, stripNulls, value = size
-                if type(size) == type(b''):
-                    size = self.__values__[size] + offset
-            elif sdef == Struct:
-                if attrs[0] == '*':
-                    if arrayname != attrs:
-                        arrayname = attrs
-                        arraypos = 0
-                    size = len(self.__values__[attrs[1:]][arraypos])
-                size = len(self.__values__[attrs])
-
-            ret += size
-
-        return ret
-
-    def unpack(self, data, pos=0):
-        for name in self.__values__:
-            if not isinstance(self.__values__[name], Struct):
-                self.__values__[name] = None
-            elif self.__values__[name].__class__ == list and len(self.__values__[name]) != 0:
-                if not isinstance(self.__values__[name][0], Struct):
-                    self.__values__[name] = None
-
-        arraypos, arrayname = None, None
-
-        for i in range(len(self.__defs__)):
-            sdef, size, attrs = self.__defs__[i], self.__sizes__[i], self.__attrs__[i]
-
-            if sdef == Struct.string:
-                size, offset, encoding, stripNulls, value = size
-                if type(size) == type(b''):
-                    size = self.__values__[size] + offset
-
-                temp = data[pos:pos+size]
-                if len(temp) != size:
-                    raise StructException('Expected %i byte string, got %i' % (size, len(temp)))
-
-                if encoding != None:
-                    temp = temp.decode(encoding)
-
-                if stripNulls:
-                    temp = temp.rstrip(b'\0')
-
-                if attrs[0] == '*':
-                    name = attrs[1:]
-                    if self.__values__[name] == None:
-                        self.__values__[name] = []
-                    self.__values__[name].append(temp)
-                else:
-                    self.__values__[attrs] = temp
-                pos += size
-            elif sdef == Struct:
-                if attrs[0] == '*':
-                    if arrayname != attrs:
-                        arrayname = attrs
-                        arraypos = 0
-                    name = attrs[1:]
-                    self.__values__[attrs][arraypos].unpack(data, pos)
-                    pos += len(self.__values__[attrs][arraypos])
-                    arraypos += 1
-                else:
-                    self.__values__[attrs].unpack(data, pos)
-                    pos += len(self.__values__[attrs])
-            else:
-                values = struct.unpack(self.__endian__+sdef, data[pos:pos+size])
-                pos += size
-                j = 0
-                for name in attrs:
-                    if name[0] == '*':
-                        name = name[1:]
-                        if self.__values__[name] == None:
-                            self.__values__[name] = []
-                        self.__values__[name].append(values[j])
-                    else:
-                        self.__values__[name] = values[j]
-                    j += 1
-
+import numpy as np
+from . import tpl_codec
+from .instrument import timed
+
+@dataclass(slots=True)
+class TPLHeader:
+    """TPL file header, at the start of the file."""
+    magic: int = 0
+    ntextures: int = 0
+    header_size: int = 0
+
+    _struct: ClassVar[struct.Struct] = struct.Struct(">3L")
+    size: ClassVar[int] = _struct.size
+
+    @classmethod
+    def unpack(cls, data, offset=0) -> "TPLHeader":
+        return cls(*cls._struct.unpack_from(data, offset))
+
+    def pack(self) -> bytes:
+        return self._struct.pack(self.magic, self.ntextures, self.header_size)
+
+@dataclass(slots=True)
+class TPLTexture:
+    """Entry of the texture table that follows the file header."""
+    header_offset: int = 0
+    palette_offset: int = 0
+
+    _struct: ClassVar[struct.Struct] = struct.Struct(">2L")
+    size: ClassVar[int] = _struct.size
+
+    @classmethod
+    def unpack(cls, data, offset=0) -> "TPLTexture":
+        return cls(*cls._struct.unpack_from(data, offset))
+
+    def pack(self) -> bytes:
+        return self._struct.pack(self.header_offset, self.palette_offset)
+
+@dataclass(slots=True)
+class TPLTextureHeader:
+    """Texture header, pointed by TPLTexture.header_offset."""
+    height: int = 0
+    width: int = 0
+    format: int = 0
+    data_off: int = 0
+    wrap: Tuple[int, int] = (0, 0)
+    filter: Tuple[int, int] = (0, 0)
+    lod_bias: float = 0.0
+    edge_lod: int = 0
+    min_lod: int = 0
+    max_lod: int = 0
+    unpacked: int = 0
+
+    _struct: ClassVar[struct.Struct] = struct.Struct(">2H6Lf4B")
+    size: ClassVar[int] = _struct.size
+
+    @classmethod
+    def unpack(cls, data, offset=0) -> "TPLTextureHeader":
+        (height, width, format, data_off, wrap_s, wrap_t, filter_min, filter_mag, lod_bias,
+         edge_lod, min_lod, max_lod, unpacked) = cls._struct.unpack_from(data, offset)
+        return cls(height, width, format, data_off, (wrap_s, wrap_t), (filter_min, filter_mag), lod_bias,
+                   edge_lod, min_lod, max_lod, unpacked)
+
+    def pack(self) -> bytes:
+        return self._struct.pack(self.height, self.width, self.format, self.data_off, *self.wrap, *self.filter,
+                                 self.lod_bias, self.edge_lod, self.min_lod, self.max_lod, self.unpacked)
+
+@dataclass(slots=True)
+class TPLPaletteHeader:
+    """Palette header of the CI4, CI8 and CI14X2 textures, pointed by TPLTexture.palette_offset."""
+    nitems: int = 0
+    unpacked: int = 0
+    pad: int = 0
+    format: int = 0
+    offset: int = 0
+
+    _struct: ClassVar[struct.Struct] = struct.Struct(">H2B2L")
+    size: ClassVar[int] = _struct.size
+
+    @classmethod
+    def unpack(cls, data, offset=0) -> "TPLPaletteHeader":
+        return cls(*cls._struct.unpack_from(data, offset))
+
+    def pack(self) -> bytes:
+        return self._struct.pack(self.nitems, self.unpacked, self.pad, self.format, self.offset)
+
+@dataclass(slots=True)
+class TPLHeaders:
+    """Every header of a TPL file, parsed in one pass."""
+    header: TPLHeader
+    textures: List[TPLTexture]
+    texture_headers: List[TPLTextureHeader]
+    palette_headers: List[Optional[TPLPaletteHeader]]
+
+    @classmethod
+    def parse(cls, data) -> "TPLHeaders":
+        header = TPLHeader.unpack(data)
+        textures = [TPLTexture.unpack(data, TPLHeader.size + i * TPLTexture.size) for i in range(header.ntextures)]
+        texture_headers = [TPLTextureHeader.unpack(data, tex.header_offset) for tex in textures]
+        palette_headers = [TPLPaletteHeader.unpack(data, tex.palette_offset) if tex.palette_offset > 0 else None for tex in textures]
+        return cls(header, textures, texture_headers, palette_headers)
+
+# TPL texture format ID -> name
+FORMAT_NAMES = {
+    0: "I4",
+    1: "I8",
+    2: "IA4",
+    3: "IA8",
+    4: "RGB565",
+    5: "RGB5A3",
+    6: "RGBA8",
+    8: "CI4",
+    9: "CI8",
+    10: "CI14X2",
+    14: "CMP",
+}
+
+# TPL palette format ID -> name
+PALETTE_FORMAT_NAMES = {
+    0: "IA8",
+    1: "RGB565",
+    2: "RGB5A3",
+}
+
+class TPLFile:
+    """A TPL texture read in one go (or memory-mapped with use_mmap) and parsed lazily.
+
+    The source is a file path or the TPL bytes. The headers are parsed on the first metadata access
+    and the pixels are decoded only when decode() or toImage() is called.
+
+    PNG_WII textures start with a HMX header instead of the TPL one: pass the TPL header to use as
+    tpl_header and the size of the header it replaces as header_size, and the texture data is read
+    in place, without building a patched copy of the file.
+
+    Any level of the mip chain can be decoded on its own. The TPL header gives the number of levels,
+    unless mips is given (PNG_WII keeps it in the HMX header). Either way, only the levels present in
+    the data are used.
+    """
+
+    def __init__(self, source: Union[str, bytes, bytearray, memoryview], tpl_header: Optional[bytes] = None, header_size = 0, use_mmap = False, mips: Optional[int] = None) -> None:
+        self.filename = source if isinstance(source, str) else None
+        self.tpl_header = tpl_header
+        self.header_size = header_size
+        self.use_mmap = use_mmap
+        self.mips = mips
+        self._source = None if self.filename else source
+        self._mmap = None
+        self._headers: Optional[TPLHeaders] = None
+
+    def __enter__(self) -> "TPLFile":
         return self
 
-    def pack(self):
-        arraypos, arrayname = None, None
-
-        ret = b''
-        for i in range(len(self.__defs__)):
-            sdef, size, attrs = self.__defs__[i], self.__sizes__[i], self.__attrs__[i]
-
-            if sdef == Struct.string:
-                size, offset, encoding, stripNulls, value = size
-                if type(size) == type(b''):
-                    size = self.__values__[size]+offset
-
-                if attrs[0] == '*':
-                    if arrayname != attrs:
-                        arraypos = 0
-                        arrayname = attrs
-                    temp = self.__values__[attrs[1:]][arraypos]
-                    arraypos += 1
-                else:
-                    temp = self.__values__[attrs]
-
-                if encoding != None:
-                    temp = temp.encode(encoding)
-
-                temp = temp[:size]
-                ret += temp + (b'\0' * (size - len(temp)))
-            elif sdef == Struct:
-                if attrs[0] == '*':
-                    if arrayname != attrs:
-                        arraypos = 0
-                        arrayname = attrs
-                    ret += self.__values__[attrs[1:]][arraypos].pack()
-                    arraypos += 1
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Releases the file contents (and the memory map, if any)."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self.filename:
+            self._source = None
+
+    @property
+    def source(self):
+        """The file contents, read (or mapped) on first use."""
+        if self._source is None:
+            with open(self.filename, "rb") as f:
+                if self.use_mmap:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._source = self._mmap
                 else:
-                    ret += self.__values__[attrs].pack()
-            else:
-                values = []
-                for name in attrs:
-                    if name[0] == '*':
-                        if arrayname != name:
-                            arraypos = 0
-                            arrayname = name
-                        values.append(self.__values__[name[1:]][arraypos])
-                        arraypos += 1
-                    else:
-                        values.append(self.__values__[name])
-
-                ret += struct.pack(self.__endian__+sdef, *values)
-        return ret
-
-    def __getitem__(self, value):
-        return [('struct', self.__class__)] * value
+                    self._source = f.read()
+        return self._source
+
+    def view(self, offset: int) -> memoryview:
+        """Returns the TPL contents from offset on, as laid out in a standalone TPL file."""
+        if self.tpl_header is None:
+            return memoryview(self.source)[offset:]
+        if offset < len(self.tpl_header):
+            raise ValueError("TPL offset 0x%x points inside the replaced header" % offset)
+        return memoryview(self.source)[offset - len(self.tpl_header) + self.header_size:]
+
+    @property
+    def headers(self) -> TPLHeaders:
+        if self._headers is None:
+            self._headers = TPLHeaders.parse(self.tpl_header if self.tpl_header is not None else self.source)
+        return self._headers
+
+    @property
+    def texture(self) -> TPLTextureHeader:
+        """Header of the first texture, the only one supported."""
+        return self.headers.texture_headers[0]
+
+    @property
+    def format(self) -> int:
+        return self.texture.format
+
+    @property
+    def format_name(self) -> str:
+        if self.format not in FORMAT_NAMES:
+            raise TypeError("Unknown TPL Format: %d" % self.format)
+        return FORMAT_NAMES[self.format]
+
+    @property
+    def width(self) -> int:
+        return self.texture.width
+
+    @property
+    def height(self) -> int:
+        return self.texture.height
+
+    @property
+    def mip_levels(self) -> int:
+        """Number of images in the mip chain (counting the full size one) that are present in the data."""
+        declared = self.mips if self.mips is not None else self.texture.max_lod + 1
+        with self.view(self.texture.data_off) as data:
+            available = len(data)
+        levels = 0
+        while levels < max(1, declared):
+            size = tpl_codec.texture_size(self.format, *tpl_codec.level_dimensions(self.width, self.height, levels))
+            if size > available:
+                break
+            available -= size
+            levels += 1
+        return max(1, levels)
+
+    def level_offset(self, level: int) -> int:
+        """TPL offset of the image of a mip level."""
+        offset = self.texture.data_off
+        for i in range(level):
+            offset += tpl_codec.texture_size(self.format, *tpl_codec.level_dimensions(self.width, self.height, i))
+        return offset
+
+    def level_for_size(self, size: int) -> int:
+        """The smallest mip level that is still at least size pixels on its largest side."""
+        return tpl_codec.level_for_size(self.width, self.height, self.mip_levels, size)
+
+    @property
+    def palette(self) -> Optional[TPLPaletteHeader]:
+        """Palette header of the first texture (CI4, CI8 and CI14X2 only)."""
+        return self.headers.palette_headers[0]
+
+    @property
+    def palette_format_name(self) -> Optional[str]:
+        return PALETTE_FORMAT_NAMES.get(self.palette.format) if self.palette else None
+
+    def decode(self, level = 0) -> "np.ndarray":
+        """Decodes one mip level of the first texture into a (height, width, 4) RGBA array, reading only its bytes."""
+        if self.headers.header.ntextures > 1:
+            raise ValueError("Only one texture supported. Don't touch me!")
+        tex = self.texture
+        if tex.format not in tpl_codec.LAYOUTS:
+            raise TypeError("Unsupported TPL Format: " + str(tex.format))
+        if level and not 0 <= level < self.mip_levels:
+            raise ValueError("TPL mip level %d out of range (%d levels)" % (level, self.mip_levels))
+        width, height = tpl_codec.level_dimensions(tex.width, tex.height, level)
+        with self.view(self.level_offset(level)) as data:
+            if tex.format in tpl_codec.DECODERS:
+                return tpl_codec.DECODERS[tex.format](data, width, height)
+            if self.palette is None:
+                raise ValueError("TPL texture of format %s has no palette" % self.format_name)
+            with self.view(self.palette.offset) as paldata:
+                palette = tpl_codec.decode_palette(paldata, self.palette.nitems, self.palette.format)
+            return tpl_codec.CI_DECODERS[tex.format](data, width, height, palette)
+
+    @timed(lambda self, level = 0: "tpl.toImage." + self.format_name, lambda image, *args, **kwargs: image.width * image.height * 4)
+    def toImage(self, level = 0) -> Image.Image:
+        """Decodes one mip level of the first texture into an RGBA PIL image."""
+        return Image.fromarray(self.decode(level), "RGBA")
 
 
 
@@ -442,106 +432,66 @@ class WiiHeader(object):
 
 
 
+def rgba_palette(pal):
+    """Returns a palette given as 0xRRGGBBAA integers (or already as an RGBA array) as a (n, 4) RGBA array."""
+    pal = np.asarray(pal)
+    if(pal.ndim == 2):
+        return pal.astype(np.uint8)
+    return pal.astype(">u4").view(np.uint8).reshape(-1, 4)
+
 def flatten(myTuple):
     if (len(myTuple) == 4):
         return myTuple[0] << 0 | myTuple[1] << 8 | myTuple[2] << 16 | myTuple[3] << 24
     else:
         return myTuple[0] << 0 | myTuple[1] << 8 | myTuple[2] << 16 | 0xff << 24
 
-def round_up(x, n):
-    left = x % n
-    return x + left
-
-def avg(w0, w1, c0, c1):
-    a0 = c0 >> 11
-    a1 = c1 >> 11
-    a = int((w0*a0 + w1*a1) / (w0 + w1))
-    c = (int(a) << 11) & 0xffff
-
-    a0 = (c0 >> 5) & 63
-    a1 = (c1 >> 5) & 63
-    a = int((w0*a0 + w1*a1) / (w0 + w1))
-    c = c | ((a << 5) & 0xffff)
-
-    a0 = c0 & 31
-    a1 = c1 & 31
-    a = int((w0*a0 + w1*a1) / (w0 + w1))
-    c = c | a
-
-    return c
-
-
 class TPL:
     """This is the class to generate TPL texutres from PNG images, and to convert TPL textures to PNG images. The parameter file specifies the filename of the source, either a PNG image or a TPL image.
 
     Currently supported are the following formats to convert from TPL (all formats): RGBA8, RGB565, RGB5A3, I4, IA4, I8, IA8, CI4, CI8, CMP, CI14X2.
 
-    Currently supported to convert to TPL: I4, I8, IA4, IA8, RBG565, RBGA8, RGB5A3. Currently not supported are CI4, CI8, CMP, CI14X2."""
-
-
-    class TPLHeader(Struct):
-        __endian__ = Struct.BE
-        def __format__(self):
-            self.magic = Struct.uint32
-            self.ntextures = Struct.uint32
-            self.header_size = Struct.uint32
-    class TPLTexture(Struct):
-        __endian__ = Struct.BE
-        def __format__(self):
-            self.header_offset = Struct.uint32
-            self.palette_offset = Struct.uint32
-    class TPLTextureHeader(Struct):
-        __endian__ = Struct.BE
-        def __format__(self):
-            self.height = Struct.uint16
-            self.width = Struct.uint16
-            self.format = Struct.uint32
-            self.data_off = Struct.uint32
-            self.wrap = Struct.uint32[2]
-            self.filter = Struct.uint32[2]
-            self.lod_bias = Struct.float
-            self.edge_lod = Struct.uint8
-            self.min_lod = Struct.uint8
-            self.max_lod = Struct.uint8
-            self.unpacked = Struct.uint8
-    class TPLPaletteHeader(Struct):
-        __endian__ = Struct.BE
-        def __format__(self):
-            self.nitems = Struct.uint16
-            self.unpacked = Struct.uint8
-            self.pad = Struct.uint8
-            self.format = Struct.uint32
-            self.offset = Struct.uint32
+    Currently supported to convert to TPL: I4, I8, IA4, IA8, RBG565, RBGA8, RGB5A3, CMP. Currently not supported are CI4, CI8, CI14X2."""
+
+
+    TPLHeader = TPLHeader
+    TPLTexture = TPLTexture
+    TPLTextureHeader = TPLTextureHeader
+    TPLPaletteHeader = TPLPaletteHeader
     def __init__(self, file):
-        if(not (b"\x00" in file) and os.path.isfile(file)):
+        self.tplfile = None
+        if(isinstance(file, TPLFile)):
+            self.file = None
+            self.data = None
+            self.tplfile = file
+        elif(isinstance(file, str) and os.path.isfile(file)):
             self.file = file
             self.data = None
         else:
             self.file = None
             self.data = file
-    def toTPL(self, outfile, xxx_todo_changeme = (None, None), format = "RGBA8"): #single texture only
+    def getFile(self):
+        """Returns the TPLFile of the TPL. It reads the file once and is shared by toImage, getSizes and getFormat."""
+        if(self.tplfile is None):
+            self.tplfile = TPLFile(self.file if self.file else self.data)
+        return self.tplfile
+    def getHeaders(self):
+        """Returns the parsed headers of the TPL."""
+        return self.getFile().headers
+    def toTPL(self, outfile, xxx_todo_changeme = (None, None), format = "RGBA8", quality = "normal"): #single texture only
         """This converts an image into a TPL. The image is specified as the file parameter to the class initializer, while the output filename is specified here as the parameter outfile. Width and height are optional parameters and specify the size to resize the image to, if needed. Returns the output filename.
 
-        This only can create TPL images with a single texture."""
+        The quality parameter only applies to CMP textures, see tpl_codec.CMP_QUALITIES. This only can create TPL images with a single texture."""
         (width, height) = xxx_todo_changeme
-        head = self.TPLHeader()
-        head.magic = 0x0020AF30
-        head.ntextures = 1
-        head.header_size = 0x0C
-
-        tex = self.TPLTexture()
-        tex.header_offset = 0x14
-        tex.pallete_offset = 0
+        head = TPLHeader(magic = 0x0020AF30, ntextures = 1, header_size = 0x0C)
+        tex = TPLTexture(header_offset = 0x14, palette_offset = 0)
 
-        img = Image.open(self.file)
+        img = Image.open(self.file if self.file else BytesIO(self.data))
         theWidth, theHeight = img.size
         if(width != None and height != None and (width != theWidth or height != theHeight)):
-            img = img.resize((width, height), Image.ANTIALIAS)
+            img = img.resize((width, height), Image.LANCZOS)
         w, h = img.size
 
-        texhead = self.TPLTextureHeader()
-        texhead.height = h
-        texhead.width = w
+        texhead = TPLTextureHeader(height = h, width = w)
         if format == "I4":
             texhead.format = 0
             tpldata = self.toI4((w, h), img)
@@ -580,723 +530,105 @@ class TPL:
             #tpldata = self.toCI14X2((w, h), img)
         elif format == "CMP":
             texhead.format = 14
-            ''' ADD toCMP '''
-            raise Exception("toCMP not done")
-            #tpldata = self.toCMP((w, h), img)
-
-        texhead.data_off = 0x14 + len(texhead)
-        texhead.wrap = [0, 0]
-        texhead.filter = [1, 1]
-        texhead.lod_bias = 0
-        texhead.edge_lod = 0
-        texhead.min_lod = 0
-        texhead.max_lod = 0
-        texhead.unpacked = 0
-
-        f = open(outfile, "wb")
-        f.write(head.pack())
-        f.write(tex.pack())
-        f.write(texhead.pack())
-        if format == "I4":
-            f.write(struct.pack(">" + str(align(w,8) * align(h,8) / 2) + "B", *tpldata))
-        if format == "I8":
-            f.write(struct.pack(">" + str(align(w,8) * align(h,4) * 1) + "B", *tpldata))
-        if format == "IA4":
-            f.write(struct.pack(">" + str(align(w,8) * align(h,4) * 1) + "B", *tpldata))
-        if format == "IA8":
-            f.write(struct.pack(">" + str(align(w,4) * align(h,4) * 1) + "H", *tpldata))
-        if format == "RGB565":
-            f.write(struct.pack(">" + str(align(w,4) * align(h,4) * 1) + "H", *tpldata))
-        if format == "RGB5A3":
-            f.write(struct.pack(">" + str(align(w,4) * align(h,4) * 1) + "H", *tpldata))
-        if format == "RGBA8":
-            f.write(struct.pack(">" + str(align(w,4) * align(h,4) * 4) + "B", *tpldata))
-        if format == "CI4":
-            ''' ADD toCI4 '''
-            #f.write(struct.pack(">"+ str(align(w,4) * align(h,4) * 4) + "B", *tpldata))
-        if format == "CI8":
-            ''' ADD toCI8 '''
-            #f.write(struct.pack(">"+ str(align(w,4) * align(h,4) * 4) + "B", *tpldata))
-        if format == "CI14X2":
-            ''' ADD toCI14X2 '''
-            #f.write(struct.pack(">"+ str(align(w,4) * align(h,4) * 4) + "B", *tpldata))
-        if format == "CMP":
-            ''' ADD toCMP '''
-            #f.write(struct.pack(">"+ str(align(w,4) * align(h,4) * 4) + "B", *tpldata))
-        f.close()
+            tpldata = self.toCMP((w, h), img, quality)
+        else:
+            raise TypeError("Unsupported TPL Format: " + str(format))
+
+        texhead.data_off = 0x14 + TPLTextureHeader.size
+        texhead.wrap = (0, 0)
+        texhead.filter = (1, 1)
+
+        with open(outfile, "wb") as f:
+            f.write(head.pack())
+            f.write(tex.pack())
+            f.write(texhead.pack())
+            f.write(tpldata)
 
         return outfile
     def toI4(self, xxx_todo_changeme1, img):
-        (w, h) = xxx_todo_changeme1
-        out = [0 for i in range(align(w, 8) * align(h, 8) / 2)]
-        outp = 0
-        inp = list(img.getdata())
-        for y1 in range(0, h, 8):
-            for x1 in range(0, w, 8):
-                for y in range(y1, y1+8, 1):
-                    for x in range(x1, x1+8, 2):
-                        if x>=w or y>=h:
-                            newpixel = 0
-                        else:
-                            rgba = flatten(inp[x+y*w])
-                            r = (rgba >> 0) & 0xff
-                            g = (rgba >> 8) & 0xff
-                            b = (rgba >> 16) & 0xff
-                            i1 = ((r + g + b) / 3) & 0xff
-                            rgba = flatten(inp[x+1+y*w])
-                            r = (rgba >> 0) & 0xff
-                            g = (rgba >> 8) & 0xff
-                            b = (rgba >> 16) & 0xff
-                            i2 = ((r + g + b) / 3) & 0xff
-
-                            newpixel = (((i1 * 15) / 255) << 4)
-                            newpixel |= (((i2 * 15) / 255) & 0xf)
-                        out[outp] = newpixel
-                        outp += 1
-        return out
+        return tpl_codec.encode_i4(img)
     def toI8(self, xxx_todo_changeme2, img):
-        (w, h) = xxx_todo_changeme2
-        out = [0 for i in range(align(w, 8) * align(h, 4))]
-        outp = 0
-        inp = list(img.getdata())
-        for y1 in range(0, h, 4):
-            for x1 in range(0, w, 8):
-                for y in range(y1, y1+4, 1):
-                    for x in range(x1, x1+8, 1):
-                        if x>= w or y>=h:
-                            i1 = 0
-                        else:
-                            rgba = flatten(inp[x + (y * w)])
-                            r = (rgba >> 0) & 0xff
-                            g = (rgba >> 8) & 0xff
-                            b = (rgba >> 16) & 0xff
-                            i1 = ((r + g + b) / 3) & 0xff
-                        out[outp] = i1
-                        outp += 1
-        return out
+        return tpl_codec.encode_i8(img)
     def toIA4(self, xxx_todo_changeme3, img):
-        (w, h) = xxx_todo_changeme3
-        out = [0 for i in range(align(w, 8) * align(h, 4))]
-        outp = 0
-        inp = list(img.getdata())
-        for y1  in range(0, h, 4):
-            for x1 in range(0, w, 8):
-                for y in range(y1, y1+4, 1):
-                    for x in range(x1, x1+8, 1):
-                        if x>=w or y>=h:
-                            newpixel = 0
-                        else:
-                            rgba = flatten(inp[x + (y * w)])
-                            r = (rgba >> 0) & 0xff
-                            g = (rgba >> 8) & 0xff
-                            b = (rgba >> 16) & 0xff
-                            i1 = ((r + g + b) / 3) & 0xff
-                            a1 = (rgba >> 24) & 0xff
-
-                            newpixel = (((i1 * 15) / 255) & 0xf)
-                            newpixel = newpixel | (((a1 * 15) / 255) << 4)
-                        out[outp] = newpixel
-                        outp += 1
-        return out
+        return tpl_codec.encode_ia4(img)
     def toIA8(self, xxx_todo_changeme4, img):
-        (w, h) = xxx_todo_changeme4
-        out = [0 for i in range(align(w, 4) * align(h, 4))]
-        outp = 0
-        inp = list(img.getdata())
-        for y1 in range(0, h, 4):
-            for x1 in range(0, w, 4):
-                for y in range(y1, y1+4, 1):
-                    for x in range(x1, x1+4, 1):
-                        if x>=w or y>=h:
-                            newpixel = 0
-                        else:
-                            rgba = flatten(inp[x + (y * w)])
-                            r = (rgba >> 0) & 0xff
-                            g = (rgba >> 8) & 0xff
-                            b = (rgba >> 16) & 0xff
-                            i1 = ((r + g + b) / 3) & 0xff
-                            a1 = (rgba >> 24) & 0xff
-
-                            newpixel = i1 << 8
-                            newpixel = newpixel | a1
-                        out[outp] = newpixel
-                        outp += 1
-        return out
+        return tpl_codec.encode_ia8(img)
     def toRGB565(self, xxx_todo_changeme5, img):
-        (w, h) = xxx_todo_changeme5
-        out = [0 for i in range(align(w, 4) * align(h, 4))]
-        outp = 0
-        inp = img.getdata()
-        for y1 in range(0, h, 4):
-            for x1 in range(0, w, 4):
-                for y in range(y1, y1+4, 1):
-                    for x in range(x1, x1+4, 1):
-                        newpixel = 0
-                        if x>=w or y>=h:
-                            newpixel = 0
-                        else:
-                            rgba = flatten(inp[x+y*w])
-                            r = (rgba >> 16) & 0xff
-                            g = (rgba >> 8) & 0xff
-                            b = (rgba >> 0) & 0xff
-                            newpixel = ((b >>3) << 11) | ((g >>2) << 5) | ((r >>3) << 0)
-                        out[outp] = newpixel
-                        outp += 1
-        return out
+        return tpl_codec.encode_rgb565(img)
     def toRGB5A3(self, xxx_todo_changeme6, img):
-        (w, h) = xxx_todo_changeme6
-        out = [0 for i in range(align(w, 4) * align(h, 4))]
-        outp = 0
-        inp = list(img.getdata())
-        for y1 in range(0, h, 4):
-            for x1 in range(0, w, 4):
-                for y in range(y1, y1+4, 1):
-                    for x in range(x1, x1+4, 1):
-                        newpixel = 0
-                        if x>=w or y>=h:
-                            newpixel = 0
-                        else:
-                            rgba = flatten(inp[x + (y * w)])
-                            r = (rgba >> 0) &  0xff
-                            g = (rgba >> 8) &  0xff
-                            b = (rgba >> 16) & 0xff
-                            a = (rgba >> 24) & 0xff
-                            if (a <= 0xda):
-                                newpixel &= ~(1 << 15)
-                                r = ((r * 15)  / 255) & 0xf
-                                g = ((g * 15)  / 255) & 0xf
-                                b = ((b * 15)  / 255) & 0xf
-                                a = ((a * 7)   / 255) & 0x7
-                                #newpixel |= r << 12
-                                #newpixel |= g << 8
-                                #newpixel |= b << 4
-                                #newpixel |= a << 0
-                                newpixel |= a << 12
-                                newpixel |= b << 0
-                                newpixel |= g << 4
-                                newpixel |= r << 8
-                            else:
-                                newpixel |= (1 << 15)
-                                r = ((r * 31) / 255) & 0x1f
-                                g = ((g * 31) / 255) & 0x1f
-                                b = ((b * 31) / 255) & 0x1f
-                                newpixel |= b << 0
-                                newpixel |= g << 5
-                                newpixel |= r << 10
-                        out[outp] = newpixel
-                        outp += 1
-        return out
+        return tpl_codec.encode_rgb5a3(img)
     def toRGBA8(self, xxx_todo_changeme7, img):
-        (w, h) = xxx_todo_changeme7
-        out = [0 for i in range(align(w, 4) * align(h, 4) * 4)]
-        inp = list(img.getdata())
-        iv = 0
-        z = 0
-        lr = [0 for i in range(32)]
-        lg = [0 for i in range(32)]
-        lb = [0 for i in range(32)]
-        la = [0 for i in range(32)]
-        for y1 in range(0, h, 4):
-            for x1 in range(0, w, 4):
-                for y in range(y1, y1 + 4, 1):
-                    for x in range(x1, x1 + 4, 1):
-                        if(y >= h or x >= w):
-                            lr[z] = 0
-                            lg[z] = 0
-                            lb[z] = 0
-                            la[z] = 0
-                        else:
-                            rgba = flatten(inp[x + (y * w)])
-                        lr[z] = (rgba >> 0) & 0xff
-                        lg[z] = (rgba >> 8) & 0xff
-                        lb[z] = (rgba >> 16) & 0xff
-                        la[z] = (rgba >> 24) & 0xff
-                        z += 1
-                if(z == 16):
-                    for i in range(16):
-                        out[iv] = la[i] & 0xff
-                        iv += 1
-                        out[iv] = lr[i] & 0xff
-                        iv += 1
-                    for i in range(16):
-                        out[iv] = lg[i] & 0xff
-                        iv += 1
-                        out[iv] = lb[i] & 0xff
-                        iv += 1
-                    z = 0
-        return out
+        return tpl_codec.encode_rgba8(img)
+    def toCMP(self, xxx_todo_changeme19, img, quality = "normal"):
+        return tpl_codec.encode_cmp(img, quality)
     def toImage(self):
-        if(self.file):
-            data = open(self.file, "rb").read()
-        else:
-            data = self.data
-
-        header = self.TPLHeader()
-        textures = []
-        pos = 0
-
-        header.unpack(data[pos:pos + len(header)])
-        pos += len(header)
-
-        palette_offsets = []
-
-        for i in range(header.ntextures):
-            tmp = self.TPLTexture()
-            tmp.unpack(data[pos:pos + len(tmp)])
-            textures.append(tmp)
-            pos += len(tmp)
-            if(tmp.palette_offset > 0):
-                palette_offsets.append(tmp.palette_offset)
-
-        if(header.ntextures > 1):
-            raise ValueError("Only one texture supported. Don't touch me!")
-
-        for i in range(header.ntextures):
-            head = textures[i]
-            tex = self.TPLTextureHeader()
-            tex.unpack(data[head.header_offset:head.header_offset + len(tex)])
-            w = tex.width
-            h = tex.height
-
-            if(tex.format == 0): #I4, 4-bit
-                tpldata = struct.unpack(">" + str((w * h) / 2) + "B", data[tex.data_off:tex.data_off + ((w * h) / 2)])
-                rgbdata = self.I4((w, h), tpldata)
-
-            elif(tex.format == 1): #I8, 8-bit
-                tpldata = struct.unpack(">" + str(w * h) + "B", data[tex.data_off:tex.data_off + (w * h * 1)])
-                rgbdata = self.I8((w, h), tpldata)
-            elif(tex.format == 2): #IA4, 8-bit
-                tpldata = struct.unpack(">" + str(w * h) + "B", data[tex.data_off:tex.data_off + (w * h * 1)])
-                rgbdata = self.IA4((w, h), tpldata)
-
-            elif(tex.format == 4): #RGB565, 16-bit
-                tpldata = data[tex.data_off:]
-                rgbdata = self.RGB565((w, h), tpldata)
-            elif(tex.format == 5): #RGB5A3, 16-bit
-                tpldata = data[tex.data_off:]
-                rgbdata = self.RGB5A3((w, h), tpldata)
-            elif(tex.format == 3): #IA8, 16-bit
-                tpldata = data[tex.data_off:]
-                rgbdata = self.IA8((w, h), tpldata)
-
-            elif(tex.format == 6): #RGBA8, 32-bit, but for easyness's sake lets do it with 16-bit
-                tpldata = data[tex.data_off:]
-                rgbdata = self.RGBA8((w, h), tpldata)
-
-            elif(tex.format == 8 or tex.format == 9 or tex.format == 10):
-                palhead = self.TPLPaletteHeader()
-                offs = palette_offsets.pop(0)
-                palhead.unpack(data[offs:offs + len(palhead)])
-
-                tpldata = struct.unpack(">" + str(palhead.nitems) + "H", data[palhead.offset:palhead.offset + (palhead.nitems * 2)])
-                palette_data = b''
-                if(palhead.format == 0):
-                    palette_data = self.IA8((palhead.nitems, 1), tpldata)[0]
-                elif(palhead.format == 1):
-                    palette_data = self.RGB565((palhead.nitems, 1), tpldata)[0]
-                elif(palhead.format == 2):
-                    palette_data = self.RGB5A3((palhead.nitems, 1), tpldata)[0]
-
-                paldata = []
-                for i in range(0, palhead.nitems * 4, 4):
-                    tmp = 0
-                    tmp |= palette_data[i + 0] << 24
-                    tmp |= palette_data[i + 1] << 16
-                    tmp |= palette_data[i + 2] << 8
-                    tmp |= palette_data[i + 3] << 0
-                    paldata.append(tmp)
-
-                if(tex.format == 8):
-                    tpldata = struct.unpack(">" + str((w * h) / 2) + "B", data[tex.data_off:tex.data_off + ((w * h) / 2)])
-                    rgbdata = self.CI4((w, h), tpldata, paldata)
-                if(tex.format == 9):
-                    tpldata = struct.unpack(">" + str(w * h) + "B", data[tex.data_off:tex.data_off + (w * h * 1)])
-                    rgbdata = self.CI8((w, h), tpldata, paldata)
-                if(tex.format == 10):
-                    tpldata = struct.unpack(">" + str(w * h) + "H", data[tex.data_off:tex.data_off + (w * h * 2)])
-                    rgbdata = self.CI14X2((w, h), tpldata, paldata)
-            elif(tex.format == 14):
-                tpldata = b''.join([data[tex.data_off:]])
-
-                rgbdata = self.CMP((w, h), tpldata)
-            else:
-                raise TypeError("Unsupported TPL Format: " + str(tex.format))
-
-        output = Image.frombytes("RGBA", (w, h), rgbdata).convert('RGB')
-        return output
+        return self.getFile().toImage().convert('RGB')
     def getSizes(self):
         """This returns a tuple containing the width and height of the TPL image filename in the class initializer. Will only return the size of single textured TPL images."""
-        if(self.file):
-            data = open(self.file, "rb").read()
-        else:
-            data = self.data
-
-        header = self.TPLHeader()
-        textures = []
-        pos = 0
-
-        header.unpack(data[pos:pos + len(header)])
-        pos += len(header)
-
-        for i in range(header.ntextures):
-            tmp = self.TPLTexture()
-            tmp.unpack(data[pos:pos + len(tmp)])
-            textures.append(tmp)
-            pos += len(tmp)
-
-        for i in range(header.ntextures):
-            head = textures[i]
-            tex = self.TPLTextureHeader()
-            tex.unpack(data[head.header_offset:head.header_offset + len(tex)])
-            w = tex.width
-            h = tex.height
-        return (w, h)
+        tex = self.getHeaders().texture_headers[-1]
+        return (tex.width, tex.height)
     def RGBA8(self, xxx_todo_changeme8, data):
         (x, y) = xxx_todo_changeme8
-        out = [0 for i in range(x * y)]
-        inp = 0
-        for i in range(0, y, 4):
-            for j in range(0, x, 4):
-                for k in range(2):
-                    for l in range(i, i + 4, 1):
-                        for m in range(j, j + 4, 1):
-                            texel = Struct.uint8(data[inp:inp + 1], endian = '>')
-                            inp += 1
-                            texel2 = Struct.uint8(data[inp:inp + 1], endian = '>')
-                            inp += 1
-                            if (m >= x) or (l >= y):
-                                continue
-                            if k == 0: # ARARARAR
-                                a = (texel) & 0xff
-                                r = (texel2) & 0xff
-                                out[m + (l * x)] |= ((r << 0) | (a << 24))
-                            else: # GBGBGBGB
-                                g = (texel) & 0xff
-                                b = (texel2) & 0xff
-                                out[m + (l * x)] |= ((g << 8) | (b << 16))
-        return b''.join(Struct.uint32(p) for p in out)
+        return tpl_codec.decode_rgba8(data, x, y).tobytes()
     def RGB5A3(self, xxx_todo_changeme9, jar):
         (w, h) = xxx_todo_changeme9
-        out = [0 for i in range(w * h)]
-        i = 0
-        for y in range(0, h, 4):
-            for x in range(0, w, 4):
-                for y1 in range(y, y + 4):
-                    for x1 in range(x, x + 4):
-                        pixel = Struct.uint16(jar[i * 2:i * 2 + 2], endian='>')
-                        i += 1
-
-                        if(y1 >= h or x1 >= w):
-                            continue
-
-                        if(pixel & (1 << 15)): #RGB555
-                            b = (((pixel >> 10) & 0x1F) * 255) / 31
-                            g = (((pixel >> 5) & 0x1F) * 255) / 31
-                            r = (((pixel >> 0) & 0x1F) * 255) / 31
-                            a = 255
-                        else: #RGB4A3
-                            a = (((pixel >> 12) & 0x07) * 255) / 7
-                            b = (((pixel >> 8) & 0x0F) * 255) / 15
-                            g = (((pixel >> 4) & 0x0F) * 255) / 15
-                            r = (((pixel >> 0) & 0x0F) * 255)/ 15
-
-                        rgba = (r << 16) | (g << 8) | (b << 0) | (a << 24)
-                        out[(y1 * w) + x1] = rgba
-        return b''.join(Struct.uint32(p) for p in out)
+        return tpl_codec.decode_rgb5a3(jar, w, h).tobytes()
     def RGB565(self, xxx_todo_changeme10, jar):
         (w, h) = xxx_todo_changeme10
-        out = [0 for i in range(w * h)]
-        i = 0
-        for y in range(0, h, 4):
-            for x in range(0, w, 4):
-                for y1 in range(y, y + 4):
-                    for x1 in range(x, x + 4):
-                        pixel = Struct.uint16(jar[i * 2:i * 2 + 2], endian='>')
-                        i += 1
-
-                        if(y1 >= h or x1 >= w):
-                            continue
-
-                        b = (((pixel >> 11) & 0x1F) << 3) & 0xff
-                        g = (((pixel >> 5) & 0x3F) << 2) & 0xff
-                        r = (((pixel >> 0) & 0x1F) << 3) & 0xff
-                        a = 255
-
-                        rgba = (r << 16) | (g << 8) | (b << 0) | (a << 24)
-                        out[y1 * w + x1] = rgba
-        return b''.join(Struct.uint32(p) for p in out)
+        return tpl_codec.decode_rgb565(jar, w, h).tobytes()
     def I4(self, xxx_todo_changeme11, jar):
         (w, h) = xxx_todo_changeme11
-        out = [0 for i in range(w * h)]
-        i = 0
-        for y in range(0, h, 8):
-            for x in range(0, w, 8):
-                for y1 in range(y, y + 8):
-                    for x1 in range(x, x + 8, 2):
-                        pixel = jar[i]
-
-                        if(y1 >= h or x1 >= w):
-                            continue
-
-                        r = (pixel >> 4) * 255 / 15
-                        g = (pixel >> 4) * 255 / 15
-                        b = (pixel >> 4) * 255 / 15
-                        a = (pixel >> 4) * 255 / 15
-
-                        rgba = (r << 0) | (g << 8) | (b << 16) | (a << 24)
-                        out[y1 * w + x1] = rgba
-
-                        pixel = jar[i]
-                        i += 1
-
-                        if(y1 >= h or x1 >= w):
-                            continue
-
-                        r = (pixel & 0x0F) * 255 / 15
-                        g = (pixel & 0x0F) * 255 / 15
-                        b = (pixel & 0x0F) * 255 / 15
-                        a = (pixel & 0x0F) * 255 / 15
-
-                        rgba = (r << 0) | (g << 8) | (b << 16) | (a << 24)
-                        out[y1 * w + x1 + 1] = rgba
-        return b''.join(Struct.uint32(p) for p in out)
+        return tpl_codec.decode_i4(jar, w, h).tobytes()
     def IA4(self, xxx_todo_changeme12, jar):
         (w, h) = xxx_todo_changeme12
-        out = [0 for i in range(w * h)]
-        i = 0
-        for y in range(0, h, 4):
-            for x in range(0, w, 8):
-                for y1 in range(y, y + 4):
-                    for x1 in range(x, x + 8):
-                        pixel = jar[i]
-                        i += 1
-
-                        if(y1 >= h or x1 >= w):
-                            continue
-
-                        r = ((pixel & 0x0F) * 255 / 15) & 0xff
-                        g = ((pixel & 0x0F) * 255 / 15) & 0xff
-                        b = ((pixel & 0x0F) * 255 / 15) & 0xff
-                        a = (((pixel >> 4) * 255) / 15) & 0xff
-
-                        rgba = ( r<< 0) | (g << 8) | (b << 16) | (a << 24)
-                        out[y1 * w + x1] = rgba
-        return b''.join(Struct.uint32(p) for p in out)
+        return tpl_codec.decode_ia4(jar, w, h).tobytes()
     def I8(self, xxx_todo_changeme13, jar):
         (w, h) = xxx_todo_changeme13
-        out = [0 for i in range(w * h)]
-        i = 0
-        for y in range(0, h, 4):
-            for x in range(0, w, 8):
-                for y1 in range(y, y + 4):
-                    for x1 in range(x, x + 8):
-                        pixel = jar[i]
-                        i += 1
-
-                        if(y1 >= h or x1 >= w):
-                            continue
-
-                        r = pixel
-                        g = pixel
-                        b = pixel
-                        a = 255
-
-                        rgba = (r << 0) | (g << 8) | (b << 16) | (a << 24)
-                        out[y1 * w + x1] = rgba
-        return b''.join(Struct.uint32(p) for p in out)
+        return tpl_codec.decode_i8(jar, w, h).tobytes()
     def IA8(self, xxx_todo_changeme14, jar):
         (w, h) = xxx_todo_changeme14
-        out = [0 for i in range(w * h)]
-        i = 0
-        for y in range(0, h, 4):
-            for x in range(0, w, 4):
-                for y1 in range(y, y + 4):
-                    for x1 in range(x, x + 4):
-                        pixel = Struct.uint16(jar[i * 2:i * 2 + 2], endian='>')
-                        i += 1
-
-                        if(y1 >= h or x1 >= w):
-                            continue
-
-                        r = (pixel >> 8)
-                        g = (pixel >> 8)
-                        b = (pixel >> 8)
-                        a = pixel  & 0xff
-
-                        rgba = (r << 0) | (g << 8) | (b << 16) | (a << 24)
-                        out[y1 * w + x1] = rgba
-        return b''.join(Struct.uint32(p) for p in out)
+        return tpl_codec.decode_ia8(jar, w, h).tobytes()
     def CI4(self, xxx_todo_changeme15, jar, pal):
         (w, h) = xxx_todo_changeme15
-        out = [0 for i in range(w * h)]
-        i = 0
-        for y in range(0, h, 8):
-            for x in range(0, w, 8):
-                for y1 in range(y, y + 8):
-                    for x1 in range(x, x + 8, 2):
-                        if(y1 >= h or x1 >= w):
-                            continue
-                        pixel = jar[i]
-
-                        r = (pal[pixel] & 0xFF000000) >> 24
-                        g = (pal[pixel] & 0x00FF0000) >> 16
-                        b = (pal[pixel] & 0x0000FF00) >> 8
-                        a = (pal[pixel] & 0x000000FF) >> 0
-
-                        rgba = (r << 0) | (g << 8) | (b << 16) | (a << 24)
-                        out[y1 * w + x1] = rgba
-
-                        if(y1 >= h or x1 >= w):
-                            continue
-                        pixel = jar[i]
-                        i += 1
-
-                        r = (pal[pixel] & 0xFF000000) >> 24
-                        g = (pal[pixel] & 0x00FF0000) >> 16
-                        b = (pal[pixel] & 0x0000FF00) >> 8
-                        a = (pal[pixel] & 0x000000FF) >> 0
-
-                        rgba = (r << 0) | (g << 8) | (b << 16) | (a << 24)
-                        out[y1 * w + x1 + 1] = rgba
-        return b''.join(Struct.uint32(p) for p in out)
+        return tpl_codec.decode_ci4(jar, w, h, rgba_palette(pal)).tobytes()
     def CI8(self, xxx_todo_changeme16, jar, pal):
         (w, h) = xxx_todo_changeme16
-        out = [0 for i in range(w * h)]
-        i = 0
-        for y in range(0, h, 4):
-            for x in range(0, w, 8):
-                for y1 in range(y, y + 4):
-                    for x1 in range(x, x + 8):
-                        if(y1 >= h or x1 >= w):
-                            continue
-                        pixel = jar[i]
-                        i += 1
-
-                        r = (pal[pixel] & 0xFF000000) >> 24
-                        g = (pal[pixel] & 0x00FF0000) >> 16
-                        b = (pal[pixel] & 0x0000FF00) >> 8
-                        a = (pal[pixel] & 0x000000FF) >> 0
-
-                        rgba = (r << 0) | (g << 8) | (b << 16) | (a << 24)
-                        out[y1 * w + x1] = rgba
-        return b''.join(Struct.uint32(p) for p in out)
+        return tpl_codec.decode_ci8(jar, w, h, rgba_palette(pal)).tobytes()
     def CMP(self, xxx_todo_changeme17, data):
         (w, h) = xxx_todo_changeme17
-        temp = [0 for i in range(w * h)]
-        pix = [ 0 , 0 , 0 ]
-        c = [ 0 , 0 , 0 , 0 ]
-        outp = 0
-        for y in range(h):
-            for x in range(w):
-                ww = round_up(w, 8)
-
-                x0 = x & 0x03
-                x1 = (x >> 2) & 0x01
-                x2 = x >> 3
-
-                y0 = y & 0x03
-                y1 = (y >> 2) & 0x01
-                y2 = y >> 3
-
-                off = (8 * x1) + (16 * y1) + (32 * x2) + (4 * ww * y2)
-
-                c[0] = Struct.uint16(data[off + 0:off + 2], endian='>')
-                c[1] = Struct.uint16(data[off + 2:off + 4], endian='>')
-                if(c[0] > c[1]):
-                    c[2] = avg(2, 1, c[0], c[1])
-                    c[3] = avg(1, 2, c[0], c[1])
-                else:
-                    c[2] = avg(1, 1, c[0], c[1])
-                    c[3] = 0
-
-                px = Struct.uint32(data[off+4:off + 8], endian='>')
-                ix = x0 + ( 4 * y0 )
-                raw = c[(px >> (30 - (2 * ix))) & 0x03]
-
-                pix[0] = (raw >> 8) & 0xf8
-                pix[1] = (raw >> 3) & 0xf8
-                pix[2] = (raw << 3) & 0xf8
-
-                temp[outp] = (pix[0] <<0) | (pix[1] << 8) | (pix[2] << 16) | (255 << 24)
-                outp += 1
-        return b''.join(Struct.uint32(p) for p in temp)
+        return tpl_codec.decode_cmp(data, w, h).tobytes()
     def CI14X2(self, xxx_todo_changeme18, jar, pal):
         (w, h) = xxx_todo_changeme18
-        out = [0 for i in range(w * h)]
-        i = 0
-        for y in range(0, h, 4):
-            for x in range(0, w, 4):
-                for y1 in range(y, y + 4):
-                    for x1 in range(x, x + 4):
-                        if(y1 >= h or x1 >= w):
-                            continue
-                        pixel = jar[i]
-                        i += 1
-
-                        r = (pal[pixel & 0x3FFF] & 0xFF000000) >> 24
-                        g = (pal[pixel & 0x3FFF] & 0x00FF0000) >> 16
-                        b = (pal[pixel & 0x3FFF] & 0x0000FF00) >> 8
-                        a = (pal[pixel & 0x3FFF] & 0x000000FF) >> 0
-
-                        rgba = (r << 0) | (g << 8) | (b << 16) | (a << 24)
-                        out[y1 * w + x1] = rgba
-        return b''.join(Struct.uint32(p) for p in out)
+        return tpl_codec.decode_ci14x2(jar, w, h, rgba_palette(pal)).tobytes()
     def getFormat(self):
-        if(self.file):
-            data = open(self.file, "rb").read()
-        else:
-            data = self.data
-
-        header = self.TPLHeader()
-        textures = []
-        pos = 0
-
-        header.unpack(data[pos:pos + len(header)])
-        pos += len(header)
-
-        palette_offsets = []
-
-        for i in range(header.ntextures):
-            tmp = self.TPLTexture()
-            tmp.unpack(data[pos:pos + len(tmp)])
-            textures.append(tmp)
-            pos += len(tmp)
-            if(tmp.palette_offset > 0):
-                palette_offsets.append(tmp.palette_offset)
-
-        for i in range(header.ntextures):
-            head = textures[i]
-            tex = self.TPLTextureHeader()
-            tex.unpack(data[head.header_offset:head.header_offset + len(tex)])
-
-            if(tex.format == 0): #I4, 4-bit
-                return "I4"
-            elif(tex.format == 1): #I8, 8-bit
-                return "I8"
-            elif(tex.format == 2): #IA4, 8-bit
-                return "IA4"
-            elif(tex.format == 4): #RGB565, 16-bit
-                return "RGB565"
-            elif(tex.format == 5): #RGB5A3, 16-bit
-                return "RGB5A3"
-            elif(tex.format == 3): #IA8, 16-bit
-                return "IA8"
-            elif(tex.format == 6): #RGBA8, 32-bit
-                return "RGBA8"
-            elif(tex.format == 8):
-                return "CI4"
-            elif(tex.format == 9):
-                return "CI8"
-            elif(tex.format == 10):
-                return "CI14X2"
-            elif(tex.format == 14):
-                return "CMP"
-            else:
-                raise TypeError("Unknown TPL Format: %d" % tex.format)
-            
+        tex = self.getHeaders().texture_headers[0]
+        if(tex.format not in FORMAT_NAMES):
+            raise TypeError("Unknown TPL Format: %d" % tex.format)
+        return FORMAT_NAMES[tex.format]
+
+# (format, bits per pixel) of the HMX header of png_wii textures -> TPL format
+WII_FORMATS = {(72, 4): 14, (64, 32): 6}
+
+def tpl_header_for(width: int, height: int, format: int) -> bytes:
+    """The 64-byte single texture TPL header that takes the place of the HMX header of a png_wii texture."""
+    head = TPLHeader(magic=0x0020AF30, ntextures=1, header_size=0x0C)
+    tex = TPLTexture(header_offset=0x14)
+    texhead = TPLTextureHeader(height=height, width=width, format=format, data_off=0x40, filter=(1, 1))
+    return (head.pack() + tex.pack() + texhead.pack()).ljust(0x40, b"\x00")
+
+def wii_tpl_header(hmx_header: bytes) -> bytes:
+    """The TPL header of a png_wii texture, read from the size and format of its 32-byte HMX header."""
+    bpp, format = hmx_header[1], struct.unpack_from("<L", hmx_header, 2)[0]
+    width, height = struct.unpack_from("<2H", hmx_header, 7)
+    if (format, bpp) not in WII_FORMATS:
+        raise TypeError("Unknown PNG_WII format: %d (%d bpp)" % (format, bpp))
+    return tpl_header_for(width, height, WII_FORMATS[(format, bpp)])
+
 class PNG_WII:
-    def __init__(self, path: str, header = bytes([0x00, 0x20, 0xaf, 0x30, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x0c, 0x00, 0x00, 0x00, 0x14, 0x00, 0x00, 0x00, 0x00, 0x01, 0x00, 0x01, 0x00, 0x00, 0x00, 0x00, 0x0e, 0x00, 0x00, 0x00, 0x40, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])) -> None:
-        self.data = open(path, 'rb').read()
+    def __init__(self, path: str, header: Optional[bytes] = None) -> None:
+        with open(path, 'rb') as f:
+            self.data = f.read()
         self.hmx_header = self.data[0:32]
-        self.tpl_header = header
-        self.tpl = TPL(bytes(self.tpl_header + self.data[32:]))
\ No newline at end of file
+        self.tpl_header = header if header is not None else wii_tpl_header(self.hmx_header)
+        # The TPL header takes the place of the HMX one, the texture data is used in place
+        self.tpl = TPL(TPLFile(self.data, self.tpl_header, 32, mips = self.hmx_header[6] + 1))
\ No newline at end of file
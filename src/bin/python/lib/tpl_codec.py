@@ -0,0 +1,573 @@
+"""
+Vectorized TPL (Texture Palette Library) texture decoders and encoders, built on NumPy.
+
+The GX texture formats store pixels in fixed-size tiles (4x4 or 8x4 or 8x8 pixels) laid out row by
+row. Each decoder reads the whole texture as one array, expands the channels with a lookup table
+and untiles it with reshape/transpose, so no Python code runs per pixel.
+
+Every decoder takes the raw texture bytes plus the image size and returns an `(height, width, 4)`
+`uint8` RGBA array, matching the output of the original per-pixel decoders of `lib/tpl.py`. Every encoder takes an
+RGBA image (a PIL image or an `(height, width, 4)` array) and returns the raw texture bytes, using
+the channel layout of the original per-pixel encoders. Padding texels are zero, except
+for CMP where the image edge is repeated so the padding does not skew the block colors.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+def align(x: int, boundary: int) -> int:
+    return (x + boundary - 1) // boundary * boundary
+
+def untile(pixels: np.ndarray, width: int, height: int, tile_w: int, tile_h: int) -> np.ndarray:
+    """Rearrange tile-ordered pixels (first axis) into a `(height, width, ...)` image, cropping the tile padding."""
+    aligned_w, aligned_h = align(width, tile_w), align(height, tile_h)
+    channels = pixels.shape[1:]
+    tiles = pixels[:aligned_w * aligned_h].reshape(aligned_h // tile_h, aligned_w // tile_w, tile_h, tile_w, *channels)
+    image = tiles.swapaxes(1, 2).reshape(aligned_h, aligned_w, *channels)
+    return image[:height, :width]
+
+def read_array(data: bytes, dtype: str, count: int) -> np.ndarray:
+    """Read `count` items of `dtype` from the start of data, raising ValueError if the data is too short."""
+    itemsize = np.dtype(dtype).itemsize
+    if len(data) < count * itemsize:
+        raise ValueError("TPL texture data too short: expected %d bytes, got %d" % (count * itemsize, len(data)))
+    return np.frombuffer(data, dtype=dtype, count=count)
+
+def expand(bits: np.ndarray, depth: int) -> np.ndarray:
+    """Scale an n-bit channel to 8 bits the way the original decoders do (floor of value * 255 / max)."""
+    top = (1 << depth) - 1
+    return (bits.astype(np.uint32) * 255 // top).astype(np.uint8)
+
+@lru_cache(maxsize=None)
+def rgb565_lut() -> np.ndarray:
+    p = np.arange(0x10000, dtype=np.uint32)
+    lut = np.empty((0x10000, 4), dtype=np.uint8)
+    lut[:, 0] = ((p >> 11) & 0x1F) << 3
+    lut[:, 1] = ((p >> 5) & 0x3F) << 2
+    lut[:, 2] = (p & 0x1F) << 3
+    lut[:, 3] = 255
+    return lut
+
+@lru_cache(maxsize=None)
+def rgb5a3_lut() -> np.ndarray:
+    p = np.arange(0x10000, dtype=np.uint32)
+    opaque = (p & 0x8000) != 0
+    lut = np.empty((0x10000, 4), dtype=np.uint8)
+    # RGB555 when the top bit is set, RGB4A3 otherwise
+    lut[:, 0] = np.where(opaque, expand((p >> 10) & 0x1F, 5), expand((p >> 8) & 0x0F, 4))
+    lut[:, 1] = np.where(opaque, expand((p >> 5) & 0x1F, 5), expand((p >> 4) & 0x0F, 4))
+    lut[:, 2] = np.where(opaque, expand(p & 0x1F, 5), expand(p & 0x0F, 4))
+    lut[:, 3] = np.where(opaque, 255, expand((p >> 12) & 0x07, 3))
+    return lut
+
+@lru_cache(maxsize=None)
+def ia4_lut() -> np.ndarray:
+    p = np.arange(0x100, dtype=np.uint32)
+    lut = np.empty((0x100, 4), dtype=np.uint8)
+    lut[:, 0:3] = expand(p & 0x0F, 4)[:, None]
+    lut[:, 3] = expand(p >> 4, 4)
+    return lut
+
+@lru_cache(maxsize=None)
+def i4_lut() -> np.ndarray:
+    # One byte holds two pixels, high nibble first. Alpha follows the intensity.
+    p = np.arange(0x100, dtype=np.uint32)
+    lut = np.empty((0x100, 2, 4), dtype=np.uint8)
+    lut[:, 0, :] = expand(p >> 4, 4)[:, None]
+    lut[:, 1, :] = expand(p & 0x0F, 4)[:, None]
+    return lut
+
+def decode_i4(data: bytes, width: int, height: int) -> np.ndarray:
+    """I4: 4-bit intensity, 8x8 tiles."""
+    aligned_w, aligned_h = align(width, 8), align(height, 8)
+    texels = read_array(data, "u1", aligned_w * aligned_h // 2)
+    return untile(i4_lut()[texels].reshape(-1, 4), width, height, 8, 8)
+
+def decode_i8(data: bytes, width: int, height: int) -> np.ndarray:
+    """I8: 8-bit intensity, 8x4 tiles."""
+    aligned_w, aligned_h = align(width, 8), align(height, 4)
+    texels = read_array(data, "u1", aligned_w * aligned_h)
+    pixels = np.empty((texels.size, 4), dtype=np.uint8)
+    pixels[:, 0:3] = texels[:, None]
+    pixels[:, 3] = 255
+    return untile(pixels, width, height, 8, 4)
+
+def decode_ia4(data: bytes, width: int, height: int) -> np.ndarray:
+    """IA4: 4-bit alpha (high nibble) and 4-bit intensity (low nibble), 8x4 tiles."""
+    aligned_w, aligned_h = align(width, 8), align(height, 4)
+    texels = read_array(data, "u1", aligned_w * aligned_h)
+    return untile(ia4_lut()[texels], width, height, 8, 4)
+
+def decode_ia8(data: bytes, width: int, height: int) -> np.ndarray:
+    """IA8: 8-bit intensity (first byte) and 8-bit alpha (second byte), 4x4 tiles."""
+    aligned_w, aligned_h = align(width, 4), align(height, 4)
+    texels = read_array(data, "u1", aligned_w * aligned_h * 2).reshape(-1, 2)
+    pixels = np.empty((texels.shape[0], 4), dtype=np.uint8)
+    pixels[:, 0:3] = texels[:, 0:1]
+    pixels[:, 3] = texels[:, 1]
+    return untile(pixels, width, height, 4, 4)
+
+def decode_rgb565(data: bytes, width: int, height: int) -> np.ndarray:
+    """RGB565: 16-bit big-endian color, 4x4 tiles."""
+    aligned_w, aligned_h = align(width, 4), align(height, 4)
+    texels = read_array(data, ">u2", aligned_w * aligned_h)
+    return untile(rgb565_lut()[texels], width, height, 4, 4)
+
+def decode_rgb5a3(data: bytes, width: int, height: int) -> np.ndarray:
+    """RGB5A3: 16-bit big-endian RGB555 or RGB4A3 color, 4x4 tiles."""
+    aligned_w, aligned_h = align(width, 4), align(height, 4)
+    texels = read_array(data, ">u2", aligned_w * aligned_h)
+    return untile(rgb5a3_lut()[texels], width, height, 4, 4)
+
+def decode_rgba8(data: bytes, width: int, height: int) -> np.ndarray:
+    """RGBA8: 4x4 tiles of 64 bytes, 16 AR pairs followed by 16 GB pairs."""
+    aligned_w, aligned_h = align(width, 4), align(height, 4)
+    tiles = read_array(data, "u1", aligned_w * aligned_h * 4).reshape(-1, 2, 16, 2)
+    pixels = np.empty((tiles.shape[0], 16, 4), dtype=np.uint8)
+    pixels[:, :, 0] = tiles[:, 0, :, 1]
+    pixels[:, :, 1] = tiles[:, 1, :, 0]
+    pixels[:, :, 2] = tiles[:, 1, :, 1]
+    pixels[:, :, 3] = tiles[:, 0, :, 0]
+    return untile(pixels.reshape(-1, 4), width, height, 4, 4)
+
+# CMP textures with at least this many pixels are split across threads by default
+CMP_THREADS_MIN_PIXELS = 1024 * 1024
+
+def cmp_palettes(c0: np.ndarray, c1: np.ndarray) -> np.ndarray:
+    """Build the four-color palette of every DXT1 block at once, as `(..., 4)` packed little-endian RGBA.
+
+    The interpolated colors are averaged per RGB565 channel with truncation, and the channels are
+    widened by a plain shift, like the original per-pixel CMP decoder. Alpha is always opaque.
+    """
+    c0 = c0.astype(np.uint32)
+    c1 = c1.astype(np.uint32)
+    opaque = (c0 > c1)[..., None]
+    palette = np.full(c0.shape + (4,), 0xFF000000, dtype="<u4")
+    # (shift, field mask, kept bits, widen shift) per channel. The original decoder drops the
+    # lowest green bit when widening to 8 bits, so only 0x3E of the green field is kept.
+    channels = ((11, 0x1F, 0x1F, 3), (5, 0x3F, 0x3E, 2), (0, 0x1F, 0x1F, 3))
+    for channel, (shift, field, kept, widen) in enumerate(channels):
+        a0 = (c0 >> shift) & field
+        a1 = (c1 >> shift) & field
+        values = np.where(
+            opaque,
+            np.stack((a0, a1, (2 * a0 + a1) // 3, (a0 + 2 * a1) // 3), axis=-1),
+            np.stack((a0, a1, (a0 + a1) // 2, np.zeros_like(a0)), axis=-1),
+        )
+        palette |= ((values & kept) << widen) << (8 * channel)
+    return palette
+
+def _decode_cmp_rows(blocks: np.ndarray, out: np.ndarray) -> None:
+    """Decode `(rows, cols, 2, 2, 8)` CMP sub-blocks into the matching `(rows * 8, cols * 8, 4)` output slice."""
+    rows, cols = blocks.shape[0], blocks.shape[1]
+    c0 = (blocks[..., 0].astype(np.uint16) << 8) | blocks[..., 1]
+    c1 = (blocks[..., 2].astype(np.uint16) << 8) | blocks[..., 3]
+    bits = blocks[..., 4:8].copy().view(">u4")[..., 0]
+    # 2-bit indices, first pixel in the most significant bits
+    shifts = np.arange(30, -1, -2, dtype=np.uint32)
+    indices = ((bits[..., None] >> shifts) & 0x03).astype(np.intp)
+    colors = np.take_along_axis(cmp_palettes(c0, c1), indices, axis=-1)
+    # (row, col, y1, x1, y0, x0) -> (row, y1, y0, col, x1, x0)
+    colors = colors.reshape(rows, cols, 2, 2, 4, 4).transpose(0, 2, 4, 1, 3, 5)
+    out.view("<u4")[..., 0] = colors.reshape(rows * 8, cols * 8)
+
+def decode_cmp(data: bytes, width: int, height: int, threads: Optional[int] = None) -> np.ndarray:
+    """CMP: DXT1 (S3TC) compression, 8x8 macro-blocks of four 4x4 sub-blocks with big-endian fields.
+
+    Each macro-block is decoded once, with the palettes of all blocks built in vectorized form.
+    With more than one thread, rows of macro-blocks are spread across a thread pool. By default
+    textures of `CMP_THREADS_MIN_PIXELS` or more use up to 4 threads.
+    """
+    aligned_w, aligned_h = align(width, 8), align(height, 8)
+    rows, cols = aligned_h // 8, aligned_w // 8
+    blocks = read_array(data, "u1", aligned_w * aligned_h // 2).reshape(rows, cols, 2, 2, 8)
+    out = np.empty((aligned_h, aligned_w, 4), dtype=np.uint8)
+
+    if threads is None:
+        threads = min(4, os.cpu_count() or 1) if width * height >= CMP_THREADS_MIN_PIXELS else 1
+    threads = max(1, min(threads, rows))
+    if threads == 1:
+        _decode_cmp_rows(blocks, out)
+    else:
+        step = -(-rows // threads)
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            jobs = [
+                pool.submit(_decode_cmp_rows, blocks[row:row + step], out[row * 8:(row + step) * 8])
+                for row in range(0, rows, step)
+            ]
+            for job in jobs:
+                job.result()
+    return out[:height, :width]
+
+# TPL texture format ID -> decoder
+DECODERS: Dict[int, Callable[[bytes, int, int], np.ndarray]] = {
+    0: decode_i4,
+    1: decode_i8,
+    2: decode_ia4,
+    3: decode_ia8,
+    4: decode_rgb565,
+    5: decode_rgb5a3,
+    6: decode_rgba8,
+    14: decode_cmp,
+}
+
+def decode_palette(data: bytes, count: int, palette_format: int) -> np.ndarray:
+    """Decode `count` big-endian palette entries (0 = IA8, 1 = RGB565, 2 = RGB5A3) into a `(count, 4)` RGBA array."""
+    entries = read_array(data, ">u2", count)
+    if palette_format == 0:
+        palette = np.empty((count, 4), dtype=np.uint8)
+        palette[:, 0:3] = (entries >> 8).astype(np.uint8)[:, None]
+        palette[:, 3] = entries & 0xFF
+        return palette
+    if palette_format == 1:
+        return rgb565_lut()[entries]
+    if palette_format == 2:
+        return rgb5a3_lut()[entries]
+    raise ValueError("Unknown TPL palette format: %d" % palette_format)
+
+def decode_ci4(data: bytes, width: int, height: int, palette: np.ndarray) -> np.ndarray:
+    """CI4: 4-bit palette indices (high nibble first), 8x8 tiles."""
+    aligned_w, aligned_h = align(width, 8), align(height, 8)
+    texels = read_array(data, "u1", aligned_w * aligned_h // 2)
+    indices = np.stack((texels >> 4, texels & 0x0F), axis=-1).reshape(-1)
+    return untile(palette[indices], width, height, 8, 8)
+
+def decode_ci8(data: bytes, width: int, height: int, palette: np.ndarray) -> np.ndarray:
+    """CI8: 8-bit palette indices, 8x4 tiles."""
+    aligned_w, aligned_h = align(width, 8), align(height, 4)
+    return untile(palette[read_array(data, "u1", aligned_w * aligned_h)], width, height, 8, 4)
+
+def decode_ci14x2(data: bytes, width: int, height: int, palette: np.ndarray) -> np.ndarray:
+    """CI14X2: 14-bit palette indices in big-endian 16-bit words, 4x4 tiles."""
+    aligned_w, aligned_h = align(width, 4), align(height, 4)
+    texels = read_array(data, ">u2", aligned_w * aligned_h)
+    return untile(palette[texels & 0x3FFF], width, height, 4, 4)
+
+# TPL palette texture format ID -> decoder, taking the decoded palette as the last argument
+CI_DECODERS: Dict[int, Callable[[bytes, int, int, np.ndarray], np.ndarray]] = {
+    8: decode_ci4,
+    9: decode_ci8,
+    10: decode_ci14x2,
+}
+
+# TPL texture format ID -> (bits per pixel, tile width, tile height)
+LAYOUTS: Dict[int, Tuple[int, int, int]] = {
+    0: (4, 8, 8),
+    1: (8, 8, 4),
+    2: (8, 8, 4),
+    3: (16, 4, 4),
+    4: (16, 4, 4),
+    5: (16, 4, 4),
+    6: (32, 4, 4),
+    8: (4, 8, 8),
+    9: (8, 8, 4),
+    10: (16, 4, 4),
+    14: (4, 8, 8),
+}
+
+def texture_size(format: int, width: int, height: int) -> int:
+    """Size in bytes of one TPL image of the given format and size, tile padding included."""
+    bpp, tile_w, tile_h = LAYOUTS[format]
+    return align(width, tile_w) * align(height, tile_h) * bpp // 8
+
+def level_dimensions(width: int, height: int, level: int) -> Tuple[int, int]:
+    """Size of a mip level, each level halving the previous one down to 1 pixel."""
+    return max(1, width >> level), max(1, height >> level)
+
+def level_for_size(width: int, height: int, levels: int, size: int) -> int:
+    """The smallest mip level whose largest side is still at least size pixels (level 0 if none is smaller)."""
+    level = 0
+    while level + 1 < levels and max(level_dimensions(width, height, level + 1)) >= size:
+        level += 1
+    return level
+
+def as_rgba(image: Any) -> np.ndarray:
+    """Return a PIL image or an array-like as an `(height, width, 4)` `uint8` RGBA array."""
+    if not isinstance(image, np.ndarray) and hasattr(image, "convert"):
+        image = image.convert("RGBA")
+    pixels = np.asarray(image, dtype=np.uint8)
+    if pixels.ndim != 3 or pixels.shape[2] != 4:
+        raise ValueError("Expected an RGBA image, got an array of shape %s" % (pixels.shape,))
+    return pixels
+
+def tile(pixels: np.ndarray, tile_w: int, tile_h: int, edge=False) -> np.ndarray:
+    """Pad a `(height, width, ...)` image to whole tiles and return its pixels in tile order (first axis), the inverse of `untile`.
+
+    The padding is zero, or a copy of the last row/column with `edge`.
+    """
+    height, width = pixels.shape[:2]
+    channels = pixels.shape[2:]
+    aligned_w, aligned_h = align(width, tile_w), align(height, tile_h)
+    padding = [(0, aligned_h - height), (0, aligned_w - width)] + [(0, 0)] * len(channels)
+    pixels = np.pad(pixels, padding, mode="edge" if edge else "constant")
+    tiles = pixels.reshape(aligned_h // tile_h, tile_h, aligned_w // tile_w, tile_w, *channels).swapaxes(1, 2)
+    return tiles.reshape(-1, *channels)
+
+def quantize(channel: np.ndarray, depth: int) -> np.ndarray:
+    """Scale an 8-bit channel down to n bits, rounded to nearest so re-encoding a decoded texture is lossless.
+
+    The original encoders truncated (value * max // 255), which turned e.g. every 5-bit value 1 into 0
+    after a decode/encode round trip.
+    """
+    top = (1 << depth) - 1
+    return (channel.astype(np.uint32) * top + 127) // 255
+
+def intensity(pixels: np.ndarray) -> np.ndarray:
+    """Average of the RGB channels, truncated, like the original encoders."""
+    rgb = pixels[..., 0:3].astype(np.uint32)
+    return (rgb[..., 0] + rgb[..., 1] + rgb[..., 2]) // 3
+
+def encode_i4(image: Any) -> bytes:
+    """I4: 4-bit intensity, 8x8 tiles."""
+    texels = tile(quantize(intensity(as_rgba(image)), 4).astype(np.uint8), 8, 8)
+    return ((texels[0::2] << 4) | texels[1::2]).tobytes()
+
+def encode_i8(image: Any) -> bytes:
+    """I8: 8-bit intensity, 8x4 tiles."""
+    return tile(intensity(as_rgba(image)).astype(np.uint8), 8, 4).tobytes()
+
+def encode_ia4(image: Any) -> bytes:
+    """IA4: 4-bit alpha (high nibble) and 4-bit intensity (low nibble), 8x4 tiles."""
+    pixels = as_rgba(image)
+    texels = (quantize(pixels[..., 3], 4) << 4) | quantize(intensity(pixels), 4)
+    return tile(texels.astype(np.uint8), 8, 4).tobytes()
+
+def encode_ia8(image: Any) -> bytes:
+    """IA8: 8-bit intensity (first byte) and 8-bit alpha (second byte), 4x4 tiles."""
+    pixels = as_rgba(image)
+    texels = np.stack((intensity(pixels).astype(np.uint8), pixels[..., 3]), axis=-1)
+    return tile(texels, 4, 4).tobytes()
+
+def encode_rgb565(image: Any) -> bytes:
+    """RGB565: 16-bit big-endian color, 4x4 tiles."""
+    pixels = as_rgba(image).astype(np.uint32)
+    # Rounded to the nearest of the values the decoder widens them to (value << 3, value << 2)
+    r, g, b = (np.minimum((pixels[..., channel] + (1 << (shift - 1))) >> shift, 0xFF >> shift) for channel, shift in ((0, 3), (1, 2), (2, 3)))
+    texels = (r << 11) | (g << 5) | b
+    return tile(texels.astype(">u2"), 4, 4).tobytes()
+
+def encode_rgb5a3(image: Any) -> bytes:
+    """RGB5A3: 16-bit big-endian RGB555 color, or RGB4A3 for pixels with an alpha of 0xDA or less, 4x4 tiles."""
+    pixels = as_rgba(image)
+    r, g, b, a = (pixels[..., channel] for channel in range(4))
+    rgb555 = 0x8000 | (quantize(r, 5) << 10) | (quantize(g, 5) << 5) | quantize(b, 5)
+    rgb4a3 = (quantize(a, 3) << 12) | (quantize(r, 4) << 8) | (quantize(g, 4) << 4) | quantize(b, 4)
+    texels = np.where(a <= 0xDA, rgb4a3, rgb555)
+    return tile(texels.astype(">u2"), 4, 4).tobytes()
+
+def encode_rgba8(image: Any) -> bytes:
+    """RGBA8: 4x4 tiles of 64 bytes, 16 AR pairs followed by 16 GB pairs.
+
+    The padding of the last tiles holds the last pixel the original encoder read: the end of the row
+    on the right, and the last pixel of the tile's last row below.
+    """
+    pixels = as_rgba(image)
+    height, width = pixels.shape[:2]
+    pixels = np.pad(pixels, [(0, 0), (0, align(width, 4) - width), (0, 0)], mode="edge")
+    if height % 4:
+        below = np.repeat(pixels[height - 1, 3::4], 4, axis=0)
+        pixels = np.concatenate((pixels, np.broadcast_to(below, (align(height, 4) - height, *below.shape))))
+    pixels = tile(pixels, 4, 4).reshape(-1, 16, 4)
+    tiles = np.empty((pixels.shape[0], 2, 16, 2), dtype=np.uint8)
+    tiles[:, 0, :, 0] = pixels[:, :, 3]
+    tiles[:, 0, :, 1] = pixels[:, :, 0]
+    tiles[:, 1, :, 0] = pixels[:, :, 1]
+    tiles[:, 1, :, 1] = pixels[:, :, 2]
+    return tiles.tobytes()
+
+# Endpoint search of the CMP encoder, from fastest to best looking:
+#   fast   - bounding box of the block colors, slightly inset
+#   normal - the better of the bounding box and a range fit along the principal axis of the colors
+#   best   - normal, refined with two least-squares passes over the chosen indices
+# Every step keeps a block's previous endpoints unless the new ones decode closer to its pixels,
+# so a higher quality never gives a worse block.
+CMP_QUALITIES = ("fast", "normal", "best")
+
+# Pixels with less alpha than this are encoded as transparent (3-color blocks)
+CMP_ALPHA_THRESHOLD = 128
+
+def _to_rgb565(colors: np.ndarray) -> np.ndarray:
+    rgb = np.clip(colors, 0, 255)
+    r = np.rint(rgb[..., 0] * (31 / 255)).astype(np.uint32)
+    g = np.rint(rgb[..., 1] * (63 / 255)).astype(np.uint32)
+    b = np.rint(rgb[..., 2] * (31 / 255)).astype(np.uint32)
+    return (r << 11) | (g << 5) | b
+
+def _from_rgb565(colors: np.ndarray) -> np.ndarray:
+    r = (colors >> 11) & 0x1F
+    g = (colors >> 5) & 0x3F
+    b = colors & 0x1F
+    return np.stack(((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)), axis=-1).astype(np.float32)
+
+def dxt1_palette(c0: np.ndarray, c1: np.ndarray) -> np.ndarray:
+    """The `(blocks, 4, 3)` RGB palette of DXT1 blocks: bit-replicated RGB565, interpolated in float."""
+    p0, p1 = _from_rgb565(c0), _from_rgb565(c1)
+    four = (c0 > c1)[:, None]
+    return np.stack((p0, p1, np.where(four, (2 * p0 + p1) / 3, (p0 + p1) / 2), np.where(four, (p0 + 2 * p1) / 3, 0)), axis=1)
+
+def cmp_palette(c0: np.ndarray, c1: np.ndarray) -> np.ndarray:
+    """`dxt1_palette` as `decode_cmp` reads CMP blocks (see `cmp_palettes`)."""
+    return cmp_palettes(c0, c1).view(np.uint8).reshape(c0.shape + (4, 4))[..., 0:3].astype(np.float32)
+
+def _cmp_bounding_box(colors: np.ndarray, mask: np.ndarray):
+    low = np.where(mask[..., None], colors, np.inf).min(axis=1)
+    high = np.where(mask[..., None], colors, -np.inf).max(axis=1)
+    low = np.where(np.isfinite(low), low, 0)
+    high = np.where(np.isfinite(high), high, 0)
+    inset = (high - low) / 16
+    return high - inset, low + inset
+
+def _cmp_principal_axis(colors: np.ndarray, mask: np.ndarray):
+    weights = mask.astype(np.float32)
+    count = np.maximum(weights.sum(axis=1), 1)[:, None]
+    mean = (colors * weights[..., None]).sum(axis=1) / count
+    centered = (colors - mean[:, None]) * weights[..., None]
+    covariance = np.einsum("bpi,bpj->bij", centered, centered)
+    # Power iteration, starting from the luminance direction
+    axis = np.broadcast_to(np.array([0.58, 0.58, 0.58], dtype=np.float32), mean.shape)
+    for _ in range(8):
+        axis = np.einsum("bij,bj->bi", covariance, axis)
+        norm = np.linalg.norm(axis, axis=1, keepdims=True)
+        axis = np.where(norm > 1e-6, axis / np.maximum(norm, 1e-6), 0)
+    projection = np.einsum("bpi,bi->bp", colors - mean[:, None], axis)
+    high = np.where(mask, projection, -np.inf).max(axis=1)
+    low = np.where(mask, projection, np.inf).min(axis=1)
+    high = np.where(np.isfinite(high), high, 0)[:, None]
+    low = np.where(np.isfinite(low), low, 0)[:, None]
+    return mean + high * axis, mean + low * axis
+
+def _cmp_fit(colors: np.ndarray, mask: np.ndarray, transparent: np.ndarray, e0: np.ndarray, e1: np.ndarray, palette_of: Callable[[np.ndarray, np.ndarray], np.ndarray] = dxt1_palette):
+    """Quantize a pair of endpoints per block and pick the palette index of every pixel.
+
+    Returns the two RGB565 colors, the `(blocks, 16)` indices and the squared error of every block,
+    measured on the palette the decoder builds (`palette_of`).
+    """
+    c0, c1 = _to_rgb565(e0), _to_rgb565(e1)
+    # Opaque blocks need c0 > c1 (4 colors), blocks with transparent pixels c0 <= c1 (3 colors + transparent)
+    hasalpha = transparent.any(axis=1)
+    swap = np.where(hasalpha, c0 > c1, c0 < c1)
+    c0, c1 = np.where(swap, c1, c0), np.where(swap, c0, c1)
+    palette = palette_of(c0, c1)
+    distances = np.stack([((colors - palette[:, i, None]) ** 2).sum(axis=-1) for i in range(4)], axis=-1)
+    # The 4th color of 3-color blocks is the transparent one
+    distances[..., 3] = np.where((c0 > c1)[:, None], distances[..., 3], np.inf)
+    indices = distances.argmin(axis=-1)
+    # c0 == c1 can only be read as a 3-color block, keep every opaque pixel on c0
+    indices = np.where((c0 == c1)[:, None] & ~transparent, 0, indices)
+    indices = np.where(transparent, 3, indices)
+    error = np.where(mask, np.take_along_axis(distances, indices[..., None], axis=-1)[..., 0], 0).sum(axis=1)
+    return c0, c1, indices, error
+
+def _cmp_least_squares(colors: np.ndarray, mask: np.ndarray, transparent: np.ndarray, indices: np.ndarray, e0: np.ndarray, e1: np.ndarray):
+    """Best endpoints for fixed palette indices (keeps the given endpoints where the system is singular)."""
+    hasalpha = transparent.any(axis=1)[:, None]
+    four = np.array([1, 0, 2 / 3, 1 / 3], dtype=np.float32)
+    three = np.array([1, 0, 1 / 2, 0], dtype=np.float32)
+    alpha = np.where(hasalpha, three[indices], four[indices]) * mask
+    beta = (1 - np.where(hasalpha, three[indices], four[indices])) * mask
+    aa, bb, ab = (alpha * alpha).sum(axis=1), (beta * beta).sum(axis=1), (alpha * beta).sum(axis=1)
+    ax = (alpha[..., None] * colors).sum(axis=1)
+    bx = (beta[..., None] * colors).sum(axis=1)
+    det = aa * bb - ab * ab
+    solvable = (np.abs(det) > 1e-6)[:, None]
+    det = np.where(solvable[:, 0], det, 1)[:, None]
+    new0 = (ax * bb[:, None] - bx * ab[:, None]) / det
+    new1 = (bx * aa[:, None] - ax * ab[:, None]) / det
+    return np.where(solvable, new0, e0), np.where(solvable, new1, e1)
+
+def fit_dxt1_blocks(pixels: np.ndarray, quality: str, alpha = True, palette_of: Callable[[np.ndarray, np.ndarray], np.ndarray] = dxt1_palette) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pick the two RGB565 endpoints and the `(blocks, 16)` palette indices of `(blocks, 16, 4)` RGBA pixels.
+
+    With alpha, blocks with pixels under `CMP_ALPHA_THRESHOLD` use the 3-color mode with those pixels
+    on index 3 (transparent). Without it, alpha is ignored and every block uses 4 colors. The
+    candidates are compared on the palette built by `palette_of`, the one of the decoder.
+    """
+    colors = pixels[..., 0:3].astype(np.float32)
+    transparent = pixels[..., 3] < CMP_ALPHA_THRESHOLD if alpha else np.zeros(pixels.shape[:2], dtype=bool)
+    mask = ~transparent
+
+    def keep_better(fit, candidate):
+        better = candidate[3] < fit[3]
+        return tuple(np.where(better[:, None] if part.ndim == 2 else better, new, part) for new, part in zip(candidate, fit))
+
+    fit = _cmp_fit(colors, mask, transparent, *_cmp_bounding_box(colors, mask), palette_of)
+    if quality != "fast":
+        fit = keep_better(fit, _cmp_fit(colors, mask, transparent, *_cmp_principal_axis(colors, mask), palette_of))
+    if quality == "best":
+        endpoints = (_from_rgb565(fit[0]), _from_rgb565(fit[1]))
+        indices = fit[2]
+        for _ in range(2):
+            endpoints = _cmp_least_squares(colors, mask, transparent, indices, *endpoints)
+            candidate = _cmp_fit(colors, mask, transparent, *endpoints, palette_of)
+            indices = candidate[2]
+            fit = keep_better(fit, candidate)
+
+    c0, c1, indices, _ = fit
+    return c0, c1, indices
+
+def _encode_cmp_blocks(pixels: np.ndarray, quality: str) -> np.ndarray:
+    """Compress `(blocks, 16, 4)` RGBA pixels into `(blocks, 8)` big-endian DXT1 blocks."""
+    c0, c1, indices = fit_dxt1_blocks(pixels, quality, palette_of=cmp_palette)
+    # 2-bit indices, first pixel in the most significant bits
+    shifts = np.arange(30, -1, -2, dtype=np.uint32)
+    bits = (indices.astype(np.uint32) << shifts).sum(axis=1, dtype=np.uint32)
+    blocks = np.empty((pixels.shape[0], 8), dtype=np.uint8)
+    blocks[:, 0:2] = c0.astype(">u2").view(np.uint8).reshape(-1, 2)
+    blocks[:, 2:4] = c1.astype(">u2").view(np.uint8).reshape(-1, 2)
+    blocks[:, 4:8] = bits.astype(">u4").view(np.uint8).reshape(-1, 4)
+    return blocks
+
+def encode_blocks(encode: Callable[[np.ndarray], np.ndarray], pixels: np.ndarray, block_bytes: int, threads: int, group = 1) -> np.ndarray:
+    """Run a block encoder over `(blocks, 16, 4)` pixels, returning the `(blocks, block_bytes)` output.
+
+    With more than one thread, runs of whole groups of blocks are spread across a thread pool (NumPy
+    releases the GIL for most of the work).
+    """
+    out = np.empty((pixels.shape[0], block_bytes), dtype=np.uint8)
+    threads = max(1, min(threads, pixels.shape[0] // group))
+    if threads == 1:
+        out[:] = encode(pixels)
+        return out
+    step = -(-pixels.shape[0] // (group * threads)) * group
+
+    def job(start: int) -> None:
+        out[start:start + step] = encode(pixels[start:start + step])
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for future in [pool.submit(job, start) for start in range(0, pixels.shape[0], step)]:
+            future.result()
+    return out
+
+def encode_cmp(image: Any, quality="normal", threads: Optional[int] = None) -> bytes:
+    """CMP: DXT1 (S3TC) compression, 8x8 macro-blocks of four 4x4 sub-blocks with big-endian fields.
+
+    `quality` is one of `CMP_QUALITIES`. Blocks with pixels under `CMP_ALPHA_THRESHOLD` alpha use
+    the 3-color mode, with those pixels transparent. Threads work like in `decode_cmp`.
+    """
+    if quality not in CMP_QUALITIES:
+        raise ValueError("Unknown CMP quality %r, expected one of %s" % (quality, ", ".join(CMP_QUALITIES)))
+    pixels = as_rgba(image)
+    height, width = pixels.shape[:2]
+    # (row, y1, y0, col, x1, x0) -> (row, col, y1, x1, y0, x0)
+    macro = tile(pixels, 8, 8, edge=True).reshape(-1, 2, 4, 2, 4, 4).transpose(0, 1, 3, 2, 4, 5).reshape(-1, 16, 4)
+
+    if threads is None:
+        threads = min(4, os.cpu_count() or 1) if width * height >= CMP_THREADS_MIN_PIXELS else 1
+    # Whole macro-blocks (4 sub-blocks) per job
+    return encode_blocks(lambda blocks: _encode_cmp_blocks(blocks, quality), macro, 8, threads, group=4).tobytes()
+
+# TPL texture format ID -> encoder
+ENCODERS: Dict[int, Callable[..., bytes]] = {
+    0: encode_i4,
+    1: encode_i8,
+    2: encode_ia4,
+    3: encode_ia8,
+    4: encode_rgb565,
+    5: encode_rgb5a3,
+    6: encode_rgba8,
+    14: encode_cmp,
+}
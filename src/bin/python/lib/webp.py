@@ -0,0 +1,76 @@
+"""
+WEBP data URL builders shared by the "webp_data_url*" scripts and their batch mode.
+
+Each function returns the data URL instead of printing it, so a single process can build many of
+them (see "webp_data_url_batch.py"). The texture modules (and NumPy) are only imported by the
+functions that need them, plain images only pay for Pillow.
+"""
+
+import base64
+from io import BytesIO
+from typing import Optional
+
+from PIL import Image
+
+from .resize import letterbox
+
+DDS_MAGIC = b"DDS "
+
+def to_webp(image: Image.Image, quality: int = 100) -> bytes:
+    """Encodes image as a WEBP file."""
+    with BytesIO() as output:
+        image.save(output, format="WEBP", quality=quality)
+        return output.getvalue()
+
+def webp_to_data_url(webp: bytes) -> str:
+    return f"data:image/webp;base64,{base64.b64encode(webp).decode('utf-8')}"
+
+def to_data_url(image: Image.Image, quality: int = 100) -> str:
+    """Encodes image as WEBP into a Base64 data URL."""
+    return webp_to_data_url(to_webp(image, quality))
+
+def image_file_data_url(src_path: str, width: int = 256, height: int = 256, interpolation: str = "BILINEAR", quality: int = 100) -> str:
+    """Any image Pillow reads, letterboxed into a black square and scaled down to width x height."""
+    with Image.open(src_path) as img:
+        if img.width == width and img.height == height:
+            return to_data_url(img.convert("RGB") if img.mode != "RGB" else img, quality)
+        return to_data_url(letterbox(img, width, height, interpolation), quality)
+
+def png_wii_data_url(src_path: str, header: Optional[bytes] = None, quality: int = 100, size: int = 0) -> str:
+    """A png_wii texture. With size, only the smallest mip level at least this big is decoded, then scaled to fit."""
+    from .tpl import PNG_WII
+    tpl_file = PNG_WII(src_path, header).tpl.getFile()
+    if size:
+        image = tpl_file.toImage(tpl_file.level_for_size(size)).convert("RGB")
+        image.thumbnail((size, size), resample=Image.Resampling.BILINEAR)
+    else:
+        image = tpl_file.toImage().convert("RGB")
+    return to_data_url(image, quality)
+
+def png_xbox_ps3_data_url(src_path: str, quality: int = 100, size: int = 0) -> str:
+    """A png_xbox/png_ps3 texture, with size working like in `png_wii_data_url`."""
+    from .dds import HMXTexture
+    with HMXTexture(src_path) as texture:
+        if size:
+            image = texture.toImage(texture.level_for_size(size)).convert("RGB")
+            image.thumbnail((size, size), resample=Image.Resampling.BILINEAR)
+        else:
+            image = texture.toImage().convert("RGB")
+        return to_data_url(image, quality)
+
+def image_buffer_webp(image_data: bytes, size: int = 0) -> bytes:
+    """The bytes of an image file as a WEBP file, scaled down to fit size when given. DDS textures only decode the needed mip level."""
+    if size and image_data[0:4] == DDS_MAGIC:
+        from .dds import DDSFile
+        dds = DDSFile(image_data)
+        image = dds.toImage(dds.level_for_size(size))
+    else:
+        image = Image.open(BytesIO(image_data))
+
+    if size:
+        image.thumbnail((size, size), resample=Image.Resampling.BILINEAR)
+    return to_webp(image)
+
+def image_buffer_data_url(image_data: bytes, size: int = 0) -> str:
+    """`image_buffer_webp` as a data URL."""
+    return webp_to_data_url(image_buffer_webp(image_data, size))
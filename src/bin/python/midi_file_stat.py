@@ -1,5 +1,5 @@
 import argparse, json
-from mido import MidiFile, MetaMessage
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
 
 def midi_file_stat(file_path: str) -> dict:
   """
@@ -10,6 +10,8 @@ def midi_file_stat(file_path: str) -> dict:
   file_path : str
     The path of the MIDI file.
   """
+  # Imported after the arguments are parsed
+  from mido import MidiFile, MetaMessage
   try:
     with MidiFile(file_path) as midi:
       status = {
@@ -35,6 +37,8 @@ if __name__ == '__main__':
   parser = argparse.ArgumentParser(description='RBToolsJS: MIDI File Stat CLI', epilog='By Ruggery Iury Corrêa.')
   parser.add_argument('file_path', help='The path of the MIDI file', type=str)
 
+  add_profiling_arguments(parser)
   arg = parser.parse_args()
-  
-  midi_file_stat(arg.file_path)
+
+  with profiled('midi_file_stat', arg):
+    midi_file_stat(arg.file_path)
@@ -1,11 +1,27 @@
-import argparse, os
+import argparse, os, shutil
 from lib.mogg import decrypt_mogg
+from lib.progress import Progress, add_arguments as add_progress_arguments, open_channel
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
 
 def mogg_decrypt(enc_path: str, dec_path: str):
-  enc_in = open(enc_path, "rb")
-  dec_out = open(dec_path, "wb")
-  
-  xbox_green_failed = decrypt_mogg(True, False, enc_in, dec_out)
+  with Progress('mogg_decrypt', os.path.getsize(enc_path), 1) as progress:
+    with open(enc_path, "rb") as f:
+      version = f.read(1)
+    if version == bytes([10]):
+      # Version 10 MOGGs aren't encrypted: the file is already the decrypted one
+      shutil.copyfile(enc_path, dec_path)
+      progress.advance(os.path.getsize(enc_path))
+      progress.file(dec_path, os.path.getsize(dec_path))
+      return
+
+    enc_in = open(enc_path, "rb")
+    dec_out = open(dec_path, "wb")
+    xbox_green_failed = decrypt_mogg(True, False, enc_in, dec_out, progress.advance)
+    enc_in.close()
+    if xbox_green_failed:
+      # Nothing was written: the "end" event and the exit code must say so
+      raise ValueError(f'{enc_path}: the MOGG file could not be decrypted')
+    progress.file(dec_path, os.path.getsize(dec_path))
   # Might need PS3 and red keys implementation
   return
   
@@ -15,6 +31,10 @@ if __name__ == '__main__':
   parser.add_argument('enc_path', help='The encrypted MOGG file path', type=str)
   parser.add_argument('dec_path', help='The decrypted MOGG file path', type=str)
 
+  add_progress_arguments(parser)
+  add_profiling_arguments(parser)
   arg = parser.parse_args()
-  
-  mogg_decrypt(arg.enc_path, arg.dec_path)
\ No newline at end of file
+  open_channel(arg)
+
+  with profiled('mogg_decrypt', arg, arg.dec_path):
+    mogg_decrypt(arg.enc_path, arg.dec_path)
\ No newline at end of file
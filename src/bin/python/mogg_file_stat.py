@@ -1,6 +1,6 @@
 import argparse, tempfile, os, json
 from lib.mogg import decrypt_mogg_bytes
-from pydub.utils import mediainfo
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
 
 def format_duration(duration: str) -> str:
   total_seconds = (duration // 1000)
@@ -17,6 +17,8 @@ def format_duration(duration: str) -> str:
   
 
 def mogg_file_stat(file_path: str) -> dict:
+  # pydub is imported after the arguments are parsed
+  from pydub.utils import mediainfo
   fin = open(file_path, "rb").read()
   version = fin[0]
   ogg_bytes = decrypt_mogg_bytes(True, False, fin)
@@ -53,7 +55,9 @@ if __name__ == '__main__':
   parser = argparse.ArgumentParser(description='RBToolsJS: MOGG File Stat CLI', epilog='By Ruggery Iury Corrêa.')
   parser.add_argument('file_path', help='The path of the MOGG file', type=str)
 
+  add_profiling_arguments(parser)
   arg = parser.parse_args()
-  
-  mogg_file_stat(arg.file_path)
+
+  with profiled('mogg_file_stat', arg):
+    mogg_file_stat(arg.file_path)
   
\ No newline at end of file
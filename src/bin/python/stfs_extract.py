@@ -1,5 +1,7 @@
 import argparse, os
 from lib.stfs import STFS
+from lib.progress import Progress, add_arguments as add_progress_arguments, open_channel
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
 
 def stfs_extract(stfs_file_path: str, dest_path: str) -> str:
   """
@@ -28,19 +30,23 @@ def stfs_extract(stfs_file_path: str, dest_path: str) -> str:
           pass
         
   # Writing files
-  for filename in con.allfiles:
-    if filename == "/songs/":
-      continue
-    if not con.allfiles[filename].isdirectory:
-      file_bytes = con.read_file(con.allfiles[filename])
+  files = [filename for filename in con.allfiles if filename != "/songs/" and not con.allfiles[filename].isdirectory]
+  with Progress('stfs_extract', sum(con.allfiles[filename].size for filename in files), len(files)) as progress:
+    for filename in files:
+      file_bytes = con.read_file(con.allfiles[filename], progress=progress.advance)
       new_file_path = f"{dest_path}{filename}"
       open(new_file_path, "wb").write(file_bytes)
+      progress.file(new_file_path, len(file_bytes))
   
 if __name__ == '__main__':
   parser = argparse.ArgumentParser(description='RBToolsJS: CON Extractor CLI', epilog='By Ruggery Iury Corrêa.')
   parser.add_argument('stfs_file_path', help='The RB3CON file you want to extract and print its contents', type=str)
   parser.add_argument('dest_path', help='The folder path where you want the files to be extracted to', type=str)
 
+  add_progress_arguments(parser)
+  add_profiling_arguments(parser)
   arg = parser.parse_args()
-  
-  stfs_extract(arg.stfs_file_path, arg.dest_path)
\ No newline at end of file
+  open_channel(arg)
+
+  with profiled('stfs_extract', arg, arg.dest_path):
+    stfs_extract(arg.stfs_file_path, arg.dest_path)
\ No newline at end of file
@@ -1,5 +1,6 @@
 import argparse, json
 from lib.stfs import STFS
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
 
 def stfs_file_stat(file_path: str) -> dict:
   """
@@ -64,6 +65,8 @@ if __name__ == '__main__':
   parser = argparse.ArgumentParser(description='RBToolsJS: CON File Stat CLI', epilog='By Ruggery Iury Corrêa.')
   parser.add_argument('file_path', help='The RB3CON file you want to extract and print its contents', type=str)
 
+  add_profiling_arguments(parser)
   arg = parser.parse_args()
-  
-  stfs_file_stat(arg.file_path)
\ No newline at end of file
+
+  with profiled('stfs_file_stat', arg):
+    stfs_file_stat(arg.file_path)
\ No newline at end of file
@@ -0,0 +1,45 @@
+import argparse, json
+from lib.songs import song_assets
+from lib.progress import Progress, add_arguments as add_progress_arguments, open_channel
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
+
+def stfs_song_assets(file_path: str, art: bool = True, audio: bool = True, art_size: int = 256) -> list:
+  """
+  Reads the songs of a CON file with their album art and MOGG stats, without extracting anything to disk, and prints one JSON record per song.
+
+  Parameters
+  ----------
+  file_path : str
+    The path of the CON file.
+  art : bool, optional
+    Decodes the album art of each song into a WEBP DataURL (Default is `True`).
+  audio : bool, optional
+    Decrypts the MOGG file of each song in memory and reads its stats (Default is `True`).
+  art_size : int, optional
+    Scales the album art down to fit a square of this size, decoding only the mip level needed. `0` keeps the full size (Default is `256`).
+  """
+  songs = []
+  with Progress('stfs_song_assets') as progress:
+    read = 0
+    for record in song_assets(file_path, art, audio, art_size, progress=progress.advance):
+      print(json.dumps(record, ensure_ascii=False), flush=True)
+      # The bytes read from the container for this song
+      progress.file(record['songname'] or '', progress.done - read)
+      read = progress.done
+      songs.append(record)
+  return songs
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='RBToolsJS: CON Song Assets CLI', epilog='By Ruggery Iury Corrêa.')
+  parser.add_argument('file_path', help='The RB3CON file you want to read the songs of', type=str)
+  parser.add_argument('--no-art', help='Skip the album art of the songs', action='store_true')
+  parser.add_argument('--no-audio', help='Skip the MOGG stats of the songs', action='store_true')
+  parser.add_argument('-s', '--art-size', help='Scale the album art down to fit a square of this size, 0 keeps the full size', default=256, type=int, required=False)
+
+  add_progress_arguments(parser)
+  add_profiling_arguments(parser)
+  arg = parser.parse_args()
+  open_channel(arg)
+
+  with profiled('stfs_song_assets', arg):
+    stfs_song_assets(arg.file_path, not arg.no_art, not arg.no_audio, arg.art_size)
@@ -1,35 +1,34 @@
 import argparse
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
 
-def rbart_byte_swapper(pathIn: str, pathOut: str) -> None:
-    fin = open(pathIn, "rb")
-    fout = open(pathOut, "wb")
+# Bytes read per chunk, kept even so 16-bit words never straddle two chunks
+CHUNK_SIZE = 1024 * 1024
 
-    size = fin.seek(0,2)
+def rbart_bytes_swapper(data: bytes) -> bytes:
+    """In-memory version of `rbart_byte_swapper`: keeps the 32-byte header and swaps every 16-bit word after it."""
+    # NumPy is imported after the arguments are parsed
+    from lib.dds import swap16
+    return bytes(data[:32]) + swap16(data[32:]).tobytes()
 
-    fin.seek(0,0)
-    fout.seek(0,0)
+def rbart_byte_swapper(pathIn: str, pathOut: str, chunk_size: int = CHUNK_SIZE) -> None:
+    from lib.dds import swap16
+    with open(pathIn, "rb") as fin, open(pathOut, "wb") as fout:
+        fout.write(fin.read(32))
 
-    buffer = fin.read(32)
-    fout.write(buffer)
-
-    # Shuffles bytes after header.
-    while (fin.tell() < size):
-        buf1 = fin.read(1)
-        buf2 = fin.read(1)
-
-        fout.write(buf2)
-        fout.write(buf1)
-
-    fin.seek(0,0)
-    fin.close()
-    fout.close()
-    pass
+        # Shuffles bytes after header, chunk by chunk.
+        while True:
+            chunk = fin.read(chunk_size)
+            if not chunk:
+                break
+            fout.write(swap16(chunk))
 
 if __name__ == '__main__':
   parser = argparse.ArgumentParser(description='RBToolsJS: Rock Band Art File Byte Swapper', epilog='By Ruggery Iury Corrêa.')
   parser.add_argument('src_path', help='The path to the texture file you want to be byte-swapped', type=str)
   parser.add_argument('dest_path', help='The path to the The newly created byte-swapped texture file', type=str)
   
+  add_profiling_arguments(parser)
   arg = parser.parse_args()
-    
-  rbart_byte_swapper(arg.src_path, arg.dest_path)
\ No newline at end of file
+
+  with profiled('swap_rb_art_bytes', arg, arg.dest_path):
+    rbart_byte_swapper(arg.src_path, arg.dest_path)
@@ -0,0 +1,33 @@
+import argparse, json
+from lib.thumbnail_cache import default_cache
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
+
+def thumbnail_cache(clear: bool = False) -> dict:
+  """
+  Prints the entries and bytes on disk of the thumbnail cache, as JSON, optionally clearing it first.
+
+  Parameters
+  ----------
+  clear : bool, optional
+    Deletes every entry of the cache before printing (Default is `False`).
+  """
+  cache = default_cache()
+  if cache is None:
+    status = {'enabled': False}
+  else:
+    status = {'enabled': True, 'path': cache.path, 'maxBytes': cache.max_bytes}
+    if clear:
+      status['cleared'] = cache.clear()
+    status.update(cache.disk_usage())
+  print(json.dumps(status))
+  return status
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='RBToolsJS: Thumbnail Cache Status', epilog='By Ruggery Iury Corrêa.')
+  parser.add_argument('-c', '--clear', help='Deletes every cached thumbnail', action='store_true')
+
+  add_profiling_arguments(parser)
+  arg = parser.parse_args()
+
+  with profiled('thumbnail_cache', arg):
+    thumbnail_cache(arg.clear)
@@ -1,37 +1,16 @@
-import argparse, base64
-from PIL import Image
-from io import BytesIO
+import argparse
+from lib.thumbnail_cache import cached_data_url
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
 
 def webp_data_url(src_path: str, width: int = 256, height: int = 256, interpolation: str = 'BILINEAR', quality: int = 100) -> str:
-  try:
-    with Image.open(src_path) as img:
-      if img.mode != 'RGB':
-        img = img.convert('RGB')
+  def create() -> str:
+    # Pillow is only imported on a cache miss
+    from lib.webp import image_file_data_url
+    return image_file_data_url(src_path, width, height, interpolation, quality)
 
-      if (img.width == width and img.height == height):
-        with BytesIO() as output:
-          img.save(output, format="WEBP", quality=quality)
-          webp_data = output.getvalue()
-          base64_data = base64.b64encode(webp_data).decode('utf-8')
-          data_url = f"data:image/webp;base64,{base64_data}"
-          print(data_url)
-          return data_url
-      else:
-        x, y = img.size
-        size = max(width, x, y)
-        new_im = Image.new('RGB', (size, size), (0,0,0))
-        new_im.paste(img, (int((size - x) / 2), int((size - y) / 2)))
-        new_im.thumbnail((width,height), resample=Image.Resampling[interpolation])
-
-        with BytesIO() as output:
-          new_im.save(output, format="WEBP", quality=quality)
-          webp_data = output.getvalue()
-          base64_data = base64.b64encode(webp_data).decode('utf-8')
-          data_url = f"data:image/webp;base64,{base64_data}"
-          print(data_url)
-          return data_url
-  except Exception as e:
-    raise e
+  data_url = cached_data_url(src_path, 'webp_data_url', {'width': width, 'height': height, 'interpolation': interpolation, 'quality': quality}, create)
+  print(data_url)
+  return data_url
   
 if __name__ == '__main__':
   parser = argparse.ArgumentParser( description='RBToolsJS: WEBP DataURL Creator', epilog='By Ruggery Iury Corrêa.')
@@ -41,6 +20,8 @@ if __name__ == '__main__':
   parser.add_argument('-i', '--interpolation', help='The interpolation method used when resizing the image', default='BILINEAR', type=str, required=False)
   parser.add_argument('-q', '--quality', help='The quality value of the output image. Only used on lossy format, such as JPEG and WEBP', default=100, type=int, required=False)
 
+  add_profiling_arguments(parser)
   arg = parser.parse_args()
-  
-  webp_data_url(arg.src_path, arg.width, arg.height, arg.interpolation, arg.quality)
\ No newline at end of file
+
+  with profiled('webp_data_url', arg):
+    webp_data_url(arg.src_path, arg.width, arg.height, arg.interpolation, arg.quality)
\ No newline at end of file
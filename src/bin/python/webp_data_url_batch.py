@@ -0,0 +1,133 @@
+import argparse, base64, json, os, sys, threading
+from concurrent.futures import ProcessPoolExecutor
+from lib.thumbnail_cache import cached_bytes, cached_data_url
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
+
+def run_job(job: dict) -> str:
+  """
+  Builds the WEBP data URL of a single batch job, picking the converter from the job's fields.
+
+  Parameters
+  ----------
+  job : dict
+    `buf` (a Base64-encoded image file buffer, with an optional `size`), or `src` (the path of an image or texture file).
+    PNG_WII, PNG_XBOX and PNG_PS3 textures take an optional `size`, other images `width`, `height`, `interpolation` and `quality`.
+  """
+  # Same cache entries as the single-job scripts, Pillow is only imported on a cache miss
+  if 'buf' in job:
+    image_data = base64.b64decode(job['buf'])
+    size = job.get('size', 0)
+    def create() -> bytes:
+      from lib.webp import image_buffer_webp
+      return image_buffer_webp(image_data, size)
+    webp = cached_bytes(image_data, 'img_buffer_to_webp', {'size': size}, create)
+    return f"data:image/webp;base64,{base64.b64encode(webp).decode('utf-8')}"
+
+  src_path = job['src']
+  ext = os.path.splitext(src_path)[1].lower()
+  if ext == '.png_wii':
+    size = job.get('size', 0)
+    def create() -> str:
+      from lib.webp import png_wii_data_url
+      return png_wii_data_url(src_path, size=size)
+    return cached_data_url(src_path, 'webp_data_url_pngwii', {'header': None, 'quality': 100, 'size': size}, create)
+  if ext in ('.png_xbox', '.png_ps3'):
+    size = job.get('size', 0)
+    def create() -> str:
+      from lib.webp import png_xbox_ps3_data_url
+      return png_xbox_ps3_data_url(src_path, size=size)
+    return cached_data_url(src_path, 'webp_data_url_pngxboxps3', {'quality': 100, 'size': size}, create)
+
+  params = {'width': job.get('width', 256), 'height': job.get('height', 256), 'interpolation': job.get('interpolation', 'BILINEAR'), 'quality': job.get('quality', 100)}
+  def create() -> str:
+    from lib.webp import image_file_data_url
+    return image_file_data_url(src_path, **params)
+  return cached_data_url(src_path, 'webp_data_url', params, create)
+
+def error_result(job_id, e: BaseException) -> dict:
+  return {'id': job_id, 'error': f'{type(e).__name__}: {e}'}
+
+def job_result(job: dict) -> dict:
+  try:
+    return {'id': job.get('id'), 'dataUrl': run_job(job)}
+  except Exception as e:
+    return error_result(job.get('id'), e)
+
+def parse_jobs(lines, write):
+  """The jobs of lines, writing an error result with a null ID for each line that isn't a JSON object."""
+  for line in lines:
+    if not line.strip():
+      continue
+    try:
+      job = json.loads(line)
+      if not isinstance(job, dict):
+        raise ValueError(f'a job must be a JSON object, got {type(job).__name__}')
+    except ValueError as e:
+      write(error_result(None, e))
+      continue
+    yield job
+
+def webp_data_url_batch(lines, workers: int = 0, output = sys.stdout) -> int:
+  """
+  Reads JSON-lines jobs and writes one `{"id", "dataUrl"}` line (`{"id", "error"}` on failure) per job, as soon as each one is done.
+
+  Results are written in the order they finish, not in the order of the jobs.
+
+  Parameters
+  ----------
+  lines : Iterable[str]
+    The jobs, one JSON object per line (see `run_job`). Blank lines are skipped, other lines that aren't a JSON object get an error result with a null `id`.
+  workers : int, optional
+    The number of worker processes, `0` uses one per CPU and `1` runs every job in this process (Default is `0`).
+  output : TextIO, optional
+    Where the results are written (Default is `sys.stdout`).
+
+  Returns
+  -------
+  int
+    The number of jobs that failed.
+  """
+  lock = threading.Lock()
+  failed = 0
+
+  def write(result: dict) -> None:
+    nonlocal failed
+    with lock:
+      failed += 'error' in result
+      output.write(json.dumps(result) + '\n')
+      output.flush()
+
+  jobs = parse_jobs(lines, write)
+  if workers == 1:
+    for job in jobs:
+      write(job_result(job))
+    return failed
+
+  def done(future, job_id) -> None:
+    # A broken pool or a job that can't be pickled fails the future instead of returning a result
+    try:
+      result = future.result()
+    except Exception as e:
+      result = error_result(job_id, e)
+    write(result)
+
+  with ProcessPoolExecutor(max_workers=workers or None) as pool:
+    # Jobs are submitted while stdin is still being read, results go out from the pool's callbacks
+    for job in jobs:
+      try:
+        future = pool.submit(job_result, job)
+      except Exception as e:
+        write(error_result(job.get('id'), e))
+        continue
+      future.add_done_callback(lambda future, job_id=job.get('id'): done(future, job_id))
+  return failed
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='RBToolsJS: WEBP DataURL Creator, batch mode (reads JSON-lines jobs from stdin)', epilog='By Ruggery Iury Corrêa.')
+  parser.add_argument('-w', '--workers', help='The number of worker processes (0 uses one per CPU, 1 runs the jobs without a pool)', default=0, type=int, required=False)
+
+  add_profiling_arguments(parser)
+  arg = parser.parse_args()
+
+  with profiled('webp_data_url_batch', arg):
+    webp_data_url_batch(sys.stdin, arg.workers)
@@ -1,23 +1,40 @@
 import argparse, base64
-from io import BytesIO
-from lib.tpl import PNG_WII
+from lib.thumbnail_cache import cached_data_url
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
 
-def webp_data_url_pngwii(src_path: str, header: bytes, quality: int = 100) -> str:
-  with BytesIO() as output:
-    image = PNG_WII(src_path, header).tpl.toImage()
-    image.save(output, format="WEBP", quality=quality)
-    webp_data = output.getvalue()
-    base64_data = base64.b64encode(webp_data).decode('utf-8')
-    data_url = f"data:image/webp;base64,{base64_data}"
-    print(data_url)
-    return data_url
+def webp_data_url_pngwii(src_path: str, header: bytes = None, quality: int = 100, size: int = 0) -> str:
+  """
+  Converts a PNG_WII texture file to DataURL in WEBP format.
+
+  Parameters
+  ----------
+  src_path : str
+    The path of the PNG_WII file.
+  header : bytes, optional
+    The TPL header used on the file. When not given, it's built from the size and format on the file's own header.
+  quality : int
+    The quality of the WEBP image.
+  size : int
+    When given, decodes only the smallest mip level that is at least this big and scales it down to fit a square of this size.
+  """
+  def create() -> str:
+    # Pillow and NumPy are only imported on a cache miss
+    from lib.webp import png_wii_data_url
+    return png_wii_data_url(src_path, header, quality, size)
+
+  data_url = cached_data_url(src_path, 'webp_data_url_pngwii', {'header': header.hex() if header else None, 'quality': quality, 'size': size}, create)
+  print(data_url)
+  return data_url
   
 if __name__ == '__main__':
   
   parser = argparse.ArgumentParser( description='RBToolsJS: WEBP DataURL Creator (for PNG_WII files)', epilog='By Ruggery Iury Corrêa.')
   parser.add_argument('src_path', help='The source file path to be converted', type=str)
-  parser.add_argument('-tpl', '--tpl_header', help='The TPL header used on the file.', type=str, required=False)
+  parser.add_argument('-tpl', '--tpl_header', help='The TPL header used on the file, Base64-encoded (read from the file if omitted).', type=str, required=False)
+  parser.add_argument('-s', '--size', help='Decode only the smallest mip level at least this big, for thumbnails', default=0, type=int, required=False)
 
+  add_profiling_arguments(parser)
   arg = parser.parse_args()
-  
-  webp_data_url_pngwii(arg.src_path, base64.b64decode(arg.tpl_header))
\ No newline at end of file
+
+  with profiled('webp_data_url_pngwii', arg):
+    webp_data_url_pngwii(arg.src_path, base64.b64decode(arg.tpl_header) if arg.tpl_header else None, size=arg.size)
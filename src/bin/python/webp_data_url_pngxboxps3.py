@@ -0,0 +1,37 @@
+import argparse
+from lib.thumbnail_cache import cached_data_url
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
+
+def webp_data_url_pngxboxps3(src_path: str, quality: int = 100, size: int = 0) -> str:
+  """
+  Converts a PNG_XBOX or PNG_PS3 texture file to DataURL in WEBP format, decoding the DDS data in this process.
+
+  Parameters
+  ----------
+  src_path : str
+    The path of the PNG_XBOX/PNG_PS3 file. PNG_XBOX files have their bytes swapped back while decoding.
+  quality : int
+    The quality of the WEBP image.
+  size : int
+    When given, decodes only the smallest mip level that is at least this big and scales it down to fit a square of this size.
+  """
+  def create() -> str:
+    # Pillow and NumPy are only imported on a cache miss
+    from lib.webp import png_xbox_ps3_data_url
+    return png_xbox_ps3_data_url(src_path, quality, size)
+
+  data_url = cached_data_url(src_path, 'webp_data_url_pngxboxps3', {'quality': quality, 'size': size}, create)
+  print(data_url)
+  return data_url
+
+if __name__ == '__main__':
+
+  parser = argparse.ArgumentParser( description='RBToolsJS: WEBP DataURL Creator (for PNG_XBOX and PNG_PS3 files)', epilog='By Ruggery Iury Corrêa.')
+  parser.add_argument('src_path', help='The source file path to be converted', type=str)
+  parser.add_argument('-s', '--size', help='Decode only the smallest mip level at least this big, for thumbnails', default=0, type=int, required=False)
+
+  add_profiling_arguments(parser)
+  arg = parser.parse_args()
+
+  with profiled('webp_data_url_pngxboxps3', arg):
+    webp_data_url_pngxboxps3(arg.src_path, size=arg.size)
@@ -0,0 +1,333 @@
+import argparse, base64, contextlib, importlib, inspect, io, json, os, signal, socket, sys, threading
+from concurrent.futures import ThreadPoolExecutor
+from lib.profiling import add_arguments as add_profiling_arguments, profiled
+from lib.shared_results import encode_result, result_output
+
+# Method name -> (script module, function). Scripts are imported on their first call, so the worker
+# starts without Pillow, pydub or mido, and each one is imported once for the life of the worker.
+OPERATIONS = {
+  'stfs_file_stat': ('stfs_file_stat', 'stfs_file_stat'),
+  'stfs_extract': ('stfs_extract', 'stfs_extract'),
+  'stfs_extract_all_files': ('stfs_extract_all_files', 'stfs_extract_all_files'),
+  'stfs_song_assets': ('stfs_song_assets', 'stfs_song_assets'),
+  'mogg_decrypt': ('mogg_decrypt', 'mogg_decrypt'),
+  'mogg_file_stat': ('mogg_file_stat', 'mogg_file_stat'),
+  'midi_file_stat': ('midi_file_stat', 'midi_file_stat'),
+  'img_file_stat': ('img_file_stat', 'img_file_stat'),
+  'image_converter': ('image_converter', 'image_converter'),
+  'buffer_converter': ('buffer_converter', 'buffer_converter'),
+  'webp_data_url': ('webp_data_url', 'webp_data_url'),
+  'webp_data_url_pngwii': ('webp_data_url_pngwii', 'webp_data_url_pngwii'),
+  'webp_data_url_pngxboxps3': ('webp_data_url_pngxboxps3', 'webp_data_url_pngxboxps3'),
+  'img_buffer_to_webp_data_url': ('img_buffer_to_webp_data_url', 'img_buffer_to_webp_data_url'),
+  'img_to_tex_xbox_ps3': ('img_to_tex_xbox_ps3', 'img_to_tex_xbox_ps3'),
+  'swap_rb_art_bytes': ('swap_rb_art_bytes', 'rbart_byte_swapper'),
+  'audio_to_mogg': ('audio_to_mogg', 'join_audio_files'),
+  # Functions of the in-process API returning bytes, best called with an "output" (see lib/shared_results.py)
+  'decrypt_mogg': ('lib.api', 'decrypt_mogg'),
+  'decode_texture': ('lib.api', 'decode_texture_rgba'),
+  'extract_stfs_file': ('lib.api', 'extract_stfs_file'),
+  'release_shared_memory': ('lib.shared_results', 'release_shared_memory'),
+}
+
+# Operation classes of the pool (`--pool`): CPU-bound texture and audio work, and the I/O-bound
+# STFS extraction and file stats. Each one gets its own warm processes, with the modules of its
+# methods and these imports done.
+OPERATION_CLASSES = {
+  'texture': ('image_converter', 'buffer_converter', 'webp_data_url', 'webp_data_url_pngwii', 'webp_data_url_pngxboxps3', 'img_buffer_to_webp_data_url', 'img_to_tex_xbox_ps3', 'swap_rb_art_bytes', 'decode_texture'),
+  'audio': ('mogg_decrypt', 'mogg_file_stat', 'audio_to_mogg', 'decrypt_mogg'),
+  'io': ('stfs_file_stat', 'stfs_extract', 'stfs_extract_all_files', 'stfs_song_assets', 'midi_file_stat', 'img_file_stat', 'extract_stfs_file', 'release_shared_memory'),
+}
+PRELOAD = {
+  'texture': ('numpy', 'PIL.Image', 'lib.webp', 'lib.tpl', 'lib.dds', 'lib.headers'),
+  'audio': ('lib.mogg', 'pydub'),
+  'io': ('lib.stfs', 'mido', 'PIL.Image'),
+}
+METHOD_CLASSES = {method: name for name, methods in OPERATION_CLASSES.items() for method in methods}
+
+# Parameters that are bytes on the Python side, sent Base64-encoded
+BYTES_PARAMS = {
+  'webp_data_url_pngwii': ('header',),
+}
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+OPERATION_ERROR = -32000
+
+class ThreadStdout(io.TextIOBase):
+  """
+  Stands in for `sys.stdout` while the worker runs, since the scripts print their results: what each operation prints goes to a buffer of the thread running it, and is sent back in the response. Prints outside of an operation go to stderr, so they never get mixed with the responses.
+  """
+  def __init__(self):
+    self._local = threading.local()
+
+  def writable(self) -> bool:
+    return True
+
+  def write(self, text: str) -> int:
+    buffer = getattr(self._local, 'buffer', None)
+    if buffer is None:
+      return sys.stderr.write(text)
+    return buffer.write(text)
+
+  def flush(self) -> None:
+    sys.stderr.flush()
+
+  @contextlib.contextmanager
+  def capture(self):
+    self._local.buffer = io.StringIO()
+    try:
+      yield self._local.buffer
+    finally:
+      self._local.buffer = None
+
+def thread_stdout() -> ThreadStdout:
+  # Also called by respond(), for the processes of the pool, which don't go through worker()
+  if not isinstance(sys.stdout, ThreadStdout):
+    sys.stdout = ThreadStdout()
+  return sys.stdout
+
+def error_response(request_id, code: int, message: str) -> dict:
+  return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+def operation(method: str):
+  module_name, function_name = OPERATIONS[method]
+  return getattr(importlib.import_module(module_name), function_name)
+
+def respond(request: dict) -> dict:
+  """
+  Runs the operation of a request and returns its JSON-RPC response. The result is an object with the `value` returned by the operation and the `stdout` text it printed, as the script would have printed it.
+
+  Parameters
+  ----------
+  request : dict
+    A JSON-RPC request: `id`, `method` (a key of `OPERATIONS`) and `params`, an array of positional arguments or an object of keyword arguments. Its optional `output` says where the bytes values of the result are written, they're sent as Base64 otherwise (see `lib/shared_results.py`).
+  """
+  request_id = request.get('id')
+  method = request.get('method')
+  if method not in OPERATIONS:
+    return error_response(request_id, METHOD_NOT_FOUND, f'Unknown method: {method}')
+
+  params = request.get('params', {})
+  args, kwargs = (params, {}) if isinstance(params, list) else ([], dict(params))
+  for name in BYTES_PARAMS.get(method, ()):
+    if kwargs.get(name) is not None:
+      kwargs[name] = base64.b64decode(kwargs[name])
+
+  try:
+    function = operation(method)
+    inspect.signature(function).bind(*args, **kwargs)
+  except TypeError as e:
+    return error_response(request_id, INVALID_PARAMS, str(e))
+  except Exception as e:
+    return error_response(request_id, OPERATION_ERROR, f'{type(e).__name__}: {e}')
+
+  try:
+    results = result_output(request.get('output'))
+  except (OSError, ValueError) as e:
+    return error_response(request_id, INVALID_REQUEST, f'Invalid output: {e}')
+
+  try:
+    with thread_stdout().capture() as output:
+      try:
+        value = function(*args, **kwargs)
+      except BaseException as e:
+        return error_response(request_id, OPERATION_ERROR, f'{type(e).__name__}: {e}')
+    try:
+      value = encode_result(value, results)
+    except BaseException as e:
+      results.discard()
+      return error_response(request_id, OPERATION_ERROR, f'{type(e).__name__}: {e}')
+  finally:
+    results.close()
+  return {'jsonrpc': '2.0', 'id': request_id, 'result': {'value': value, 'stdout': output.getvalue()}}
+
+def operation_class(request: dict) -> str:
+  # Unknown methods are answered with an error by respond(), on any class
+  return METHOD_CLASSES.get(request.get('method'), 'io')
+
+def pool_classes(workers: int = 0, max_jobs: int = 0, max_rss: int = 0, config: dict = None) -> list:
+  """
+  The operation classes of the pool: `workers` processes for the texture class, half as many for the audio class, and one process running four jobs at once for the I/O class. `config` overrides any of them, by class name: `{"io": {"processes": 2, "threads": 8, "maxJobs": 500, "maxRssMB": 512}}`.
+  """
+  from lib.pool import OperationClass
+  cpus = workers or os.cpu_count() or 1
+  defaults = {'texture': (cpus, 1), 'audio': (max(1, cpus // 2), 1), 'io': (1, 4)}
+  classes = []
+  for name, (processes, threads) in defaults.items():
+    options = (config or {}).get(name, {})
+    classes.append(OperationClass(
+      name,
+      processes=options.get('processes', processes),
+      threads=options.get('threads', threads),
+      preload=PRELOAD[name] + tuple(OPERATIONS[method][0] for method in OPERATION_CLASSES[name]),
+      max_jobs=options.get('maxJobs', max_jobs),
+      max_rss=options.get('maxRssMB', max_rss) * 1024 * 1024,
+    ))
+  return classes
+
+def serve(lines, write, submit, stats=None, instrumentation=None) -> None:
+  """
+  Answers the JSON-RPC requests of lines (one per line), each one as soon as it is done, and returns when all of them are answered.
+
+  `submit(request)` returns a future of the response of a request. `ping`, `methods`, `stats` (the result of `stats()`, served with `--pool`) and `instrumentation` (the result of `instrumentation()`, served with `--instrument`) are answered right away, without going through it.
+  """
+  # Requests sent to the executor and not answered yet
+  pending = 0
+  answered = threading.Condition()
+
+  def send(response: dict) -> None:
+    write(json.dumps(response, ensure_ascii=False, default=str) + '\n')
+
+  def done(future, request_id) -> None:
+    nonlocal pending
+    # respond() catches the errors of the operations, this only happens when a process of the pool dies
+    error = future.exception()
+    send(error_response(request_id, OPERATION_ERROR, f'{type(error).__name__}: {error}') if error is not None else future.result())
+    with answered:
+      pending -= 1
+      answered.notify_all()
+
+  for line in lines:
+    if not line.strip():
+      continue
+    try:
+      request = json.loads(line)
+    except ValueError as e:
+      send(error_response(None, PARSE_ERROR, f'Parse error: {e}'))
+      continue
+    if not isinstance(request, dict) or not isinstance(request.get('params', {}), (dict, list)):
+      send(error_response(None, INVALID_REQUEST, 'Invalid request'))
+      continue
+
+    if request.get('method') == 'ping':
+      send({'jsonrpc': '2.0', 'id': request.get('id'), 'result': 'pong'})
+    elif request.get('method') == 'methods':
+      send({'jsonrpc': '2.0', 'id': request.get('id'), 'result': sorted(OPERATIONS)})
+    elif request.get('method') == 'stats':
+      if stats is None:
+        send(error_response(request.get('id'), METHOD_NOT_FOUND, 'stats is only served by a worker started with --pool'))
+      else:
+        send({'jsonrpc': '2.0', 'id': request.get('id'), 'result': stats()})
+    elif request.get('method') == 'instrumentation':
+      if instrumentation is None:
+        send(error_response(request.get('id'), METHOD_NOT_FOUND, 'instrumentation is only served by a worker started with --instrument, on threads or with --pool'))
+      else:
+        send({'jsonrpc': '2.0', 'id': request.get('id'), 'result': instrumentation()})
+    else:
+      with answered:
+        pending += 1
+      future = submit(request)
+      future.add_done_callback(lambda future, request_id=request.get('id'): done(future, request_id))
+
+  with answered:
+    answered.wait_for(lambda: pending == 0)
+
+def worker(workers: int = 0, processes: bool = False, socket_path: str = None, pool: bool = False, max_jobs: int = 0, max_rss: int = 0, pool_config: str = None, instrumentation: str = None) -> None:
+  """
+  Serves every script of this folder as a JSON-RPC 2.0 method, over JSON-lines on stdin/stdout or on a Unix socket, running many requests at once.
+
+  Parameters
+  ----------
+  workers : int, optional
+    The number of operations that run at once, `0` uses one per CPU (Default is `0`).
+  processes : bool, optional
+    Runs the operations on a pool of processes instead of threads (Default is `False`).
+  socket_path : str, optional
+    The path of a Unix socket to listen on, each connection being served like stdin/stdout. When not given, requests are read from stdin until it's closed.
+  pool : bool, optional
+    Runs the operations on warm pre-started processes split by operation class (see `OPERATION_CLASSES`), each class with its own concurrency limit, and serves the `stats` method (Default is `False`).
+  max_jobs : int, optional
+    With `pool`, replaces a process after this many jobs, `0` never does (Default is `0`).
+  max_rss : int, optional
+    With `pool`, replaces a process once its resident memory is over this many megabytes, `0` never does (Default is `0`).
+  pool_config : str, optional
+    With `pool`, the path of a JSON file with the settings of each class, see `pool_classes()`.
+  instrumentation : str, optional
+    Turns on the counters and timers of `lib/instrument.py` and serves them with the `instrumentation` method: `"1"` does only that, any other value is also the path of a JSON file they're written to when the worker exits. Not served with `processes`.
+  """
+  if instrumentation:
+    # Read when the libraries are imported, by this process and the ones it starts
+    os.environ['RBTOOLS_INSTRUMENT'] = instrumentation
+  from lib import instrument
+  report = instrument.report if instrument.ENABLED else None
+
+  stdout = sys.stdout
+  thread_stdout()
+  lock = threading.Lock()
+
+  def write_stdout(line: str) -> None:
+    with lock:
+      stdout.write(line)
+      stdout.flush()
+
+  if pool:
+    # multiprocessing is only imported when used
+    from lib.pool import WorkerPool
+    config = None
+    if pool_config:
+      with open(pool_config, 'r', encoding='utf-8') as config_file:
+        config = json.load(config_file)
+    executor = WorkerPool(pool_classes(workers, max_jobs, max_rss, config), respond, operation_class)
+    submit, stats = executor.submit, executor.stats
+    if report:
+      # The counters live in the processes of the pool, which report them with their results
+      report = lambda: instrument.report(executor.instrumentation())
+      instrument.export_at_exit(executor.instrumentation)
+  else:
+    executor_type = ThreadPoolExecutor
+    if processes:
+      from concurrent.futures import ProcessPoolExecutor
+      executor_type = ProcessPoolExecutor
+      report = None
+    executor = executor_type(max_workers=workers or os.cpu_count())
+    submit, stats = (lambda request: executor.submit(respond, request)), None
+
+  with executor:
+    if socket_path is None:
+      serve(sys.stdin, write_stdout, submit, stats, report)
+      return
+
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+      def handle(self):
+        connection_lock = threading.Lock()
+
+        def write_socket(line: str) -> None:
+          with connection_lock:
+            self.wfile.write(line.encode('utf-8'))
+
+        serve((line.decode('utf-8') for line in self.rfile), write_socket, submit, stats, report)
+
+    if os.path.exists(socket_path):
+      os.unlink(socket_path)
+    # Turns SIGTERM into SystemExit, so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+      try:
+        write_stdout(json.dumps({'socket': socket_path}) + '\n')
+        server.serve_forever()
+      finally:
+        os.unlink(socket_path)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='RBToolsJS: Python Worker (serves every script as a JSON-RPC 2.0 method, one JSON request per line on stdin)', epilog='By Ruggery Iury Corrêa.')
+  parser.add_argument('-w', '--workers', help='The number of operations that run at once (0 uses one per CPU)', default=0, type=int, required=False)
+  parser.add_argument('-p', '--processes', help='Runs the operations on a pool of processes instead of threads', action='store_true')
+  parser.add_argument('-P', '--pool', help='Runs the operations on warm processes split by operation class (texture, audio, io), and serves the stats method', action='store_true')
+  parser.add_argument('--max-jobs', help='With --pool, replaces a process after this many jobs (0 never does)', default=0, type=int, required=False)
+  parser.add_argument('--max-rss', help='With --pool, replaces a process once its resident memory is over this many megabytes (0 never does)', default=0, type=int, required=False)
+  parser.add_argument('--pool-config', help='With --pool, a JSON file with the processes, threads, maxJobs and maxRssMB of each class', type=str, required=False)
+  parser.add_argument('-I', '--instrument', help='Turns on the hot path counters and timers and serves them with the instrumentation method, writing them to this JSON file on exit when a path is given', nargs='?', const='1', type=str, required=False)
+  if hasattr(socket, 'AF_UNIX'):
+    parser.add_argument('-u', '--socket', help='Listens on this Unix socket path instead of stdin/stdout', type=str, required=False)
+
+  add_profiling_arguments(parser)
+  arg = parser.parse_args()
+
+  with profiled('worker', arg):
+    worker(arg.workers, arg.processes, getattr(arg, 'socket', None), arg.pool, arg.max_jobs, arg.max_rss, arg.pool_config, arg.instrument)
@@ -35,8 +35,11 @@ export * from './lib/python/imgFileStat'
 export * from './lib/python/midiFileStat'
 export * from './lib/python/moggDecrypt'
 export * from './lib/python/moggFileStat'
+export * from './lib/python/pythonProgress'
+export * from './lib/python/pythonWorker'
 export * from './lib/python/stfsExtract'
 export * from './lib/python/stfsFileStat'
+export * from './lib/python/stfsSongAssets'
 export * from './lib/python/swapRBArtBytes'
 export * from './lib/texture/getDDSHeader'
 export * from './lib/texture/getTPLHeader'
@@ -2,8 +2,9 @@ import { execAsync, FilePath, type FilePathLikeTypes } from 'node-lib'
 import { pathLikeToString } from 'node-lib'
 import { PythonExecutionError, ValueError } from '../../errors'
 import { RBTools } from '../../index'
+import { execPythonWithProgress, type PythonProgressCallback } from './pythonProgress'
 
-export const audioToMOGG = async (audioFiles: FilePathLikeTypes[], destPath: FilePathLikeTypes, quality = 3) => {
+export const audioToMOGG = async (audioFiles: FilePathLikeTypes[], destPath: FilePathLikeTypes, quality = 3, onProgress?: PythonProgressCallback) => {
   const moduleName = 'audio_to_mogg.py'
   const pyPath = FilePath.of(RBTools.python.path, moduleName)
   const dest = FilePath.of(pathLikeToString(destPath))
@@ -11,6 +12,12 @@ export const audioToMOGG = async (audioFiles: FilePathLikeTypes[], destPath: Fil
 
   if (quality < 1 || quality > 10) throw new ValueError(`MOGG quality must be between 1 and 10, got ${quality.toString()}`)
 
+  if (onProgress) {
+    const files = audioFiles.map((file) => FilePath.of(pathLikeToString(file)).path)
+    await execPythonWithProgress(moduleName, [...files, '-o', dest.path, '-q', quality.toString()], pyPath.root, onProgress)
+    return dest
+  }
+
   let audioFileInput = ''
   for (const file of audioFiles) {
     audioFileInput += `"${FilePath.of(pathLikeToString(file)).path}" `
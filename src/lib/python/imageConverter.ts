@@ -1,11 +1,26 @@
 import { spawn } from 'child_process'
+import type { Writable } from 'stream'
 import { execAsync, FilePath, type FilePathLikeTypes } from 'node-lib'
 import { pathLikeToString } from 'node-lib'
 import { setDefaultOptions } from 'set-default-options'
 import type { ConvertToWEBPDataURLOptions } from '../../core.exports'
 import { PythonExecutionError } from '../../errors'
 import { RBTools } from '../../index'
-import { type ArtworkInterpolationTypes, type ArtworkImageFormatTypes, getTPLHeader, imgFileStat } from '../../lib.exports'
+import { type ArtworkInterpolationTypes, type ArtworkImageFormatTypes, imgFileStat } from '../../lib.exports'
+
+/**
+ * Writes a buffer as a frame for the `--binary` mode of the Python scripts: its 4-byte big-endian length, then the buffer itself, without copying it.
+ * - - - -
+ * @param {Writable} stream The stream to write on, usually the `stdin` of a Python process.
+ * @param {Buffer} buf The buffer to be written.
+ * @returns {void}
+ */
+const writeFrame = (stream: Writable, buf: Buffer): void => {
+  const length = Buffer.alloc(4)
+  length.writeUInt32BE(buf.length)
+  stream.write(length)
+  stream.write(buf)
+}
 
 export interface ImageConverterOptions {
   /** The width of the converted image file. Default is `256`. */
@@ -42,8 +57,7 @@ export const bufferConverter = async (buf: Buffer, destPath: FilePathLikeTypes,
   return new Promise<FilePath>((resolve, reject) => {
     const moduleName = `buffer_converter.py`
     const pyPath = FilePath.of(RBTools.python.path, moduleName)
-    const process = spawn('python', [moduleName], { cwd: pyPath.root, windowsHide: true })
-    const base64Str = buf.toString('base64')
+    const process = spawn('python', [moduleName, '-b'], { cwd: pyPath.root, windowsHide: true })
 
     let stderrData = ''
 
@@ -61,7 +75,9 @@ export const bufferConverter = async (buf: Buffer, destPath: FilePathLikeTypes,
       }
     })
 
-    process.stdin.write(JSON.stringify({ buf: base64Str, dest: dest.changeFileExt(toFormat).path, width: opts.width, height: opts.height, interpolation: opts.interpolation.toUpperCase(), quality: opts.quality }))
+    // Binary mode: a frame with the options, then a frame with the raw image bytes
+    writeFrame(process.stdin, Buffer.from(JSON.stringify({ dest: dest.changeFileExt(toFormat).path, width: opts.width, height: opts.height, interpolation: opts.interpolation.toUpperCase(), quality: opts.quality })))
+    writeFrame(process.stdin, buf)
     process.stdin.end() // Close stdin to signal that the input is complete
   })
 }
@@ -142,20 +158,20 @@ export const webpDataURL = async (srcFile: FilePathLikeTypes, options?: ConvertT
  * Data URL `string` of the image.
  * - - - -
  * @param {Buffer} buf The buffer of the image file.
+ * @param {number | undefined} size `OPTIONAL` Scales the image down to fit this size. DDS textures only decode the smallest mip level that is at least this big.
  * @returns {Promise<string>}
  */
-export const imgBufferToWEBPDataURL = async (buf: Buffer): Promise<string> => {
+export const imgBufferToWEBPDataURL = async (buf: Buffer, size?: number): Promise<string> => {
   return new Promise<string>((resolve, reject) => {
     const moduleName = 'img_buffer_to_webp_data_url.py'
     const pyPath = FilePath.of(RBTools.python.path, moduleName)
-    const process = spawn('python', [moduleName], { cwd: pyPath.root, windowsHide: true })
-    const base64Str = buf.toString('base64')
+    const process = spawn('python', size ? [moduleName, '-b', '-s', size.toString()] : [moduleName, '-b'], { cwd: pyPath.root, windowsHide: true })
 
-    let stdoutData = ''
+    const stdoutChunks: Buffer[] = []
     let stderrData = ''
 
     process.stdout.on('data', (data: Buffer) => {
-      stdoutData += data.toString()
+      stdoutChunks.push(data)
     })
 
     process.stderr.on('data', (data: Buffer) => {
@@ -164,8 +180,10 @@ export const imgBufferToWEBPDataURL = async (buf: Buffer): Promise<string> => {
 
     process.on('close', (code) => {
       if (code === 0) {
-        const [dataurl] = stdoutData.split('\r\n')
-        resolve(dataurl)
+        // A single frame with the raw WEBP file bytes
+        const stdout = Buffer.concat(stdoutChunks)
+        const webp = stdout.subarray(4, 4 + stdout.readUInt32BE(0))
+        resolve(`data:image/webp;base64,${webp.toString('base64')}`)
       } else if (code === null) {
         reject(new PythonExecutionError(`Python script exited with unknown code: ${stderrData}`))
       } else {
@@ -173,8 +191,8 @@ export const imgBufferToWEBPDataURL = async (buf: Buffer): Promise<string> => {
       }
     })
 
-    // Write the base64 image to the Python process via stdin
-    process.stdin.write(base64Str)
+    // Write the raw image bytes to the Python process via stdin, as a single frame
+    writeFrame(process.stdin, buf)
     process.stdin.end() // Close stdin to signal that the input is complete
   })
 }
@@ -184,17 +202,142 @@ export const imgBufferToWEBPDataURL = async (buf: Buffer): Promise<string> => {
  * Data URL `string` of the texture file.
  * - - - -
  * @param {FilePathLikeTypes} srcFile The path of the PNG_WII file.
+ * @param {number | undefined} size `OPTIONAL` Decodes only the smallest mip level that is at least this big, scaled down to fit this size.
  * @returns {Promise<string>}
  */
-export const webpDataURLPNGWii = async (srcFile: FilePathLikeTypes): Promise<string> => {
+export const webpDataURLPNGWii = async (srcFile: FilePathLikeTypes, size?: number): Promise<string> => {
   const src = FilePath.of(pathLikeToString(srcFile))
-  const usedHeader = await getTPLHeader(src)
-  const base64Header = usedHeader.data.toString('base64')
   const moduleName = 'webp_data_url_pngwii.py'
   const pyPath = FilePath.of(RBTools.python.path, moduleName)
-  const command = `python ${moduleName} "${src.path}" -tpl "${base64Header}"`
+  // The TPL header is built by the script from the texture's own header
+  const command = `python ${moduleName} "${src.path}"${size ? ` -s ${size.toString()}` : ''}`
+  const { stdout, stderr } = await execAsync(command, { windowsHide: true, cwd: pyPath.root })
+  if (stderr) throw new PythonExecutionError(stderr)
+  // The script prints the Data URL on a single line
+  return stdout.trim()
+}
+
+/**
+ * Python script: Asynchronously converts an PNG_XBOX or PNG_PS3 texture file to a Base64-encoded
+ * Data URL `string` of the texture file, decoding the DDS data directly from the texture file.
+ * - - - -
+ * @param {FilePathLikeTypes} srcFile The path of the PNG_XBOX/PNG_PS3 file.
+ * @param {number | undefined} size `OPTIONAL` Decodes only the smallest mip level that is at least this big, scaled down to fit this size.
+ * @returns {Promise<string>}
+ */
+export const webpDataURLPNGXboxPs3 = async (srcFile: FilePathLikeTypes, size?: number): Promise<string> => {
+  const src = FilePath.of(pathLikeToString(srcFile))
+  const moduleName = 'webp_data_url_pngxboxps3.py'
+  const pyPath = FilePath.of(RBTools.python.path, moduleName)
+  const command = `python ${moduleName} "${src.path}"${size ? ` -s ${size.toString()}` : ''}`
   const { stdout, stderr } = await execAsync(command, { windowsHide: true, cwd: pyPath.root })
   if (stderr) throw new PythonExecutionError(stderr)
-  const [, dataurl] = stdout.split('\r\n')
-  return dataurl
+  // Line endings are \n on POSIX, \r\n on Windows
+  return stdout.trim()
+}
+
+/**
+ * Python script: Asynchronously converts an image file to a PNG_XBOX or PNG_PS3 texture file, compressing
+ * the DXT blocks and mip maps in Python (no NVIDIA Texture Tools or temporary files involved).
+ * - - - -
+ * @param {FilePathLikeTypes} srcFile The path of the image file.
+ * @param {FilePathLikeTypes} destPath The path of the new texture file. `.png_xbox` files have their bytes swapped.
+ * @param {number} textureSize `OPTIONAL` The width and height of the texture. Default is `256`.
+ * @param {boolean} DTX5 `OPTIONAL` Uses DTX5 encoding, DTX1 if `false`. Default is `true`.
+ * @param {ArtworkInterpolationTypes} interpolation `OPTIONAL` The interpolation used when scaling the image. Default is `'bilinear'`.
+ * @returns {Promise<FilePath>}
+ */
+export const imgToTexXboxPs3Python = async (srcFile: FilePathLikeTypes, destPath: FilePathLikeTypes, textureSize = 256, DTX5 = true, interpolation: ArtworkInterpolationTypes = 'bilinear'): Promise<FilePath> => {
+  const src = FilePath.of(pathLikeToString(srcFile))
+  const dest = FilePath.of(pathLikeToString(destPath))
+  const moduleName = 'img_to_tex_xbox_ps3.py'
+  const pyPath = FilePath.of(RBTools.python.path, moduleName)
+  const command = `python ${moduleName} "${src.path}" "${dest.path}" -x ${textureSize.toString()} -i ${interpolation.toUpperCase()}${DTX5 ? '' : ' -dxt1'}`
+  const { stderr } = await execAsync(command, { windowsHide: true, cwd: pyPath.root })
+  if (stderr) throw new PythonExecutionError(stderr)
+  return dest
+}
+
+export interface WEBPDataURLBatchJob {
+  /** An unique ID used to match the job with its result. */
+  id: string | number
+  /** The path of an image file, or a PNG_WII/PNG_XBOX/PNG_PS3 texture file. */
+  src?: FilePathLikeTypes
+  /** The buffer of an image file, used instead of `src`. */
+  buf?: Buffer
+  /** Scales textures and image buffers down to fit this size, decoding only the needed mip level of textures. */
+  size?: number
+  /** The width of the converted image files. Default is `256`. */
+  width?: number
+  /** The height of the converted image files. Default is `256`. */
+  height?: number
+  /** The interpolation of the converted image files in case of scaling. Default if `'bilinear'` (Bilinear). */
+  interpolation?: ArtworkInterpolationTypes
+  /** The quality ratio of the converted image files. Default is `100` (Lossless on WEBP). */
+  quality?: number
+}
+
+/**
+ * Python script: Asynchronously converts many image and texture files to Base64-encoded Data URL `string`s
+ * in a single Python process, spreading the jobs on a process pool.
+ * - - - -
+ * @param {WEBPDataURLBatchJob[]} jobs The files (or buffers) to convert.
+ * @param {(id: string | number, dataurl: string) => void} onResult `OPTIONAL` Called with each Data URL as soon as it's ready, in the order the jobs finish.
+ * @returns {Promise<Map<string | number, string>>} The Data URLs of all jobs, by their ID.
+ */
+export const webpDataURLBatch = async (jobs: WEBPDataURLBatchJob[], onResult?: (id: string | number, dataurl: string) => void): Promise<Map<string | number, string>> => {
+  return new Promise<Map<string | number, string>>((resolve, reject) => {
+    const moduleName = 'webp_data_url_batch.py'
+    const pyPath = FilePath.of(RBTools.python.path, moduleName)
+    const process = spawn('python', [moduleName], { cwd: pyPath.root, windowsHide: true })
+    const results = new Map<string | number, string>()
+    const errors: string[] = []
+
+    let stdoutData = ''
+    let stderrData = ''
+
+    process.stdout.on('data', (data: Buffer) => {
+      stdoutData += data.toString()
+      const lines = stdoutData.split('\n')
+      stdoutData = lines.pop() ?? ''
+      for (const line of lines) {
+        if (!line.trim()) continue
+        const result = JSON.parse(line) as { id: string | number; dataUrl?: string; error?: string }
+        if (result.dataUrl === undefined) {
+          errors.push(`Job ${result.id.toString()}: ${result.error ?? 'unknown error'}`)
+          continue
+        }
+        results.set(result.id, result.dataUrl)
+        if (onResult) onResult(result.id, result.dataUrl)
+      }
+    })
+
+    process.stderr.on('data', (data: Buffer) => {
+      stderrData += data.toString()
+    })
+
+    process.on('close', (code) => {
+      if (code === 0 && errors.length === 0) {
+        resolve(results)
+      } else if (code === 0) {
+        reject(new PythonExecutionError(`Python script failed on ${errors.length.toString()} job(s):\n${errors.join('\n')}`))
+      } else if (code === null) {
+        reject(new PythonExecutionError(`Python script exited with unknown code: ${stderrData}`))
+      } else {
+        reject(new PythonExecutionError(`Python script exited with code ${code.toString()}: ${stderrData}`))
+      }
+    })
+
+    // One JSON job per line, stdin is closed to signal that there are no more jobs
+    for (const { src, buf, interpolation, ...job } of jobs) {
+      const line = {
+        ...job,
+        ...(src !== undefined && { src: pathLikeToString(src) }),
+        ...(buf !== undefined && { buf: buf.toString('base64') }),
+        ...(interpolation !== undefined && { interpolation: interpolation.toUpperCase() }),
+      }
+      process.stdin.write(`${JSON.stringify(line)}\n`)
+    }
+    process.stdin.end()
+  })
 }
@@ -0,0 +1,63 @@
+import { spawn } from 'child_process'
+import { createInterface } from 'readline'
+import { PythonExecutionError } from '../../errors'
+
+export interface PythonProgressEvent {
+  /** `start`, `progress`, `file`, `status` or `end`. */
+  event: 'start' | 'progress' | 'file' | 'status' | 'end'
+  /** The name of the operation, e.g. `stfs_extract`. */
+  operation: string
+  /** Seconds since the operation started. */
+  time: number
+  /** Bytes processed so far, and the bytes the operation is going to process. */
+  done?: number
+  total?: number
+  bytesPerSecond?: number
+  /** The number of files of the operation (`start`) and the ones done so far (`file`, `end`). */
+  files?: number
+  filesDone?: number
+  /** The file that was done and its size (`file`). */
+  path?: string
+  size?: number
+  /** A status message of the operation and its level (`status`). */
+  message?: string
+  level?: 'info' | 'warning' | 'error'
+  /** Whether the operation succeeded, and why not (`end`). */
+  ok?: boolean
+  error?: string
+}
+
+export type PythonProgressCallback = (event: PythonProgressEvent) => void
+
+/**
+ * Runs a Python script with an extra pipe as its file descriptor 3, passing `--progress-fd 3`, and calls `onProgress` with each JSON-lines progress event the script writes to it.
+ * - - - -
+ * @param {string} moduleName The name of the Python script.
+ * @param {string[]} args The arguments of the script.
+ * @param {string} cwd The folder of the Python scripts.
+ * @param {PythonProgressCallback} onProgress The function called with each progress event.
+ * @returns {Promise<string>} The `stdout` of the script.
+ */
+export const execPythonWithProgress = async (moduleName: string, args: string[], cwd: string, onProgress: PythonProgressCallback): Promise<string> => {
+  const child = spawn('python', [moduleName, ...args, '--progress-fd', '3'], { cwd, windowsHide: true, stdio: ['ignore', 'pipe', 'pipe', 'pipe'] })
+  let stdout = ''
+  let stderr = ''
+  child.stdout.setEncoding('utf-8').on('data', (data: string) => (stdout += data))
+  child.stderr.setEncoding('utf-8').on('data', (data: string) => (stderr += data))
+
+  const channel = child.stdio[3]
+  if (channel) {
+    createInterface({ input: channel as NodeJS.ReadableStream }).on('line', (line) => {
+      if (line) onProgress(JSON.parse(line) as PythonProgressEvent)
+    })
+  }
+
+  const code = await new Promise<number | null>((resolve, reject) => {
+    child.on('error', reject)
+    child.on('close', resolve)
+  })
+  if (stderr) throw new PythonExecutionError(stderr)
+  if (code !== 0) throw new PythonExecutionError(`${moduleName} exited with code ${String(code)}`)
+
+  return stdout
+}
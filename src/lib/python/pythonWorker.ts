@@ -0,0 +1,334 @@
+import { type ChildProcessWithoutNullStreams, spawn } from 'child_process'
+import { open, unlink } from 'fs/promises'
+import type { Socket } from 'net'
+import { FilePath } from 'node-lib'
+import { PythonExecutionError } from '../../errors'
+import { RBTools } from '../../index'
+
+export type PythonWorkerMethods =
+  | 'audio_to_mogg'
+  | 'buffer_converter'
+  | 'decode_texture'
+  | 'decrypt_mogg'
+  | 'extract_stfs_file'
+  | 'image_converter'
+  | 'img_buffer_to_webp_data_url'
+  | 'img_file_stat'
+  | 'img_to_tex_xbox_ps3'
+  | 'midi_file_stat'
+  | 'mogg_decrypt'
+  | 'mogg_file_stat'
+  | 'release_shared_memory'
+  | 'stfs_extract'
+  | 'stfs_extract_all_files'
+  | 'stfs_file_stat'
+  | 'stfs_song_assets'
+  | 'swap_rb_art_bytes'
+  | 'webp_data_url'
+  | 'webp_data_url_pngwii'
+  | 'webp_data_url_pngxboxps3'
+
+export interface PythonWorkerResult<T = unknown> {
+  /** The value returned by the Python function of the script. */
+  value: T
+  /** What the script printed, the same as the `stdout` of the script run on its own. */
+  stdout: string
+}
+
+/**
+ * Where the worker writes the bytes of a result, instead of sending them as Base64 in the response:
+ * - `shm`: a new POSIX shared memory segment for each bytes value (`name` names the first one). The caller owns the segments
+ * and removes them, `readPythonWorkerBytes()` does. Not available on Windows.
+ * - `mmap`: a file created by the caller, written from `offset` on (each value aligned to 64 bytes), within `size` bytes or up to its end.
+ */
+export type PythonWorkerOutput = { type: 'shm'; name?: string } | { type: 'mmap'; path: string; offset?: number; size?: number }
+
+/** What a bytes value of a result is replaced by: its Base64 text, or where the worker wrote it (see `PythonWorkerOutput`). */
+export type PythonWorkerBytes = { base64: string } | { shm: string; offset: number; length: number } | { path: string; offset: number; length: number }
+
+export interface PythonWorkerPoolOptions {
+  /** Replaces a process after this many jobs, `0` never does. */
+  maxJobs?: number
+  /** Replaces a process once its resident memory is over this many megabytes, `0` never does. */
+  maxRssMB?: number
+  /** The path of a JSON file with the `processes`, `threads`, `maxJobs` and `maxRssMB` of each operation class. */
+  configPath?: string
+}
+
+export interface PythonWorkerClassStats {
+  /** Running processes of the class, and processes being started in place of recycled ones. */
+  workers: number
+  starting: number
+  /** The number of jobs of the class that run at once. */
+  concurrency: number
+  /** Jobs waiting for a free process, and jobs running. */
+  queued: number
+  inFlight: number
+  submitted: number
+  completed: number
+  errors: number
+  recycled: number
+  /** The resident memory of each process, in bytes. */
+  rss: number[]
+  /** Histogram of the time from request to result: `counts[i]` jobs took up to `buckets[i]` milliseconds, the last bucket (`null`) counts the rest. */
+  latency: { meanMs: number; buckets: (number | null)[]; counts: number[] }
+}
+
+export type PythonWorkerStats = Record<'texture' | 'audio' | 'io', PythonWorkerClassStats>
+
+export interface PythonWorkerInstrumentationPoint {
+  calls: number
+  /** The bytes the calls went through. */
+  bytes: number
+  /** Wall time, and CPU time of the threads running the calls. */
+  wallMs: number
+  cpuMs: number
+  /** `null` for points that don't count bytes. */
+  mbPerSecond: number | null
+}
+
+/** Counters of each instrumented hot path, by name (`stfs.read_block`, `mogg.do_crypt`, `tpl.toImage.CMP`...). */
+export type PythonWorkerInstrumentation = Record<string, PythonWorkerInstrumentationPoint>
+
+interface PythonWorkerResponse {
+  id: number | null
+  result?: PythonWorkerResult | PythonWorkerStats | PythonWorkerInstrumentation | string | string[]
+  error?: { code: number; message: string }
+}
+
+/**
+ * A long-lived Python process (`worker.py`) that runs every Python script of the module as a JSON-RPC method,
+ * so the interpreter and the Python packages are only loaded once instead of on every call.
+ *
+ * Calls run at the same time on the Python side, each one resolving as soon as it's done. With `pool` options, the
+ * operations run on warm processes split by operation class (texture, audio and I/O), each class with its own concurrency limit.
+ * - - - -
+ */
+export class PythonWorker {
+  private process?: ChildProcessWithoutNullStreams
+  private nextID = 0
+  private pending = new Map<number, { resolve: (result: unknown) => void; reject: (err: Error) => void }>()
+  private stdoutData = ''
+  private stderrData = ''
+  private static sharedWorker?: PythonWorker
+
+  /**
+   * The number of operations that run at once on the Python side, `0` uses one per CPU.
+   */
+  workers: number
+
+  /**
+   * Runs the operations on a pool of warm processes split by operation class, `undefined` runs them on threads.
+   */
+  pool?: PythonWorkerPoolOptions
+
+  /**
+   * Turns on the counters and timers of the Python hot paths, read with `instrumentation()`.
+   */
+  instrument: boolean
+
+  /**
+   * @param {number} workers `OPTIONAL` The number of operations that run at once on the Python side. Default is `0` (one per CPU).
+   * With `pool`, the number of processes of the texture class.
+   * @param {PythonWorkerPoolOptions} pool `OPTIONAL` Runs the operations on a pool of warm processes split by operation class.
+   * @param {boolean} instrument `OPTIONAL` Turns on the counters and timers of the Python hot paths. Default is `false`.
+   */
+  constructor(workers = 0, pool?: PythonWorkerPoolOptions, instrument = false) {
+    this.workers = workers
+    this.pool = pool
+    this.instrument = instrument
+  }
+
+  /**
+   * A worker shared by the whole module, started on its first call.
+   * - - - -
+   * @returns {PythonWorker}
+   */
+  static get shared(): PythonWorker {
+    PythonWorker.sharedWorker ??= new PythonWorker()
+    return PythonWorker.sharedWorker
+  }
+
+  /**
+   * Starts the Python process, if it's not running already. Called by `call()`.
+   *
+   * The process doesn't keep the Node.js event loop alive while no call is pending.
+   * - - - -
+   * @returns {ChildProcessWithoutNullStreams}
+   */
+  private start(): ChildProcessWithoutNullStreams {
+    if (this.process) return this.process
+
+    const moduleName = 'worker.py'
+    const pyPath = FilePath.of(RBTools.python.path, moduleName)
+    const args = [moduleName, '-w', this.workers.toString()]
+    if (this.pool) {
+      args.push('--pool', '--max-jobs', (this.pool.maxJobs ?? 0).toString(), '--max-rss', (this.pool.maxRssMB ?? 0).toString())
+      if (this.pool.configPath) args.push('--pool-config', this.pool.configPath)
+    }
+    if (this.instrument) args.push('--instrument')
+    const process = spawn('python', args, { cwd: pyPath.root, windowsHide: true })
+    this.process = process
+    this.stdoutData = ''
+    this.stderrData = ''
+
+    process.stdout.on('data', (data: Buffer) => {
+      this.stdoutData += data.toString()
+      const lines = this.stdoutData.split('\n')
+      this.stdoutData = lines.pop() ?? ''
+      for (const line of lines) {
+        if (!line.trim()) continue
+        this.settle(JSON.parse(line) as PythonWorkerResponse)
+      }
+    })
+
+    process.stderr.on('data', (data: Buffer) => {
+      this.stderrData += data.toString()
+    })
+
+    process.on('close', (code) => {
+      this.process = undefined
+      const err = new PythonExecutionError(`Python worker exited with ${code === null ? 'unknown code' : `code ${code.toString()}`}: ${this.stderrData}`)
+      for (const { reject } of this.pending.values()) reject(err)
+      this.pending.clear()
+    })
+
+    this.unref()
+    return process
+  }
+
+  /**
+   * Resolves or rejects the call of a response.
+   * - - - -
+   * @param {PythonWorkerResponse} response The parsed response line.
+   */
+  private settle(response: PythonWorkerResponse): void {
+    if (response.id === null) return
+    const call = this.pending.get(response.id)
+    if (!call) return
+    this.pending.delete(response.id)
+    if (response.error) call.reject(new PythonExecutionError(response.error.message))
+    else call.resolve(response.result)
+    if (this.pending.size === 0) this.unref()
+  }
+
+  /**
+   * Lets Node.js exit while the worker is idle, `ref()` is called back while calls are pending.
+   */
+  private unref(): void {
+    if (!this.process) return
+    this.process.unref()
+    // The stdio pipes of a child process are sockets
+    for (const stream of [this.process.stdin, this.process.stdout, this.process.stderr]) (stream as unknown as Socket).unref()
+  }
+
+  private ref(): void {
+    if (!this.process) return
+    this.process.ref()
+    for (const stream of [this.process.stdin, this.process.stdout, this.process.stderr]) (stream as unknown as Socket).ref()
+  }
+
+  /**
+   * Sends a request to the worker and resolves with its response.
+   * - - - -
+   * @param {string} method The method name.
+   * @param {Record<string, unknown> | unknown[]} params The parameters of the method.
+   * @returns {Promise<unknown>}
+   */
+  private request(method: string, params: Record<string, unknown> | unknown[], output?: PythonWorkerOutput): Promise<unknown> {
+    const process = this.start()
+    const id = this.nextID++
+    return new Promise<unknown>((resolve, reject) => {
+      this.pending.set(id, { resolve, reject })
+      this.ref()
+      process.stdin.write(`${JSON.stringify({ jsonrpc: '2.0', id, method, params, output })}\n`)
+    })
+  }
+
+  /**
+   * Runs a Python script on the worker, as if it was run on its own with these parameters.
+   * - - - -
+   * @param {PythonWorkerMethods} method The name of the script, without the `.py` extension.
+   * @param {Record<string, unknown> | unknown[]} params `OPTIONAL` The arguments of the script's Python function,
+   * as an object of keyword arguments or an array of positional arguments. Default is `{}`.
+   * @param {PythonWorkerOutput} output `OPTIONAL` Where the bytes values of the result are written, replaced by `PythonWorkerBytes` handles
+   * read with `readPythonWorkerBytes()`. They're sent as Base64 when not given.
+   * @returns {Promise<PythonWorkerResult<T>>}
+   */
+  async call<T = unknown>(method: PythonWorkerMethods, params: Record<string, unknown> | unknown[] = {}, output?: PythonWorkerOutput): Promise<PythonWorkerResult<T>> {
+    return (await this.request(method, params, output)) as PythonWorkerResult<T>
+  }
+
+  /**
+   * Checks that the worker is running and answering, starting it if needed.
+   * - - - -
+   * @returns {Promise<boolean>}
+   */
+  async ping(): Promise<boolean> {
+    return (await this.request('ping', {})) === 'pong'
+  }
+
+  /**
+   * Returns the queue depth, jobs in flight, recycled processes and latency histogram of each operation class.
+   * Only answered by a worker with `pool` options.
+   * - - - -
+   * @returns {Promise<PythonWorkerStats>}
+   */
+  async stats(): Promise<PythonWorkerStats> {
+    return (await this.request('stats', {})) as PythonWorkerStats
+  }
+
+  /**
+   * Returns the calls, bytes, and wall and CPU time of each instrumented hot path (STFS block reads, MOGG decryption,
+   * TPL decoding, PKG reads and decryption) since the worker started. Only answered by a worker started with `instrument`.
+   * - - - -
+   * @returns {Promise<PythonWorkerInstrumentation>}
+   */
+  async instrumentation(): Promise<PythonWorkerInstrumentation> {
+    return (await this.request('instrumentation', {})) as PythonWorkerInstrumentation
+  }
+
+  /**
+   * Stops the worker once the pending calls are done.
+   * - - - -
+   * @returns {Promise<void>}
+   */
+  async close(): Promise<void> {
+    const process = this.process
+    if (!process) return
+    await new Promise<void>((resolve) => {
+      process.once('close', () => {
+        resolve()
+      })
+      process.stdin.end() // Close stdin to signal that there are no more requests
+    })
+  }
+}
+
+/**
+ * Reads a bytes value of a worker result. Shared memory segments are read from `/dev/shm` (Linux), then removed unless `release` is `false`.
+ * - - - -
+ * @param {PythonWorkerBytes} bytes The handle the worker replaced the value with.
+ * @param {boolean} release `OPTIONAL` Removes the shared memory segment once read. Default is `true`.
+ * @returns {Promise<Buffer>}
+ */
+export const readPythonWorkerBytes = async (bytes: PythonWorkerBytes, release = true): Promise<Buffer> => {
+  if ('base64' in bytes) return Buffer.from(bytes.base64, 'base64')
+
+  const path = 'shm' in bytes ? `/dev/shm/${bytes.shm.replace(/^\//, '')}` : bytes.path
+  const buffer = Buffer.allocUnsafe(bytes.length)
+  const file = await open(path, 'r')
+  try {
+    let read = 0
+    while (read < bytes.length) {
+      const { bytesRead } = await file.read(buffer, read, bytes.length - read, bytes.offset + read)
+      if (bytesRead === 0) throw new PythonExecutionError(`${path}: expected ${bytes.length.toString()} bytes at offset ${bytes.offset.toString()}, got ${read.toString()}`)
+      read += bytesRead
+    }
+  } finally {
+    await file.close()
+  }
+  if ('shm' in bytes && release) await unlink(path)
+
+  return buffer
+}
@@ -2,15 +2,17 @@ import { DirPath, execAsync, FilePath, type FilePathLikeTypes } from 'node-lib'
 import { pathLikeToString } from 'node-lib'
 import { PythonExecutionError } from '../../errors'
 import { RBTools } from '../../index'
+import { execPythonWithProgress, type PythonProgressCallback } from './pythonProgress'
 
 /**
  * Python script: Asynchronously extracts the CON file contents and returns the folder path where all contents were extracted.
  * - - - -
  * @param {FilePathLikeTypes} stfsFilePath The path of the CON file.
  * @param {FilePathLikeTypes} destPath The folder path where you want the files to be extracted to.
+ * @param {PythonProgressCallback} [onProgress] `OPTIONAL` Called with the progress events of the extraction.
  * @returns {Promise<DirPath>}
  */
-export const stfsExtract = async (stfsFilePath: FilePathLikeTypes, destPath: FilePathLikeTypes): Promise<DirPath> => {
+export const stfsExtract = async (stfsFilePath: FilePathLikeTypes, destPath: FilePathLikeTypes, onProgress?: PythonProgressCallback): Promise<DirPath> => {
   const moduleName = 'stfs_extract.py'
   const pyPath = FilePath.of(RBTools.python.path, moduleName)
   const src = FilePath.of(pathLikeToString(stfsFilePath))
@@ -19,6 +21,11 @@ export const stfsExtract = async (stfsFilePath: FilePathLikeTypes, destPath: Fil
   if (dest.exists) await dest.deleteDir()
   await dest.mkDir()
 
+  if (onProgress) {
+    await execPythonWithProgress(moduleName, [src.path, dest.path], pyPath.root, onProgress)
+    return dest
+  }
+
   const command = `python ${moduleName} "${src.path}" "${dest.path}"`
   const { stderr } = await execAsync(command, { windowsHide: true, cwd: pyPath.root })
   if (stderr) throw new PythonExecutionError(stderr)
@@ -32,9 +39,10 @@ export const stfsExtract = async (stfsFilePath: FilePathLikeTypes, destPath: Fil
  * - - - -
  * @param {FilePathLikeTypes} stfsFilePath The path of the CON file.
  * @param {FilePathLikeTypes} destPath The folder path where you want the files to be extracted to.
+ * @param {PythonProgressCallback} [onProgress] `OPTIONAL` Called with the progress events of the extraction.
  * @returns {Promise<DirPath>}
  */
-export const stfsExtractAllFiles = async (stfsFilePath: FilePathLikeTypes, destPath: FilePathLikeTypes): Promise<DirPath> => {
+export const stfsExtractAllFiles = async (stfsFilePath: FilePathLikeTypes, destPath: FilePathLikeTypes, onProgress?: PythonProgressCallback): Promise<DirPath> => {
   const moduleName = 'stfs_extract_all_files.py'
   const pyPath = FilePath.of(RBTools.python.path, moduleName)
   const src = FilePath.of(pathLikeToString(stfsFilePath))
@@ -43,6 +51,11 @@ export const stfsExtractAllFiles = async (stfsFilePath: FilePathLikeTypes, destP
   if (dest.exists) await dest.deleteDir()
   await dest.mkDir()
 
+  if (onProgress) {
+    await execPythonWithProgress(moduleName, [src.path, dest.path], pyPath.root, onProgress)
+    return dest
+  }
+
   const command = `python ${moduleName} "${src.path}" "${dest.path}"`
   const { stderr } = await execAsync(command, { windowsHide: true, cwd: pyPath.root })
   if (stderr) throw new PythonExecutionError(stderr)
@@ -0,0 +1,66 @@
+import { FilePath, type FilePathLikeTypes } from 'node-lib'
+import { pathLikeToString } from 'node-lib'
+import type { MOGGFileStatRawObject } from '../../core.exports'
+import { RBTools } from '../../index'
+import { execPythonWithProgress, type PythonProgressCallback } from './pythonProgress'
+
+export interface STFSSongAssetsArt {
+  /** The path of the album art inside the CON file. */
+  path: string
+  /** The full size of the album art texture. */
+  width: number
+  height: number
+  /** The album art as a WEBP DataURL, scaled down to the requested size. */
+  dataURL: string
+}
+
+export interface STFSSongAssetsRecord {
+  /** The ID of the song on the `songs.dta` file. */
+  id: string | null
+  name: string | null
+  artist: string | null
+  /** The path of the song files, without extension, e.g. `songs/shortname/shortname`. */
+  songname: string | null
+  /** The album art of the song, `null` when there's none or it was skipped. */
+  art: STFSSongAssetsArt | null
+  /** The stats of the MOGG file of the song, `null` when there's none or it was skipped. */
+  mogg: (MOGGFileStatRawObject & { path: string }) | null
+  /** Why the album art or the MOGG file of the song could not be read. */
+  errors: string[]
+}
+
+export interface STFSSongAssetsOptions {
+  /** Decodes the album art of each song. Default is `true`. */
+  art?: boolean
+  /** Reads the stats of the MOGG file of each song. Default is `true`. */
+  audio?: boolean
+  /** The album art is scaled down to fit a square of this size, `0` keeps the full size. Default is `256`. */
+  artSize?: number
+  /** Called with the progress events of the scan. */
+  onProgress?: PythonProgressCallback
+}
+
+/**
+ * Python script: Asynchronously reads the songs of a CON file with their album art and MOGG stats, decoding and decrypting them in memory, without extracting the CON file.
+ * - - - -
+ * @param {FilePathLikeTypes} stfsFilePath The path of the CON file.
+ * @param {STFSSongAssetsOptions} [options] `OPTIONAL` What to read of each song.
+ * @returns {Promise<STFSSongAssetsRecord[]>}
+ */
+export const stfsSongAssets = async (stfsFilePath: FilePathLikeTypes, options: STFSSongAssetsOptions = {}): Promise<STFSSongAssetsRecord[]> => {
+  const { art = true, audio = true, artSize = 256, onProgress } = options
+  const moduleName = 'stfs_song_assets.py'
+  const pyPath = FilePath.of(RBTools.python.path, moduleName)
+  const src = FilePath.of(pathLikeToString(stfsFilePath))
+
+  const args = [src.path, '--art-size', artSize.toString()]
+  if (!art) args.push('--no-art')
+  if (!audio) args.push('--no-audio')
+
+  // One JSON record per line, read without the output buffer limit of execAsync
+  const stdout = await execPythonWithProgress(moduleName, args, pyPath.root, onProgress ?? (() => undefined))
+  return stdout
+    .split('\n')
+    .filter((line) => line.trim())
+    .map((line) => JSON.parse(line) as STFSSongAssetsRecord)
+}